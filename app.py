@@ -1,10 +1,10 @@
-from fastapi import HTTPException, FastAPI
+from fastapi import HTTPException, FastAPI, Request
 from pydantic import BaseModel, Field, HttpUrl, conint, field_validator, model_validator
 from typing import List
 from pathlib import Path
 from fastapi.responses import JSONResponse
 import subprocess, json, sys, os, shutil, re
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 import tempfile
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -15,27 +15,11 @@ def upload_to_gcs(local_path: str, dest_blob_name: str, make_public: bool = Fals
     """
     Upload local_path -> gs://{GCP_BUCKET_NAME}/{dest_blob_name}
     Trả về public URL (nếu make_public) hoặc media link mặc định của blob.
+    Backend thực tế theo STORAGE_BACKEND (gcs | local | http), xem utils/storage.py.
     """
-    from google.cloud import storage
+    from utils import storage
 
-    bucket_name = os.getenv("GCP_BUCKET_NAME")
-    if not bucket_name:
-        raise RuntimeError("Thiếu biến môi trường GCP_BUCKET_NAME.")
-
-    client = storage.Client()  # ADC (Cloud Run/Workload Identity) / hoặc SA JSON khi dev local
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(dest_blob_name)
-    blob.upload_from_filename(local_path, content_type="video/mp4")
-
-    if make_public or os.getenv("MAKE_PUBLIC", "").lower() in {"1", "true", "yes"}:
-        try:
-            blob.make_public()
-        except Exception:
-            # Nếu bucket không cho phép public, vẫn trả về blob.public_url (có thể không truy cập được)
-            pass
-
-    # public_url sẽ là https://storage.googleapis.com/{bucket}/{object}
-    return blob.public_url
+    return storage.upload_file(local_path, dest_blob_name, content_type="video/mp4", make_public=make_public)
 
 # --- Models ---
 class MakeVideoRequest(BaseModel):
@@ -47,6 +31,15 @@ class MakeVideoRequest(BaseModel):
     id: str
     color: str
     name_day: str
+    bg_track: str = Field("background", description="Tên nhạc nền trong base_audio/ (không có đuôi file)")
+    render_backend: Literal["moviepy", "segmented", "ffmpeg"] = Field(
+        "moviepy", description="moviepy: composite từng frame bằng Python; segmented: MoviePy song song theo "
+                               "đoạn slide trên nhiều process; ffmpeg: 1 lệnh ffmpeg filter graph"
+    )
+    encode_profile: Literal["draft", "standard", "archival"] = Field(
+        "standard", description="draft: nhanh (CRF 28); standard: slow 5000k như cũ; archival: CRF 18, preset slower"
+    )
+    crf: Optional[conint(ge=0, le=51)] = Field(None, description="Ép CRF (bỏ bitrate cố định của profile)")
 
     @field_validator("transcripts")
     @classmethod
@@ -56,6 +49,14 @@ class MakeVideoRequest(BaseModel):
             raise ValueError("Mọi transcript phải khác rỗng sau khi strip.")
         return cleaned
 
+    @field_validator("bg_track")
+    @classmethod
+    def _known_bg_track(cls, v: str) -> str:
+        from video_maker.bg_music import list_tracks
+        if v not in list_tracks():
+            raise ValueError(f"Nhạc nền '{v}' không tồn tại trong base_audio/.")
+        return v
+
     @model_validator(mode="after")
     def _lengths_must_match(self):
         if not (len(self.transcripts) == len(self.wav_urls) == len(self.image_urls)):
@@ -78,11 +79,69 @@ def safe_unlink(p: str):
     except Exception:
         pass
 
-from video_maker.concat_video import merge_video
+from video_maker.concat_video import merge_video, create_workspace
+from utils.asset_cache import get_asset_cache, localize_urls
+from video_maker import bg_music
+from video_maker.jobs import JobManager, stage
+from utils import metrics, storage
+from utils.render_cache import get_render_cache, request_key
+from image_slide.browser_pool import get_browser_pool, PAGES_PER_BROWSER, POOL_BROWSERS, WARM_BROWSERS
+from image_slide.poster_generator import build_html, ensure_local_font, render_posters
+from image_slide import poster_output
+from utils.poster_cache import etag_for, etag_matches, get_poster_cache, poster_key
 app = FastAPI()
+job_manager = JobManager()
 
-@app.post("/generate-video")
-def generate_video(body: MakeVideoRequest):
+@app.on_event("startup")
+def _preload_background_tracks():
+    # Chuẩn hoá nhạc nền 1 lần lúc khởi động -> request không phải decode lại
+    try:
+        print(f"🎵 Nhạc nền sẵn sàng: {bg_music.preload_tracks()}")
+    except Exception as e:
+        print(f"⚠️ Không preload được nhạc nền: {e}")
+
+@app.on_event("startup")
+def _warm_poster_browsers():
+    # Launch sẵn Chromium -> /generate-poster đầu tiên không phải chờ khởi động browser
+    if WARM_BROWSERS <= 0:
+        return
+    try:
+        print(f"🖼️ Chromium sẵn sàng: {get_browser_pool().warmup(WARM_BROWSERS)} browser")
+    except Exception as e:
+        print(f"⚠️ Không khởi động được Chromium cho poster: {e}")
+
+@app.on_event("startup")
+def _check_poster_font():
+    # Chỉ cảnh báo: thiếu font thì riêng endpoint poster trả 503, video vẫn chạy bình thường
+    try:
+        ensure_local_font()
+    except FileNotFoundError as e:
+        print(f"⚠️ {e} -> /generate-poster(s) self-contained / native sẽ trả 503")
+
+@app.get("/asset-cache/stats")
+def asset_cache_stats():
+    cache = get_asset_cache()
+    return JSONResponse(cache.stats() if cache else {"enabled": False})
+
+@app.get("/render-cache/stats")
+def render_cache_stats():
+    cache = get_render_cache()
+    return JSONResponse(cache.stats() if cache else {"enabled": False})
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Histogram thời gian từng stage, job đang chạy, fps encode, byte tải/upload, RSS (utils/metrics.py)
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+def _cached_video_url(key: str, body: MakeVideoRequest):
+    """URL video đã render cho cùng nội dung request (None nếu chưa có / tắt cache)."""
+    cache = get_render_cache()
+    if cache is None:
+        return None
+    return cache.lookup(key, urls=[str(u) for u in (*body.wav_urls, *body.image_urls)])
+
+def run_video_job(body: MakeVideoRequest, job=None) -> str:
+    """Toàn bộ pipeline 1 video (download -> render -> upload), trả về URL. Chạy trên worker của JobManager."""
     transcripts = body.transcripts
     wav_urls = [str(u) for u in body.wav_urls]
     image_urls = [str(u) for u in body.image_urls]
@@ -90,113 +149,406 @@ def generate_video(body: MakeVideoRequest):
     show_script = bool(body.show_script)
     color = body.color
     name_day = body.name_day
-    
-    merge_video(transcripts, wav_urls, image_urls, fps=fps, show_script=show_script, color=color, name_day=name_day)
 
-    # File đầu ra mặc định từ script
-    default_out = Path("audio/my_video.mp4")
-    if not default_out.exists():
-        raise HTTPException(status_code=500, detail="Không tìm thấy file đầu ra 'audio/my_video.mp4'.")
+    # Request trùng nội dung vừa render xong trong lúc job này chờ trong queue
+    key = request_key(body)
+    with stage(job, "cache"):
+        cached_url = _cached_video_url(key, body)
+    if cached_url:
+        if job is not None:
+            job.cached = True
+        return cached_url
 
     # Chuẩn hóa id để đặt tên file/object an toàn
     safe_id = re.sub(r"[^a-zA-Z0-9_\-\.]", "_", body.id).strip("_") or "video"
-    final_local = Path("audio") / f"{safe_id}.mp4"
+    # Giữ tên {id}.mp4 (client dựng URL theo id); request cùng id khác nội dung ghi đè object ->
+    # render cache ghi key sở hữu object (owners/) nên record cũ không còn được dùng
+    dest_object = f"{safe_id}.mp4"
+
+    # STREAM_UPLOAD=1: upload mp4 (fragmented) ngay trong lúc encoder đang ghi
+    streaming = storage.StreamingUpload(dest_object) if storage.STREAM_UPLOAD else None
 
-    # Đổi tên file local theo id
+    # Mỗi request một workspace riêng -> nhiều job render song song trong cùng process/container
+    workspace = create_workspace(body.id)
     try:
-        if final_local.exists():
-            final_local.unlink()
-        shutil.move(str(default_out), str(final_local))
-    except Exception as e:
-        # Nếu move lỗi thì vẫn dùng default_out
-        final_local = default_out
+        try:
+            default_out = Path(merge_video(transcripts, wav_urls, image_urls, fps=fps, show_script=show_script,
+                                           color=color, name_day=name_day, workspace=workspace,
+                                           bg_track=body.bg_track, job=job, backend=body.render_backend,
+                                           encode_profile=body.encode_profile, crf=body.crf,
+                                           on_encode_start=streaming.attach if streaming else None))
+        except BaseException as e:
+            if streaming is not None:
+                streaming.abort(e)
+            raise
+        if not default_out.exists():
+            raise HTTPException(status_code=500, detail=f"Không tìm thấy file đầu ra '{default_out.name}'.")
 
-    # Upload lên GCS: videos/{id}.mp4
-    dest_object = f"{safe_id}.mp4"
+        if streaming is not None:
+            try:
+                with stage(job, "upload"):
+                    video_url = streaming.finish()
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Upload lỗi: {e}")
+            _count_upload(job, default_out)
+            return _remember(key, video_url, dest_object, wav_urls + image_urls)
+
+        final_local = default_out.parent / dest_object
+
+        # Đổi tên file local theo id
+        try:
+            if final_local.exists():
+                final_local.unlink()
+            shutil.move(str(default_out), str(final_local))
+        except Exception as e:
+            # Nếu move lỗi thì vẫn dùng default_out
+            final_local = default_out
+
+        # Upload lên GCS: {id}.mp4
+        try:
+            with stage(job, "upload"):
+                video_url = upload_to_gcs(str(final_local), dest_object)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Upload GCS lỗi: {e}")
+        _count_upload(job, final_local)
+    finally:
+        # Dọn toàn bộ workspace của job (script/audio/image/mp4)
+        safe_rmtree(workspace)
+
+    return _remember(key, video_url, dest_object, wav_urls + image_urls)
+
+def _count_upload(job, path) -> None:
+    size = os.path.getsize(path)
+    metrics.UPLOAD_BYTES.inc(size)
+    if job is not None:
+        job.set_resource("bytes_uploaded", size)
+
+def _remember(key: str, video_url: str, dest_object: str, urls) -> str:
+    cache = get_render_cache()
+    if cache is not None:
+        try:
+            cache.store(key, video_url, dest_object, urls=urls)
+        except Exception as e:
+            print(f"⚠️ Không ghi được render cache: {e}")
+    return video_url
+
+def submit_render(body: MakeVideoRequest):
+    """
+    Cache hit -> job đã xong sẵn (không chiếm worker); request trùng đang render -> gộp vào job đó;
+    còn lại submit job mới.
+    """
+    key = request_key(body)
+    url = _cached_video_url(key, body)
+    if url:
+        print(f"♻️ Render cache hit ({key[:12]}): {url}")
+        return job_manager.done(url, key=key)
+    return job_manager.submit(run_video_job, body, key=key)
+
+
+@app.post("/jobs/generate-video", status_code=202)
+def submit_video_job(body: MakeVideoRequest):
+    # Trả job id ngay, render chạy nền trên pool worker giới hạn
+    job = submit_render(body)
+    return JSONResponse({"job_id": job.id, "status_url": f"/jobs/{job.id}"}, status_code=202)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job (sai id hoặc đã hết hạn).")
+    return JSONResponse(job.to_dict())
+
+@app.post("/generate-video")
+def generate_video(body: MakeVideoRequest):
+    # Giữ API đồng bộ cũ: submit job rồi chờ kết quả (retry trùng nội dung -> cache / gộp job)
+    job = submit_render(body)
     try:
-        video_url = upload_to_gcs(str(final_local), dest_object)
+        video_url = job.future.result()
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload GCS lỗi: {e}")
+        raise HTTPException(status_code=500, detail=f"Render lỗi: {e}")
 
-    # Tuỳ chọn: dọn tài nguyên tạm (nếu script tạo thư mục/âm thanh/ảnh phụ)
-    safe_unlink("bg.wav")
-    safe_rmtree("./script")
-    safe_rmtree("./audio")  # cẩn thận: nếu xóa 'audio' sẽ mất file out; chỉ xóa nếu không cần giữ local
-    safe_rmtree("./image")
+    # Trả về URL (JSON) + thời gian từng stage / tài nguyên của job để debug request chậm
+    info = job.to_dict()
+    return JSONResponse({"url": video_url, "job_id": job.id, "cached": job.cached,
+                         "timings": info["timings"], "resources": info["resources"]})
 
-    # Trả về URL (JSON)
-    return JSONResponse({"url": video_url})
+
+# renderer="native" chưa mở mặc định: cần chạy benchmarks/bench_poster_native.py với Chromium thật
+# (so pixel từng layout) trước khi bật cho client
+POSTER_NATIVE_ENABLED = os.getenv("POSTER_NATIVE_ENABLED", "0").lower() in {"1", "true", "yes"}
 
 
 class PosterRequest(BaseModel):
     images: List[str] = Field(..., description="Danh sách URL/path ảnh (lấy tối đa 6)")
     text: str = Field(..., description="Overlay text")
-    fmt: Literal["jpeg", "png"] = Field("jpeg", description="Định dạng ảnh xuất")
-    quality: Optional[int] = Field(90, description="Chỉ dùng cho JPEG 0–100")
+    fmt: Literal["jpeg", "png", "webp", "avif"] = Field("jpeg", description="Định dạng ảnh xuất")
+    quality: Optional[int] = Field(
+        None, description="Quality 0–100 cho jpeg/webp/avif (trần khi dùng max_bytes); "
+                          "mặc định theo định dạng: jpeg 90, webp 85, avif 70"
+    )
+    progressive: bool = Field(False, description="JPEG progressive")
+    width: Optional[int] = Field(None, ge=64, le=4320, description="Độ rộng ảnh xuất (px), mặc định 1080 x scale")
+    max_bytes: Optional[int] = Field(None, ge=1024, description="Giới hạn dung lượng; tự tìm quality cao nhất còn vừa")
     scale: int = Field(2, description="Device scale factor khi render ảnh")
-    wait: Literal["load", "domcontentloaded", "networkidle", "commit"] = Field(
-        "networkidle", description="Chiến lược chờ tải trang"
+    wait: Optional[Literal["load", "domcontentloaded", "networkidle", "commit"]] = Field(
+        None, description="Chiến lược chờ tải trang (mặc định: load nếu self_contained, ngược lại networkidle)"
+    )
+    self_contained: bool = Field(
+        True, description="Font local + ảnh đã tải sẵn vào cache -> trang không request mạng nào khi render"
+    )
+    renderer: Literal["chromium", "native"] = Field(
+        "chromium", description="chromium: HTML + Playwright; native: vẽ layout bằng Pillow (nhanh, không cần browser)"
     )
     # Nếu poster_generator.py nằm nơi khác, chỉnh tại đây
+    # Mặc định render trong process; module khác -> chạy subprocess như cũ
     script_path: str = Field("image_slide.poster_generator", description="Đường dẫn script sinh poster")
 
+    @field_validator("renderer")
+    @classmethod
+    def _native_enabled(cls, v: str) -> str:
+        if v == "native" and not POSTER_NATIVE_ENABLED:
+            raise ValueError("renderer 'native' chưa bật (POSTER_NATIVE_ENABLED=1).")
+        return v
+
+    @property
+    def wait_until(self) -> str:
+        return self.wait or ("load" if self.self_contained else "networkidle")
+
+DEFAULT_POSTER_SCRIPT = "image_slide.poster_generator"
+# /generate-posters render + stream theo từng nhóm (mặc định = số page của pool browser)
+POSTER_BATCH_CHUNK = max(1, int(os.getenv("POSTER_BATCH_CHUNK", str(POOL_BROWSERS * PAGES_PER_BROWSER))))
+
+
+def _require_poster_font(posters) -> None:
+    """Poster self-contained / native cần font tiêu đề local; thiếu -> 503 (lỗi deploy, không đổi font)."""
+    if not any((p.self_contained or p.renderer == "native") and p.script_path == DEFAULT_POSTER_SCRIPT
+               for p in posters):
+        return
+    try:
+        ensure_local_font()
+    except FileNotFoundError as e:
+        metrics.POSTER_REQUESTS.labels("error").inc()
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _poster_info_headers(info: dict) -> dict:
+    """Header từ info của bước xuất ảnh; dùng chung cho render mới và cache hit."""
+    if info.get("quality") is None:
+        return {}
+    return {"X-Poster-Quality": str(info["quality"])}
+
+
+def _render_poster_subprocess(body: PosterRequest, images: List[str], tmpdir_path: Path) -> Path:
+    """Cách cũ: chạy script sinh poster ở process riêng (chỉ dùng khi script_path khác mặc định)."""
+    html_path = tmpdir_path / "poster.html"
+    img_ext = "jpg" if body.fmt == "jpeg" else "png"
+    img_path = tmpdir_path / f"poster.{img_ext}"
+
+    # Lắp command gọi script
+    cmd = [sys.executable, "-m" ,body.script_path, *images, "-t", body.text, "-o", str(html_path)]
+    if body.fmt == "jpeg":
+        cmd += ["--jpeg", str(img_path)]
+        cmd += ["--quality", str(poster_output.resolve_quality("jpeg", body.quality))]
+    else:
+        cmd += ["--png", str(img_path)]
+    cmd += ["--scale", str(int(body.scale)), "--wait", body.wait_until]
+    print(f"🖼️ Render poster bằng subprocess {body.script_path} ({len(images)} ảnh, {body.fmt})")
+    try:
+        proc = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=900,
+            encoding="utf-8",
+        )
+    except subprocess.TimeoutExpired:
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
+
+    if proc.returncode != 0:
+        raise HTTPException(status_code=500, detail=f"Script error:\n{proc.stderr}")
+
+    if not img_path.exists():
+        # fallback: đôi khi người dùng truyền sai fmt, thử dò file còn lại
+        other = tmpdir_path / ("poster.png" if img_ext == "jpg" else "poster.jpg")
+        if other.exists():
+            return other
+        raise HTTPException(
+            status_code=500,
+            detail=f"Không tìm thấy ảnh đầu ra: {img_path}",
+        )
+    return img_path
+
+
+class PosterBatchRequest(BaseModel):
+    posters: List[PosterRequest] = Field(..., min_length=1, max_length=200, description="Danh sách poster cần render")
+
+
+class _ZipChunks:
+    """File chỉ-ghi (không seek) cho zipfile: gom byte vừa ghi để response stream dần về client."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+@app.post("/generate-posters")
+def generate_posters(body: PosterBatchRequest):
+    """
+    Render batch theo từng nhóm POSTER_BATCH_CHUNK poster (song song trên nhiều page của pool browser)
+    và stream file zip về client ngay khi mỗi nhóm xong: poster_001.jpg ... + manifest.json ở cuối
+    (trạng thái/lỗi từng poster; poster lỗi không làm hỏng cả batch). RAM chỉ giữ 1 nhóm ảnh mỗi lúc.
+    """
+    import zipfile
+
+    posters = body.posters
+    _require_poster_font(posters)
+
+    def stream():
+        out = _ZipChunks()
+        manifest = []
+        # Ảnh đã nén sẵn -> ZIP_STORED (không tốn CPU nén lại)
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+            for start in range(0, len(posters), POSTER_BATCH_CHUNK):
+                chunk = range(start, min(start + POSTER_BATCH_CHUNK, len(posters)))
+                # Batch chỉ render trong process (renderer mặc định); script_path khác -> lỗi riêng poster đó
+                in_process = [i for i in chunk if posters[i].script_path == DEFAULT_POSTER_SCRIPT]
+                with metrics.span("poster", "batch_render"):
+                    rendered = dict(zip(in_process, render_posters(
+                        [posters[i].model_dump(exclude={"script_path"}) for i in in_process])))
+                for i in chunk:
+                    result = rendered.get(i, ValueError("Batch chỉ hỗ trợ renderer mặc định (script_path)"))
+                    if isinstance(result, Exception):
+                        manifest.append({"index": i, "ok": False, "error": str(result)})
+                        continue
+                    data, info = result
+                    name = f"poster_{i + 1:03d}.{poster_output.extension(posters[i].fmt)}"
+                    zf.writestr(name, data)
+                    manifest.append({"index": i, "ok": True, "file": name, **info})
+                yield out.drain()
+            zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        yield out.drain()  # manifest + central directory
+        ok = sum(1 for m in manifest if m["ok"])
+        print(f"🖼️ Batch poster: {ok}/{len(manifest)} thành công")
+
+    # Số poster ok/lỗi chỉ biết sau khi render xong -> nằm trong manifest.json (header đã gửi trước)
+    headers = {
+        "Content-Disposition": 'attachment; filename="posters.zip"',
+        "X-Posters-Total": str(len(posters)),
+    }
+    return StreamingResponse(stream(), media_type="application/zip", headers=headers)
+
+
+@app.get("/poster-pool/stats")
+def poster_pool_stats():
+    return get_browser_pool().stats()
+
+
+@app.get("/poster-cache/stats")
+def poster_cache_stats():
+    cache = get_poster_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
 @app.post("/generate-poster")
-def generate_poster(body: PosterRequest):
+def generate_poster(body: PosterRequest, request: Request):
     if not body.images:
         raise HTTPException(status_code=400, detail="Thiếu danh sách ảnh")
+    _require_poster_font([body])
 
-    # Thư mục tạm để chứa html + ảnh => auto cleanup khi ra khỏi with
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmpdir_path = Path(tmpdir)
-        html_path = tmpdir_path / "poster.html"
-        img_ext = "jpg" if body.fmt == "jpeg" else "png"
-        img_path = tmpdir_path / f"poster.{img_ext}"
-
-        # Lắp command gọi script
-        cmd = [sys.executable, "-m" ,body.script_path, *body.images, "-t", body.text, "-o", str(html_path)]
-        if body.fmt == "jpeg":
-            cmd += ["--jpeg", str(img_path)]
-            if body.quality is not None:
-                cmd += ["--quality", str(int(body.quality))]
-        else:
-            cmd += ["--png", str(img_path)]
-            
-
-        # Có thể truyền thêm scale/wait vào script nếu bạn bổ sung tham số tương ứng
-        # Ở đây script đã có --scale/--wait nên ta truyền luôn:
-        cmd += ["--scale", str(int(body.scale)), "--wait", body.wait]
-        print(cmd)
-        try:
-            proc = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=900,
-                encoding="utf-8",
-            )
-        except subprocess.TimeoutExpired:
-            raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
-
-        if proc.returncode != 0:
-            err = proc.stderr.decode("utf-8", "replace")  # chỉ để hiển thị lỗi
-            raise HTTPException(status_code=500, detail=f"Script error:\n{err}")
-
-        if not img_path.exists():
-            # fallback: đôi khi người dùng truyền sai fmt, thử dò file còn lại
-            other = tmpdir_path / ("poster.png" if img_ext == "jpg" else "poster.jpg")
-            if other.exists():
-                img_path = other
+    # Thời gian từng bước -> histogram /metrics + header Server-Timing của response
+    timings = {}
+
+    # Ảnh remote -> file local trong asset cache (Chromium không phải tải lại mỗi lần render)
+    try:
+        with metrics.span("poster", "localize", timings):
+            images = localize_urls(body.images)
+    except Exception as e:
+        metrics.POSTER_REQUESTS.labels("error").inc()
+        raise HTTPException(status_code=502, detail=f"Không tải được ảnh: {e}")
+
+    filename = f"poster.{poster_output.extension(body.fmt)}"
+    media_type = poster_output.media_type(body.fmt)
+    quality = poster_output.resolve_quality(body.fmt, body.quality)
+    # script_path tuỳ chỉnh tự dựng trang từ (ảnh, text) và không nhận self_contained / renderer
+    # -> key chỉ theo input thật của lệnh, 2 request chỉ khác các cờ đó dùng chung 1 bản render
+    custom = body.script_path != DEFAULT_POSTER_SCRIPT
+    with metrics.span("poster", "build_html", timings):
+        html = build_html(images, body.text, self_contained=body.self_contained and not custom)
+    options = dict(fmt=body.fmt, quality=quality, scale=int(body.scale), wait=body.wait_until,
+                   script_path=body.script_path, width=body.width, max_bytes=body.max_bytes,
+                   progressive=body.progressive)
+    if not custom:
+        options["renderer"] = body.renderer
+    key = poster_key(html, images, **options)
+    headers = {
+        "Content-Disposition": f'inline; filename="{filename}"',
+        "ETag": etag_for(key),
+        "Cache-Control": "no-cache",  # client luôn revalidate bằng If-None-Match -> 304
+    }
+    if etag_matches(request.headers.get("if-none-match"), key):
+        metrics.POSTER_REQUESTS.labels("not_modified").inc()
+        return Response(status_code=304, headers={**headers, "Server-Timing": metrics.server_timing(timings)})
+
+    cache = get_poster_cache()
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        data, info = cached
+        metrics.POSTER_REQUESTS.labels("hit").inc()
+        headers.update(_poster_info_headers(info))
+        headers["Server-Timing"] = metrics.server_timing(timings)
+        return Response(content=data, media_type=media_type, headers={**headers, "X-Poster-Cache": "hit"})
+
+    if custom and body.fmt not in ("jpeg", "png"):
+        raise HTTPException(status_code=400, detail="script_path tuỳ chỉnh chỉ xuất được jpeg/png")
+    metrics.POSTER_IN_FLIGHT.inc()
+    try:
+        with metrics.span("poster", "render", timings):
+            if custom:
+                # Thư mục tạm để chứa html + ảnh => auto cleanup khi ra khỏi with
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    result = _render_poster_subprocess(body, images, Path(tmpdir)).read_bytes()
+                if poster_output.needs_finish(body.fmt, body.width, body.max_bytes, body.progressive):
+                    result = poster_output.finish_bytes(result, body.fmt, quality=quality, width=body.width,
+                                                        max_bytes=body.max_bytes, progressive=body.progressive)
+                else:
+                    result = (result, {})
             else:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Không tìm thấy ảnh đầu ra: {img_path}",
-                )
-
-        # Đọc bytes rồi trả về octet-stream; vì dùng TemporaryDirectory nên file sẽ tự xoá
-        data = img_path.read_bytes()
-
-        # Bạn muốn octet-stream, mình set đúng như yêu cầu
-        headers = {
-            "Content-Disposition": f'inline; filename="{img_path.name}"'
-        }
-        return Response(content=data, media_type="application/octet-stream", headers=headers)
\ No newline at end of file
+                # Render ngay trong process: pool Chromium đã khởi động sẵn hoặc renderer native
+                result = render_posters([{**body.model_dump(exclude={"script_path"}), "images": images}])[0]
+    except BaseException:
+        metrics.POSTER_REQUESTS.labels("error").inc()
+        raise
+    finally:
+        metrics.POSTER_IN_FLIGHT.dec()
+    if isinstance(result, Exception):
+        metrics.POSTER_REQUESTS.labels("error").inc()
+    if isinstance(result, TimeoutError):
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
+    if isinstance(result, ValueError):
+        raise HTTPException(status_code=422, detail=str(result))
+    if isinstance(result, Exception):
+        raise HTTPException(status_code=500, detail=f"Render poster lỗi: {result}")
+    data, info = result
+
+    if cache:
+        try:
+            cache.put(key, data, info)
+        except OSError as e:
+            print(f"⚠️ Không ghi được poster cache: {e}")
+    metrics.POSTER_REQUESTS.labels("miss").inc()
+    headers.update(_poster_info_headers(info))
+    headers["Server-Timing"] = metrics.server_timing(timings)
+    return Response(content=data, media_type=media_type, headers={**headers, "X-Poster-Cache": "miss"})
\ No newline at end of file
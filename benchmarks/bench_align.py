@@ -0,0 +1,66 @@
+"""
+Độ chính xác + thời gian của utils.align (forced alignment transcript gốc) trên giọng nói tổng hợp
+có đáp án (benchmarks.fixtures.make_speech_wav), so với trải đều từ lên cả clip (StubTranscriber).
+
+  python -m benchmarks.bench_align --clips 20
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import make_speech_wav
+from utils import align, transcribe
+
+SENTENCES = [
+    "Kính chào quý vị, hôm nay là ngày tốt để khai trương.",
+    "Người mệnh Hỏa nên tránh xuất hành, người mệnh Thủy thì thuận lợi cưới hỏi.",
+    "Giờ hoàng đạo: Tý, Sửu, Mão. Chúc quý vị một ngày an lành!",
+    "Tháng này có 2024 lượt xem, cảm ơn quý vị đã theo dõi.",
+]
+
+
+def errors(pred, truth):
+    starts = [abs(p["start"] - t["start"]) for p, t in zip(pred, truth)]
+    ends = [abs(p["end"] - t["end"]) for p, t in zip(pred, truth)]
+    centers = [t["start"] <= (p["start"] + p["end"]) / 2 <= t["end"] for p, t in zip(pred, truth)]
+    return {
+        "mean_start_err_ms": round(1000 * float(np.mean(starts)), 1),
+        "mean_end_err_ms": round(1000 * float(np.mean(ends)), 1),
+        "p90_boundary_err_ms": round(1000 * float(np.percentile(starts + ends, 90)), 1),
+        "center_inside_word_pct": round(100.0 * sum(centers) / len(centers), 1),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--clips", type=int, default=20)
+    args = p.parse_args()
+
+    aligned, uniform, truths, seconds = [], [], [], []
+    stub = transcribe.StubTranscriber()
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.clips):
+            text = SENTENCES[i % len(SENTENCES)]
+            wav = os.path.join(tmp, f"{i + 1}.wav")
+            truths += make_speech_wav(wav, text, seed=i)
+            t0 = time.perf_counter()
+            aligned += align.align_text(wav, text)
+            seconds.append(time.perf_counter() - t0)
+            uniform += stub.transcribe(wav, text)
+
+    print(json.dumps({
+        "clips": args.clips,
+        "words": len(truths),
+        "align_ms_per_clip": round(1000 * float(np.mean(seconds)), 2),
+        "align": errors(aligned, truths),
+        "uniform_over_clip": errors(uniform, truths),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+So sánh pipeline audio cũ (pydub: decode 2 lần, sum(parts), overlay/fade từng bước)
+với video_maker.audio_engine (decode 1 lần, mix numpy vào 1 buffer).
+
+  python -m benchmarks.bench_audio --count 20 --seconds 8 --sr 44100
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import make_wav_dir
+from video_maker import audio_engine, bg_music
+
+
+def legacy_pydub(audio_dir: str, output_wav: str, bg_wav_path: str, silence=0.5):
+    """Bản sao đường cũ trong make_video (get_durations + build_bg_to_length + merge_audio)."""
+    from pydub import AudioSegment
+
+    wav_files = audio_engine.list_wavs(audio_dir)
+    durations = [len(AudioSegment.from_file(f)) / 1000.0 for f in wav_files]
+
+    bg = AudioSegment.from_file(os.path.join(bg_music.BASE_AUDIO_DIR, "background.wav"))
+    bg = bg.set_frame_rate(24000).set_channels(1).set_sample_width(2)
+    target_ms = int(round((sum(durations) + len(durations) * silence) * 1000))
+    if len(bg) >= target_ms:
+        bg_out = bg[:target_ms]
+    else:
+        current = AudioSegment.silent(duration=0, frame_rate=bg.frame_rate)
+        while len(current) < target_ms:
+            current = current + bg if len(current) == 0 else current.append(bg, crossfade=200)
+        bg_out = current[:target_ms].fade_in(200).fade_out(300)
+    bg_out.export(bg_wav_path, format="wav")
+
+    def _norm(seg):
+        return seg.set_frame_rate(24000).set_channels(1).set_sample_width(2).apply_gain(-1.0)
+
+    parts = []
+    for i, f in enumerate(wav_files):
+        parts.append(_norm(AudioSegment.from_file(f)))
+        if i < len(wav_files) - 1:
+            parts.append(AudioSegment.silent(duration=int(silence * 1000)))
+    main = sum(parts)
+    bg = _norm(AudioSegment.from_file(bg_wav_path)).apply_gain(-14.0)
+    bg_full = (bg * ((len(main) // len(bg)) + 1))[:len(main)].fade_in(400).fade_out(600)
+    main.overlay(bg_full).fade_in(50).fade_out(120).export(output_wav, format="wav")
+    return durations
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--count", type=int, default=15, help="Số clip thoại")
+    p.add_argument("--seconds", type=float, default=8.0, help="Độ dài mỗi clip")
+    p.add_argument("--sr", type=int, default=44100, help="Sample rate của clip (khác 24 kHz để có resample)")
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_dir = os.path.join(tmp, "audio")
+        make_wav_dir(audio_dir, count=args.count, seconds=args.seconds, sr=args.sr)
+        bg_music.get_track(bg_music.DEFAULT_TRACK)  # cache nhạc nền dựng sẵn (giống lúc startup)
+
+        t_legacy = _best_of(lambda: legacy_pydub(audio_dir, os.path.join(tmp, "legacy.wav"),
+                                                 os.path.join(tmp, "bg.wav")), args.repeat)
+        t_engine = _best_of(lambda: audio_engine.render_voice_track(
+            audio_dir, os.path.join(tmp, "engine.wav"), bg_track=bg_music.DEFAULT_TRACK), args.repeat)
+
+    print(json.dumps({
+        "clips": args.count,
+        "clip_seconds": args.seconds,
+        "clip_sr": args.sr,
+        "pydub_s": round(t_legacy, 4),
+        "numpy_engine_s": round(t_engine, 4),
+        "speedup": round(t_legacy / t_engine, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Tra lớp đang hiện của compositor: CompositeVideoClip (duyệt mọi clip mỗi frame) so với
+video_maker.compositor.IndexedCompositeVideoClip (lịch mốc thời gian + bisect), trên timeline
+vài trăm clip (slide + chữ thumbnail + mỗi từ subtitle 1 clip như cách dựng cũ).
+
+  python -m benchmarks.bench_compositor --words 300,1000 --frames 60
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import make_words
+from benchmarks.parity_ffmpeg import build_fixture
+from video_maker import image_prep, timeline
+from video_maker.compositor import IndexedCompositeVideoClip
+
+
+def layer_clips(tl):
+    from moviepy import ImageClip, vfx
+
+    clips = [ImageClip(image_prep.load_frame(s["image"])).with_start(s["start"]).with_duration(s["duration"])
+             .with_effects([vfx.FadeIn(s["fade"]), vfx.FadeOut(s["fade"])]) for s in tl["slides"]]
+    return clips + [timeline.text_clip(item) for item in tl["texts"]]
+
+
+def active_positions(comp):
+    """t -> vị trí (trong comp.clips / comp.mask.clips) các lớp đang hiện, để so 2 compositor."""
+    pos = {id(c): i for i, c in enumerate(comp.clips)}
+    mpos = {id(c): i for i, c in enumerate(comp.mask.clips)}
+    return lambda t: ([pos[id(c)] for c in comp.playing_clips(t)],
+                      [mpos[id(c)] for c in comp.mask.playing_clips(t)])
+
+
+def per_frame(fn, ts):
+    t0 = time.perf_counter()
+    out = [fn(t) for t in ts]
+    return (time.perf_counter() - t0) / len(ts), out
+
+
+def main():
+    from moviepy import CompositeVideoClip
+
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--words", default="300,1000", help="Số từ subtitle (mỗi từ 1 clip), nhiều giá trị cách nhau dấu phẩy")
+    p.add_argument("--seconds", type=float, default=60.0)
+    p.add_argument("--fps", type=int, default=30)
+    p.add_argument("--frames", type=int, default=60, help="Số frame render đầy đủ để so sánh pixel")
+    p.add_argument("--width", type=int, default=540)
+    p.add_argument("--height", type=int, default=960)
+    args = p.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        slides = 6
+        base, _ = build_fixture(tmp, slides, args.seconds / slides - timeline.SLIDE_GAP, (args.width, args.height))
+        grid = np.arange(int(base["duration"] * args.fps)) / args.fps
+        for n in [int(x) for x in args.words.split(",")]:
+            tl = dict(base, texts=[t for t in base["texts"] if t["role"] != "subtitle"]
+                      + timeline.subtitle_texts(make_words(n, base["duration"] - 0.5, seed=5), "red"))
+            clips = layer_clips(tl)
+            plain = CompositeVideoClip(clips, size=tl["size"])
+            t0 = time.perf_counter()
+            indexed = IndexedCompositeVideoClip(clips, size=tl["size"])
+            build_s = time.perf_counter() - t0
+
+            # 1) chỉ phần tra lớp đang hiện, trên mọi frame của video (cả ảnh lẫn mask)
+            lookup_plain, _ = per_frame(lambda t: (plain.playing_clips(t), plain.mask.playing_clips(t)), grid)
+            lookup_idx, _ = per_frame(lambda t: (indexed.playing_clips(t), indexed.mask.playing_clips(t)), grid)
+            ap_plain, ap_idx = active_positions(plain), active_positions(indexed)
+            sets_plain = [ap_plain(t) for t in grid]
+            sets_idx = [ap_idx(t) for t in grid]
+
+            # 2) frame đầy đủ (composite Pillow) trên vài frame lấy mẫu
+            ts = grid[np.linspace(0, len(grid) - 1, args.frames).astype(int)]
+            frame_plain, fp = per_frame(lambda t: (plain.get_frame(t), plain.mask.get_frame(t)), ts)
+            frame_idx, fi = per_frame(lambda t: (indexed.get_frame(t), indexed.mask.get_frame(t)), ts)
+            identical = all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1]) for a, b in zip(fp, fi))
+
+            results.append({
+                "clips": len(clips),
+                "max_active": max(len(s[0]) for s in sets_idx),
+                "index_build_ms": round(1000 * build_s, 2),
+                "lookup_us_per_frame_plain": round(1e6 * lookup_plain, 1),
+                "lookup_us_per_frame_indexed": round(1e6 * lookup_idx, 1),
+                "lookup_speedup": round(lookup_plain / lookup_idx, 1),
+                "frame_ms_plain": round(1000 * frame_plain, 2),
+                "frame_ms_indexed": round(1000 * frame_idx, 2),
+                "same_active_sets": sets_plain == sets_idx,
+                "identical_frames": identical,
+            })
+
+    print(json.dumps({"duration_s": round(base["duration"], 2), "frames_per_video": len(grid),
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
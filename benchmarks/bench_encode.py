@@ -0,0 +1,73 @@
+"""
+Thời gian encode + dung lượng file cho từng profile trong video_maker.encode_profiles,
+trên cùng 1 timeline tổng hợp cố định (fixture của parity_ffmpeg), để chọn mặc định có số liệu.
+
+  python -m benchmarks.bench_encode --profiles draft,standard,archival --backend ffmpeg
+  python -m benchmarks.bench_encode --profiles standard --crf 23 --threads 2
+  python -m benchmarks.bench_encode --profiles draft --backend segmented   # so với --backend moviepy
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.parity_ffmpeg import build_fixture
+from video_maker import encode_profiles, ffmpeg_backend, segment_render, timeline
+
+
+def render(tl, audio, out, fps, backend, encode, tmp):
+    if backend == "ffmpeg":
+        ffmpeg_backend.render_timeline(tl, audio, out, fps=fps, work_dir=os.path.join(tmp, "ff"), **encode)
+    elif backend == "segmented":
+        segment_render.render_segmented(tl, audio, out, fps=fps, work_dir=os.path.join(tmp, "seg"), **encode)
+    else:
+        timeline.to_moviepy(tl, audio_path=audio).write_videofile(
+            out, fps=fps, temp_audiofile_path=tmp, logger=None, **encode)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--profiles", default=",".join(encode_profiles.PROFILES))
+    p.add_argument("--backend", choices=["ffmpeg", "moviepy", "segmented"], default="ffmpeg")
+    p.add_argument("--crf", type=int, default=None, help="Ép CRF cho mọi profile")
+    p.add_argument("--threads", type=int, default=None, help="Mặc định: tự tính theo CPU quota")
+    p.add_argument("--slides", type=int, default=4)
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--fps", type=int, default=30)
+    p.add_argument("--width", type=int, default=1080)
+    p.add_argument("--height", type=int, default=1920)
+    args = p.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tl, audio = build_fixture(tmp, args.slides, args.seconds, (args.width, args.height))
+        for name in args.profiles.split(","):
+            encode = encode_profiles.resolve(name, crf=args.crf, threads=args.threads)
+            out = os.path.join(tmp, f"{name}.mp4")
+            t0 = time.perf_counter()
+            render(tl, audio, out, args.fps, args.backend, encode, tmp)
+            wall = time.perf_counter() - t0
+            size = os.path.getsize(out)
+            results.append({
+                "profile": name,
+                "preset": encode["preset"],
+                "rate_control": " ".join(encode["ffmpeg_params"]) or f"-b:v {encode['bitrate']}",
+                "threads": encode["threads"],
+                "wall_s": round(wall, 3),
+                "bytes": size,
+                "kbps": round(size * 8 / 1000 / tl["duration"], 1),
+                "realtime_x": round(tl["duration"] / wall, 2),
+            })
+
+    print(json.dumps({
+        "backend": args.backend,
+        "duration_s": round(tl["duration"], 3),
+        "cpu_quota": encode_profiles.cpu_quota(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
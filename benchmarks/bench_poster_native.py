@@ -0,0 +1,109 @@
+"""
+Poster native (image_slide.native_renderer, Pillow) so với Chromium (build_html + pool Playwright):
+thời gian render mỗi poster và sai khác pixel trên từng layout 3/4/5/6 (kể cả slot placeholder).
+
+  python -m benchmarks.bench_poster_native --scale 2 --repeat 3
+Thoát mã 1 nếu sai khác trung bình của layout nào vượt --max-mean.
+Không chạy được Chromium (chưa `playwright install chromium` / thiếu thư viện hệ thống) -> ghi lý do vào
+"chromium_error" và thoát mã 2; --native-only để chỉ đo thời gian native (không so pixel, thoát 0).
+"""
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.fixtures import make_image
+from image_slide import native_renderer
+from image_slide.poster_generator import build_html
+
+CASES = [
+    ("3 (2 ảnh + placeholder)", 2),
+    ("3", 3),
+    ("4", 4),
+    ("5", 5),
+    ("6", 6),
+]
+
+
+def diff_stats(a: np.ndarray, b: np.ndarray) -> dict:
+    d = np.abs(a.astype(np.int16) - b.astype(np.int16)).max(axis=2)
+    mse = float(np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2))
+    return {
+        "mean_abs": round(float(d.mean()), 3),
+        "p99_abs": int(np.percentile(d, 99)),
+        "pct_over_16": round(100.0 * float((d > 16).mean()), 3),
+        "psnr_db": round(10 * np.log10(255 ** 2 / mse), 2) if mse else None,
+    }
+
+
+def best_of(fn, repeat):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--scale", type=int, default=2)
+    p.add_argument("--repeat", type=int, default=3, help="Lấy thời gian tốt nhất sau N lần")
+    p.add_argument("--title", default="Ưu đãi đặc biệt cuối tuần")
+    p.add_argument("--max-mean", type=float, default=4.0, help="Ngưỡng sai khác trung bình (0-255) cho mỗi layout")
+    p.add_argument("--native-only", action="store_true", help="Chỉ đo native, không cần Chromium")
+    args = p.parse_args()
+
+    results, chromium_error, failed = [], None, False
+    pool = None
+    with tempfile.TemporaryDirectory() as tmp:
+        # ảnh sản phẩm nhiều tỉ lệ khác nhau -> thử cả cover-crop ngang lẫn dọc
+        sizes = [(1200, 1200), (900, 1400), (1600, 900), (1000, 1000), (800, 1200), (1400, 1000)]
+        images = [make_image(f"{tmp}/p{i}.jpg", sizes[i], seed=i) for i in range(6)]
+
+        for name, n in CASES:
+            row = {"layout": name}
+            t_raster, _ = best_of(lambda: native_renderer.render_poster_image(
+                images[:n], args.title, scale=args.scale), args.repeat)
+            row["native_raster_ms"] = round(1000 * t_raster, 1)  # chưa tính encode PNG
+            t_native, data = best_of(lambda: native_renderer.render_poster(
+                images[:n], args.title, scale=args.scale, fmt="png"), args.repeat)
+            row["native_ms"] = round(1000 * t_native, 1)
+            native = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+            if chromium_error is None and not args.native_only:
+                try:
+                    if pool is None:
+                        from image_slide.browser_pool import get_browser_pool
+
+                        pool = get_browser_pool()
+                        pool.warmup(1)
+                    html = build_html(images[:n], args.title, self_contained=True)
+                    t_chrome, shot = best_of(lambda: pool.render(
+                        html, scale=args.scale, wait="load", image_type="png"), args.repeat)
+                    row["chromium_ms"] = round(1000 * t_chrome, 1)
+                    row["speedup"] = round(t_chrome / t_native, 1)
+                    chrome = np.asarray(Image.open(io.BytesIO(shot)).convert("RGB"))
+                    row.update(diff_stats(native, chrome))
+                    failed |= row["mean_abs"] > args.max_mean
+                except Exception as e:
+                    chromium_error = str(e).splitlines()[0]
+            results.append(row)
+
+    print(json.dumps({"scale": args.scale, "results": results, "chromium_error": chromium_error},
+                     ensure_ascii=False, indent=2))
+    if failed:
+        sys.exit(1)
+    if chromium_error is not None:
+        print(f"❌ Không so được với Chromium: {chromium_error}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
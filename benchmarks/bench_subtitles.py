@@ -0,0 +1,85 @@
+"""
+Subtitle từng từ: mỗi từ 1 clip (cách dựng cũ) so với 1 lớp SubtitleTrack (video_maker.subtitle_track).
+Đo thời gian get_frame của CompositeVideoClip (cả frame lẫn mask) và so sánh pixel từng frame lấy mẫu.
+
+  python -m benchmarks.bench_subtitles --seconds 60 --words 300 --frames 120
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import make_words
+from benchmarks.parity_ffmpeg import build_fixture
+from video_maker import timeline
+
+
+def legacy_clip(tl):
+    """to_moviepy kiểu cũ: mỗi lớp chữ (kể cả từng từ subtitle) là 1 clip riêng."""
+    from moviepy import CompositeVideoClip, ImageClip, vfx
+
+    from video_maker import image_prep
+
+    clips = [ImageClip(image_prep.load_frame(s["image"])).with_start(s["start"]).with_duration(s["duration"])
+             .with_effects([vfx.FadeIn(s["fade"]), vfx.FadeOut(s["fade"])]) for s in tl["slides"]]
+    clips += [timeline.text_clip(item) for item in tl["texts"]]
+    return CompositeVideoClip(clips, size=tl["size"])
+
+
+def time_frames(clip, ts):
+    frames = []
+    t0 = time.perf_counter()
+    for t in ts:
+        frames.append((clip.get_frame(t), clip.mask.get_frame(t) if clip.mask is not None else None))
+    return time.perf_counter() - t0, frames
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--seconds", type=float, default=60.0)
+    p.add_argument("--words", type=int, default=300)
+    p.add_argument("--frames", type=int, default=120, help="Số frame lấy mẫu (rải đều + sát ranh giới từ)")
+    p.add_argument("--fps", type=int, default=30)
+    p.add_argument("--width", type=int, default=540)
+    p.add_argument("--height", type=int, default=960)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        slides = 6
+        tl, _ = build_fixture(tmp, slides, args.seconds / slides - timeline.SLIDE_GAP, (args.width, args.height))
+        words = make_words(args.words, tl["duration"] - 0.5, seed=3)
+        tl["texts"] = [t for t in tl["texts"] if t["role"] != "subtitle"] + timeline.subtitle_texts(words, "red")
+
+        # frame đều theo fps + đúng lúc từ bắt đầu/kết thúc (chỗ fade 1ms dễ lệch nhất)
+        grid = np.arange(int(tl["duration"] * args.fps)) / args.fps
+        ts = sorted(set(np.linspace(0, len(grid) - 1, args.frames).astype(int).tolist()))
+        ts = [float(grid[i]) for i in ts] + [w["start"] for w in words[:20]] + [w["end"] - 1e-4 for w in words[:20]]
+
+        legacy = legacy_clip(tl)
+        track = timeline.to_moviepy(tl)
+        n_legacy, n_track = len(legacy.clips), len(track.clips)
+        t_legacy, f_legacy = time_frames(legacy, ts)
+        t_track, f_track = time_frames(track, ts)
+
+        max_diff = max(int(np.abs(a[0].astype(int) - b[0].astype(int)).max()) for a, b in zip(f_legacy, f_track))
+        mask_diff = max(float(np.abs(a[1] - b[1]).max()) for a, b in zip(f_legacy, f_track))
+
+    print(json.dumps({
+        "duration_s": round(tl["duration"], 2),
+        "words": args.words,
+        "frames": len(ts),
+        "layers_legacy": n_legacy,
+        "layers_track": n_track,
+        "legacy_ms_per_frame": round(1000 * t_legacy / len(ts), 2),
+        "track_ms_per_frame": round(1000 * t_track / len(ts), 2),
+        "speedup": round(t_legacy / t_track, 2),
+        "max_pixel_diff": max_diff,
+        "max_mask_diff": mask_diff,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+So sánh cách dựng chữ cũ (1 TextClip cho mỗi từ subtitle / dòng thumbnail) với video_maker.text_render
+(glyph atlas + sprite cache), kèm kiểm tra sprite ghép từ glyph trùng từng pixel với TextClip.
+
+  python -m benchmarks.bench_text --words 300 --requests 3
+Thoát mã 1 nếu có sprite khác TextClip.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import make_words
+from video_maker import text_render, timeline
+
+
+def _items(words: int, seed: int) -> list:
+    texts = timeline.thumbnail_texts("Thứ Hai - mùng 5", "#c0392b")
+    return texts + timeline.subtitle_texts(make_words(words, words * 0.4, seed=seed), "#c0392b")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--words", type=int, default=300, help="Số từ subtitle mỗi request")
+    p.add_argument("--requests", type=int, default=3, help="Số request liên tiếp (cache dùng chung)")
+    args = p.parse_args()
+
+    batches = [_items(args.words, seed) for seed in range(args.requests)]
+
+    t0 = time.perf_counter()
+    legacy = [[text_render._rasterize_full(it) for it in items] for items in batches]
+    t_legacy = time.perf_counter() - t0
+
+    per_request = []
+    t0 = time.perf_counter()
+    for items in batches:
+        t1 = time.perf_counter()
+        sprites = [text_render.render_text(it) for it in items]
+        per_request.append(round(time.perf_counter() - t1, 4))
+    t_cached = time.perf_counter() - t0
+
+    mismatched = 0
+    for items, ref in zip(batches, legacy):
+        for it, r in zip(items, ref):
+            s = text_render.render_text(it)
+            if s.shape != r.shape or np.abs(s.astype(int) - r.astype(int)).max() > 0:
+                mismatched += 1
+
+    print(json.dumps({
+        "requests": args.requests,
+        "items_per_request": len(batches[0]),
+        "textclip_s": round(t_legacy, 4),
+        "text_render_s": round(t_cached, 4),
+        "text_render_per_request_s": per_request,
+        "speedup": round(t_legacy / t_cached, 2),
+        "mismatched_sprites": mismatched,
+        "cache": text_render.stats(),
+    }, indent=2))
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+So sánh transcribe kiểu cũ (đợi tải hết + mix output.wav rồi gọi ASR 1 lần trên cả track)
+với utils.transcribe (từng clip song song ngay khi tải xong, cache theo nội dung wav).
+ASR là StubTranscriber với độ trễ tỉ lệ thời lượng audio -> chạy offline, kết quả xác định.
+
+  python -m benchmarks.bench_transcribe --count 8 --seconds 6 --latency 0.2 --arrival 0.3
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.fixtures import make_wav_dir
+from utils import transcribe
+from video_maker import audio_engine
+
+
+def simulate_downloads(wav_files, arrival, on_complete):
+    """File i 'tải xong' ở thời điểm (i + 1) * arrival; trả về thread (join = tải xong hết)."""
+    def _run():
+        t0 = time.perf_counter()
+        for i, p in enumerate(wav_files):
+            lag = (i + 1) * arrival - (time.perf_counter() - t0)
+            if lag > 0:
+                time.sleep(lag)
+            if on_complete is not None:
+                on_complete({"path": p})
+    t = threading.Thread(target=_run)
+    t.start()
+    return t
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--count", type=int, default=8, help="Số clip thoại")
+    p.add_argument("--seconds", type=float, default=6.0, help="Độ dài mỗi clip")
+    p.add_argument("--latency", type=float, default=0.2, help="Giây ASR cho mỗi giây audio")
+    p.add_argument("--arrival", type=float, default=0.3, help="Khoảng cách giữa 2 file tải xong (giây)")
+    args = p.parse_args()
+
+    stub = transcribe.StubTranscriber(latency=args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_dir = os.path.join(tmp, "audio")
+        wav_files = make_wav_dir(audio_dir, count=args.count, seconds=args.seconds)
+        output_wav = os.path.join(tmp, "output.wav")
+
+        # 1) kiểu cũ: tải hết -> mix -> ASR 1 lần trên output.wav
+        t0 = time.perf_counter()
+        simulate_downloads(wav_files, args.arrival, None).join()
+        durations = audio_engine.render_voice_track(audio_dir, output_wav, bg_track=None, silence=0.5)
+        legacy = stub.transcribe(output_wav)
+        t_legacy = time.perf_counter() - t0
+
+        # 2) từng clip song song, bắt đầu từ callback tải xong (cache lạnh)
+        def _per_clip(cache_dir):
+            t0 = time.perf_counter()
+            batch = transcribe.TranscriptionBatch(audio_dir, transcriber=stub, cache_dir=cache_dir)
+            simulate_downloads(wav_files, args.arrival, batch.on_download).join()
+            durs = audio_engine.render_voice_track(audio_dir, output_wav, bg_track=None, silence=0.5)
+            words = batch.collect(wav_files, durs, gap=0.5)
+            return words, time.perf_counter() - t0
+
+        cache_dir = os.path.join(tmp, "cache")
+        words, t_cold = _per_clip(cache_dir)
+        words_warm, t_warm = _per_clip(cache_dir)
+
+        # Mỗi từ phải nằm trong cửa sổ của đúng clip trên trục thời gian output.wav
+        windows, off = [], 0.0
+        for d in durations:
+            windows.append((off, off + d))
+            off += d + 0.5
+        inside = all(any(a - 1e-3 <= w["start"] and w["end"] <= b + 1e-3 for a, b in windows) for w in words)
+
+    print(json.dumps({
+        "clips": args.count,
+        "clip_seconds": args.seconds,
+        "asr_latency_per_audio_s": args.latency,
+        "legacy_mixed_single_call_s": round(t_legacy, 3),
+        "per_clip_parallel_cold_s": round(t_cold, 3),
+        "per_clip_cached_s": round(t_warm, 3),
+        "words_legacy": len(legacy),
+        "words_per_clip": len(words),
+        "words_inside_clip_windows": inside,
+        "cache_consistent": words == words_warm,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
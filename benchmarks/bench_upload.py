@@ -0,0 +1,108 @@
+"""
+So sánh upload sau khi encode xong với upload stream trong lúc encode (utils.storage),
+qua server lưu trữ giả lập (benchmarks.fake_storage), có thể bơm lỗi để thử retry theo chunk.
+
+  python -m benchmarks.bench_upload --fail-rate 0.1                # writer giả lập ghi 40 MB ở 20 MB/s
+  python -m benchmarks.bench_upload --encode --slides 3            # encode thật (ffmpeg backend, mp4 fragmented)
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_storage import serve
+from utils import storage
+
+
+def fake_encoder(path, total_bytes, rate_bytes_s, block=256 * 1024):
+    """Ghi file tuần tự với tốc độ cố định (giả lập encoder)."""
+    data = os.urandom(block)
+    written = 0
+    t0 = time.perf_counter()
+    with open(path, "wb") as f:
+        while written < total_bytes:
+            n = min(block, total_bytes - written)
+            f.write(data[:n])
+            f.flush()
+            written += n
+            lag = written / rate_bytes_s - (time.perf_counter() - t0)
+            if lag > 0:
+                time.sleep(lag)
+
+
+def real_encoder(tmp, slides):
+    from benchmarks.parity_ffmpeg import build_fixture
+    from video_maker import encode_profiles, ffmpeg_backend
+
+    tl, audio = build_fixture(tmp, slides, 3.0, (1080, 1920))
+    encode = encode_profiles.resolve("draft", streamable=True)
+
+    def _write(path):
+        ffmpeg_backend.render_timeline(tl, audio, path, fps=30, work_dir=os.path.join(tmp, "ff"), **encode)
+    return _write
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--mb", type=float, default=40.0, help="Dung lượng file giả lập")
+    p.add_argument("--rate", type=float, default=20.0, help="Tốc độ ghi giả lập (MB/s)")
+    p.add_argument("--encode", action="store_true", help="Encode thật thay cho writer giả lập")
+    p.add_argument("--slides", type=int, default=3)
+    p.add_argument("--chunk-mb", type=float, default=2.0)
+    p.add_argument("--fail-rate", type=float, default=0.0)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, base_url, stats = serve(os.path.join(tmp, "remote"), fail_rate=args.fail_rate)
+        backend = storage.HTTPBackend(base_url, chunk_size=int(args.chunk_mb * 1024 * 1024))
+        storage._backends["bench"] = backend
+        if args.encode:
+            write = real_encoder(tmp, args.slides)
+        else:
+            def write(path):
+                fake_encoder(path, int(args.mb * 1024 * 1024), args.rate * 1024 * 1024)
+
+        # 1) encode xong rồi mới upload
+        seq_path = os.path.join(tmp, "seq.mp4")
+        t0 = time.perf_counter()
+        write(seq_path)
+        t_write = time.perf_counter() - t0
+        backend.upload(seq_path, "seq.mp4")
+        t_seq = time.perf_counter() - t0
+
+        # 2) upload stream trong lúc encode
+        stream_path = os.path.join(tmp, "stream.mp4")
+        up = storage.StreamingUpload("stream.mp4", backend="bench")
+        t0 = time.perf_counter()
+        up.attach(stream_path)
+        w = threading.Thread(target=write, args=(stream_path,))
+        w.start()
+        w.join()
+        up.finish()
+        t_stream = time.perf_counter() - t0
+        streamed_ok = up.reader.matches_file()
+
+        size = os.path.getsize(stream_path)
+        same = filecmp.cmp(stream_path, os.path.join(tmp, "remote", "stream.mp4"), shallow=False)
+        server.shutdown()
+
+    print(json.dumps({
+        "source": "ffmpeg" if args.encode else "synthetic",
+        "bytes": size,
+        "write_s": round(t_write, 3),
+        "write_then_upload_s": round(t_seq, 3),
+        "streaming_s": round(t_stream, 3),
+        "saved_s": round(t_seq - t_stream, 3),
+        "stream_matched_final_file": streamed_ok,
+        "remote_identical": same,
+        "chunk_retries": backend.chunk_retries,
+        "server": stats,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
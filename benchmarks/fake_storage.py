@@ -0,0 +1,110 @@
+"""
+Server lưu trữ giả lập cho utils.storage.HTTPBackend (không cần cloud):
+PUT /<object> với Content-Range: bytes a-b/total ('*' khi chưa biết tổng) -> 308 (chưa xong) / 201 (xong),
+GET/HEAD /<object> trả lại file đã ghép. --fail-rate giả lập lỗi 503 ngẫu nhiên để thử retry theo chunk.
+
+  python -m benchmarks.fake_storage --root /tmp/fake_gcs --port 8790 --fail-rate 0.1
+"""
+
+import argparse
+import os
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+_RANGE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+def make_handler(root: str, fail_rate=0.0, stats=None):
+    stats = stats if stats is not None else {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _path(self):
+            name = unquote(self.path.lstrip("/")).replace("..", "_")
+            return os.path.join(root, name)
+
+        def do_PUT(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            with lock:
+                stats["requests"] = stats.get("requests", 0) + 1
+            if fail_rate and random.random() < fail_rate:
+                with lock:
+                    stats["injected_failures"] = stats.get("injected_failures", 0) + 1
+                self.send_response(503)
+                self.end_headers()
+                return
+            m = _RANGE.fullmatch(self.headers.get("Content-Range", ""))
+            if not m:
+                self.send_response(400)
+                self.end_headers()
+                return
+            path = self._path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = path + ".part"
+            if m.group(1) is not None:
+                start = int(m.group(1))
+                with open(part, "r+b" if os.path.exists(part) else "wb") as f:
+                    f.seek(start)
+                    f.write(body)
+                with lock:
+                    stats["bytes"] = stats.get("bytes", 0) + len(body)
+            elif not os.path.exists(part):
+                open(part, "wb").close()
+            total = m.group(3)
+            if total != "*" and os.path.getsize(part) >= int(total):
+                with open(part, "r+b") as f:
+                    f.truncate(int(total))
+                os.replace(part, path)
+                self.send_response(201)
+            else:
+                self.send_response(308)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self, body=True):
+            path = self._path()
+            if not os.path.isfile(path):
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            if body:
+                with open(path, "rb") as f:
+                    self.wfile.write(f.read())
+
+        def do_HEAD(self):
+            self.do_GET(body=False)
+
+    return Handler
+
+
+def serve(root: str, port=0, fail_rate=0.0):
+    """Chạy server trên thread nền, trả về (server, base_url, stats)."""
+    stats = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(root, fail_rate, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", stats
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--root", default="/tmp/fake_storage")
+    p.add_argument("--port", type=int, default=8790)
+    p.add_argument("--fail-rate", type=float, default=0.0)
+    args = p.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.root, args.fail_rate))
+    print(f"Fake storage: http://127.0.0.1:{args.port} -> {args.root}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
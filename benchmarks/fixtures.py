@@ -0,0 +1,116 @@
+"""
+Sinh dữ liệu giả lập (chạy local, không cần mạng) cho các benchmark.
+"""
+
+import os
+import wave
+
+import numpy as np
+
+
+def make_wav(path: str, seconds: float, sr=24000, freq=220.0, noise=0.05, channels=1, seed=0) -> str:
+    """Sine + nhiễu trắng, PCM 16-bit."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    x = 0.4 * np.sin(2 * np.pi * freq * t) + noise * rng.standard_normal(len(t))
+    pcm = (np.clip(x, -1, 1) * 32767).astype("<i2")
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return path
+
+
+def make_wav_dir(audio_dir: str, count=10, seconds=6.0, sr=24000, channels=1) -> list:
+    """count file 1.wav..N.wav (tần số khác nhau cho dễ nghe phân biệt)."""
+    return [
+        make_wav(os.path.join(audio_dir, f"{i + 1}.wav"), seconds, sr=sr, freq=180.0 + 40 * i,
+                 channels=channels, seed=i)
+        for i in range(count)
+    ]
+
+
+def make_image(path: str, size=(1080, 1920), seed=0) -> str:
+    """Ảnh gradient + khối màu ngẫu nhiên (có chi tiết để so sánh frame có ý nghĩa)."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = rng.integers(0, 255, 3)
+    img = np.empty((h, w, 3), np.uint8)
+    for c in range(3):
+        img[..., c] = (base[c] + 120 * xx / w + 80 * yy / h + 40 * c) % 256
+    for _ in range(6):
+        x0, y0 = rng.integers(0, w - 100), rng.integers(0, h - 100)
+        img[y0:y0 + rng.integers(50, 300), x0:x0 + rng.integers(50, 300)] = rng.integers(0, 255, 3)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ext = os.path.splitext(path)[1].lower()
+    Image.fromarray(img).save(path, quality=90) if ext in (".jpg", ".jpeg") else Image.fromarray(img).save(path)
+    return path
+
+
+def make_words(n_words=40, total_seconds=20.0, seed=0, offset=0.0) -> list:
+    """Subtitle từng từ giả lập, cùng dạng với convert_srt_to_json."""
+    rng = np.random.default_rng(seed)
+    vocab = ["Kính", "chào", "quý", "vị", "hôm", "nay", "là", "ngày", "tốt", "nên", "không", "xuất", "hành",
+             "cưới", "hỏi", "khai", "trương", "mệnh", "Hỏa", "Thủy"]
+    step = total_seconds / max(n_words, 1)
+    out = []
+    for i in range(n_words):
+        start = offset + i * step + float(rng.uniform(0, step * 0.2))
+        end = offset + (i + 1) * step - float(rng.uniform(0, step * 0.2))
+        out.append({"index": i + 1, "start": round(start, 3), "end": round(end, 3),
+                    "content": vocab[int(rng.integers(0, len(vocab)))]})
+    return out
+
+
+def make_srt(words) -> str:
+    """list {start, end, content} (vd. make_words) -> nội dung .srt word-level như Gemini trả về."""
+    def ts(t):
+        ms = int(round(t * 1000))
+        return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+    return "".join(f"{i}\n{ts(w['start'])} --> {ts(w['end'])}\n{w['content']}\n\n"
+                   for i, w in enumerate(words, 1))
+
+
+def make_speech_wav(path: str, text: str, sr=24000, seed=0, lead=0.35, tail=0.3) -> list:
+    """
+    "Giọng nói" tổng hợp có đáp án: mỗi âm tiết là 1 chùm sine có envelope, giữa các từ nghỉ ngắn,
+    sau dấu câu nghỉ dài. Trả về list {start, end, content} thật của từng từ.
+    """
+    from utils.align import syllables
+
+    rng = np.random.default_rng(seed)
+    parts, truth, t = [np.zeros(int(lead * sr), np.float32)], [], lead
+    for w in text.split():
+        n = syllables(w)
+        seg = []
+        for _ in range(n):
+            d = float(rng.uniform(0.16, 0.26))
+            tt = np.arange(int(d * sr)) / sr
+            env = np.sin(np.pi * tt / d) ** 0.5
+            f0 = float(rng.uniform(110, 220))
+            seg.append((0.5 * env * (np.sin(2 * np.pi * f0 * tt) + 0.4 * np.sin(4 * np.pi * f0 * tt)))
+                       .astype(np.float32))
+        word = np.concatenate(seg)
+        truth.append({"start": round(t, 3), "end": round(t + len(word) / sr, 3), "content": w})
+        gap = float(rng.uniform(0.25, 0.45)) if w[-1] in ".,!?;:" else float(rng.uniform(0.0, 0.04))
+        parts += [word, np.zeros(int(gap * sr), np.float32)]
+        t += (len(word) + int(gap * sr)) / sr
+    parts.append(np.zeros(int(tail * sr), np.float32))
+    x = np.concatenate(parts)
+    x += 0.003 * rng.standard_normal(len(x)).astype(np.float32)
+    pcm = (np.clip(x, -1, 1) * 32767).astype("<i2")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+    return truth
@@ -0,0 +1,108 @@
+"""
+Kiểm tra backend ffmpeg (video_maker.ffmpeg_backend) cho ra cùng hình với backend MoviePy
+trên 1 timeline tổng hợp (slide + fade + chữ thumbnail + subtitle), kèm thời gian render.
+
+  python -m benchmarks.parity_ffmpeg --slides 4 --fps 24
+Luôn chạy thêm EXTRA_CASES (slide ngắn, fps thấp: fade/crossfade chỉ vài frame, biên slide không
+trùng biên frame) trừ khi --no-extra. Thoát mã 1 nếu PSNR nhỏ nhất của case nào < --min-psnr.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import make_image, make_wav, make_words
+from video_maker import ffmpeg_backend, image_prep, timeline
+
+EXTRA_CASES = [
+    dict(slides=2, seconds=1.5, fps=12, width=360, height=640),
+    dict(slides=3, seconds=1.37, fps=25, width=360, height=640),
+]
+
+
+def build_fixture(tmp, slides, seconds, size):
+    # ảnh nguồn lệch khung, qua image_prep như make_video (cả 2 backend đọc cùng frame .rgb)
+    src_size = (size[0] + 240, size[1] + 160)
+    sources = [make_image(os.path.join(tmp, f"{i + 1}.png"), size=src_size, seed=i) for i in range(slides)]
+    images = image_prep.prepare_images(sources, size=size, out_dir=os.path.join(tmp, "frames"),
+                                       cache_dir=os.path.join(tmp, "prep_cache"))
+    durations = [seconds] * slides
+    total = sum(d + timeline.SLIDE_GAP for d in durations)
+    texts = timeline.thumbnail_texts("Tân Sửu - mệnh Thổ", "red", start=0, duration=min(10, total)) \
+        + timeline.subtitle_texts(make_words(int(total * 2), total - 0.5, seed=1), "red")
+    audio = make_wav(os.path.join(tmp, "output.wav"), total - timeline.SLIDE_GAP)
+    return timeline.build_timeline(images, durations, texts=texts, size=size), audio
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def run_case(slides, seconds, fps, width, height, samples, preset) -> dict:
+    """Render cùng 1 timeline bằng MoviePy và ffmpeg, so PSNR tại `samples` thời điểm."""
+    from moviepy import VideoFileClip
+
+    encode = dict(codec="libx264", audio_codec="aac", preset=preset, bitrate="5000k", threads=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        tl, audio = build_fixture(tmp, slides, seconds, (width, height))
+        out_mp, out_ff = os.path.join(tmp, "moviepy.mp4"), os.path.join(tmp, "ffmpeg.mp4")
+
+        t0 = time.perf_counter()
+        timeline.to_moviepy(tl, audio_path=audio).write_videofile(
+            out_mp, fps=fps, temp_audiofile_path=tmp, logger=None, **encode)
+        t_mp = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ffmpeg_backend.render_timeline(tl, audio, out_ff, fps=fps, work_dir=os.path.join(tmp, "ff"), **encode)
+        t_ff = time.perf_counter() - t0
+
+        a, b = VideoFileClip(out_mp), VideoFileClip(out_ff)
+        # lấy mẫu giữa các frame để tránh lệch biên frame
+        times = np.linspace(0.0, tl["duration"] - 1.0 / fps, samples) + 0.5 / fps
+        scores = [psnr(a.get_frame(t), b.get_frame(t)) for t in times]
+        report = {
+            "case": f"{slides}x{seconds}s {fps}fps {width}x{height}",
+            "duration_s": round(tl["duration"], 3),
+            "moviepy_duration_s": round(a.duration, 3),
+            "ffmpeg_duration_s": round(b.duration, 3),
+            "moviepy_render_s": round(t_mp, 3),
+            "ffmpeg_render_s": round(t_ff, 3),
+            "speedup": round(t_mp / t_ff, 2),
+            "psnr_min": round(min(scores), 2),
+            "psnr_mean": round(float(np.mean([s for s in scores if np.isfinite(s)] or [99.0])), 2),
+        }
+        a.close()
+        b.close()
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--slides", type=int, default=4)
+    p.add_argument("--seconds", type=float, default=3.0, help="Độ dài thoại mỗi slide")
+    p.add_argument("--fps", type=int, default=24)
+    p.add_argument("--width", type=int, default=1080)
+    p.add_argument("--height", type=int, default=1920)
+    p.add_argument("--samples", type=int, default=12, help="Số thời điểm lấy frame để so sánh")
+    p.add_argument("--min-psnr", type=float, default=30.0)
+    p.add_argument("--preset", default="veryfast")
+    p.add_argument("--no-extra", action="store_true", help="Chỉ chạy case theo tham số, bỏ EXTRA_CASES")
+    args = p.parse_args()
+
+    cases = [dict(slides=args.slides, seconds=args.seconds, fps=args.fps, width=args.width, height=args.height)]
+    if not args.no_extra:
+        cases += [c for c in EXTRA_CASES if c not in cases]
+    reports = [run_case(samples=args.samples, preset=args.preset, **c) for c in cases]
+
+    print(json.dumps(reports, indent=2))
+    sys.exit(0 if all(r["psnr_min"] >= args.min_psnr for r in reports) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Benchmark từng stage của pipeline video (merge_video / make_video) và poster trên dữ liệu giả lập local:
+wav sine + nhiễu, ảnh ngẫu nhiên nhiều độ phân giải, SRT word-level, phục vụ qua HTTP local (fake_storage).
+
+Stage: download (download_assets) -> durations (decode thoại) -> bg_loop (bg_music.build_loop)
+-> mix (mix_track + write_wav) -> subtitles (parse SRT + offset + text timeline) -> images (image_prep,
+cache lạnh) -> timeline (build_timeline + to_moviepy) -> encode -> poster_html (build_html)
+-> poster_native -> poster_chromium (html_string_to_image).
+
+  python -m benchmarks.run --out result.json
+  python -m benchmarks.run --save-baseline benchmarks/baseline.json     # chốt số liệu trên máy này
+  python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+  python -m benchmarks.run --skip encode,poster_chromium --clips 10 --clip-seconds 6
+
+Mỗi stage lấy thời gian tốt nhất sau --repeat lần (encode và poster_chromium chạy 1 lần).
+Stage lỗi (vd. chưa `playwright install chromium`) ghi "error" rồi chạy tiếp.
+So baseline: chậm hơn quá (1 + tolerance) lần VÀ quá --min-delta-ms -> regression, thoát mã 1.
+Baseline phụ thuộc máy: chỉ so với baseline chốt trên cùng máy / cùng cấu hình.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import make_image, make_srt, make_wav, make_words
+
+STAGES = ["download", "durations", "bg_loop", "mix", "subtitles", "images", "timeline", "encode",
+          "poster_html", "poster_native", "poster_chromium"]
+SINGLE_RUN = {"encode", "poster_chromium"}
+POSTER_TITLE = "Ưu đãi đặc biệt cuối tuần"
+
+
+def parse_size(s: str) -> tuple:
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+class Runner:
+    def __init__(self, repeat: int, skip):
+        self.repeat = repeat
+        self.skip = set(skip)
+        self.stages = {}
+
+    def stage(self, name: str, fn, **extra):
+        """Chạy fn() (repeat lần, trừ SINGLE_RUN), ghi ms tốt nhất; trả về kết quả lần cuối (None nếu skip/lỗi)."""
+        if name in self.skip:
+            self.stages[name] = {"skipped": True}
+            return None
+        runs = 1 if name in SINGLE_RUN else self.repeat
+        times, out = [], None
+        try:
+            with contextlib.redirect_stdout(sys.stderr):  # log của pipeline không lẫn vào JSON trên stdout
+                for _ in range(runs):
+                    t0 = time.perf_counter()
+                    out = fn()
+                    times.append(time.perf_counter() - t0)
+        except Exception as e:
+            self.stages[name] = {"error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+            print(f"⚠️ Stage {name} lỗi: {self.stages[name]['error']}", file=sys.stderr)
+            return None
+        self.stages[name] = {"ms": round(1000 * min(times), 1), "runs": runs, **extra}
+        return out
+
+
+def build_fixtures(src: str, args) -> dict:
+    """wav + ảnh nguồn (để server phục vụ) và SRT word-level cho từng clip."""
+    wavs = [make_wav(os.path.join(src, f"voice_{i + 1}.wav"), args.clip_seconds, freq=180.0 + 40 * i, seed=i)
+            for i in range(args.clips)]
+    sizes = [parse_size(s) for s in args.image_sizes.split(",")]
+    images = []
+    for i in range(args.images):
+        w, h = sizes[i % len(sizes)]
+        ext = ".jpg" if i % 2 else ".png"  # download_assets luôn đặt đuôi .png -> image_prep phải sniff lại
+        images.append(make_image(os.path.join(src, f"img_{i + 1}{ext}"), (w, h), seed=i))
+    words_per_clip = max(1, int(args.clip_seconds * 2.5))
+    srts = [make_srt(make_words(words_per_clip, args.clip_seconds - 0.2, seed=i)) for i in range(args.clips)]
+    return {"wavs": wavs, "images": images, "srts": srts}
+
+
+def compare(stages: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    regressions = []
+    for name, cur in stages.items():
+        base = baseline.get("stages", {}).get(name, {})
+        if "ms" not in cur or "ms" not in base:
+            continue
+        ratio = cur["ms"] / base["ms"] if base["ms"] else float("inf")
+        cur["baseline_ms"] = base["ms"]
+        cur["ratio"] = round(ratio, 2)
+        if ratio > 1 + tolerance and cur["ms"] - base["ms"] > min_delta_ms:
+            regressions.append({"stage": name, "ms": cur["ms"], "baseline_ms": base["ms"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--clips", type=int, default=4, help="Số wav thoại")
+    p.add_argument("--clip-seconds", type=float, default=3.0)
+    p.add_argument("--images", type=int, default=4)
+    p.add_argument("--image-sizes", default="1080x1920,1600x900,3000x4000,800x800")
+    p.add_argument("--size", default="1080x1920", help="Khung video")
+    p.add_argument("--fps", type=int, default=30)
+    p.add_argument("--profile", default="draft", help="Profile encode (video_maker.encode_profiles)")
+    p.add_argument("--backend", choices=["moviepy", "ffmpeg", "segmented"], default="moviepy")
+    p.add_argument("--poster-scale", type=int, default=2)
+    p.add_argument("--repeat", type=int, default=3, help="Lấy thời gian tốt nhất sau N lần")
+    p.add_argument("--skip", default="", help=f"Bỏ qua stage (phân tách bằng dấu phẩy): {','.join(STAGES)}")
+    p.add_argument("--out", default=None, help="Ghi JSON kết quả ra file (mặc định chỉ in ra stdout)")
+    p.add_argument("--baseline", default=None, help="JSON baseline để so sánh")
+    p.add_argument("--save-baseline", default=None, help="Ghi kết quả lần này làm baseline")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Chậm hơn quá (1 + tolerance) lần -> regression")
+    p.add_argument("--min-delta-ms", type=float, default=50.0, help="Bỏ qua chênh lệch tuyệt đối nhỏ (nhiễu)")
+    args = p.parse_args()
+
+    skip = [s for s in args.skip.split(",") if s]
+    unknown = set(skip) - set(STAGES)
+    if unknown:
+        p.error(f"stage không tồn tại: {', '.join(sorted(unknown))}")
+
+    # đo đường tải thật qua HTTP, không đọc lại từ asset cache (đặt trước khi import utils.downloader)
+    os.environ.setdefault("ASSET_CACHE_ENABLED", "0")
+    from benchmarks.bench_encode import render
+    from benchmarks.fake_storage import serve
+    from image_slide import native_renderer
+    from image_slide.poster_generator import build_html, html_string_to_image
+    from utils.convert_srt_file_to_json import parse_srt
+    from utils.transcribe import offset_words
+    from video_maker import audio_engine, bg_music, encode_profiles, image_prep, timeline
+    from video_maker.concat_video import download_assets
+
+    size = parse_size(args.size)
+    run = Runner(args.repeat, skip)
+    config = {k: getattr(args, k) for k in ("clips", "clip_seconds", "images", "image_sizes", "size", "fps",
+                                            "profile", "backend", "poster_scale", "repeat")}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        fx = build_fixtures(src, args)
+        server, base_url, _ = serve(src)
+        wav_urls = [f"{base_url}/{os.path.basename(p)}" for p in fx["wavs"]]
+        image_urls = [f"{base_url}/{os.path.basename(p)}" for p in fx["images"]]
+        audio_dir, image_dir = os.path.join(tmp, "audio"), os.path.join(tmp, "image")
+
+        def download():
+            shutil.rmtree(audio_dir, ignore_errors=True)
+            shutil.rmtree(image_dir, ignore_errors=True)
+            return download_assets(wav_urls, image_urls, audio_dir, image_dir)
+
+        results = run.stage("download", download, files=len(wav_urls) + len(image_urls),
+                            bytes=sum(os.path.getsize(p) for p in fx["wavs"] + fx["images"]))
+        server.shutdown()
+        if results is None:  # stage tải bị skip/lỗi -> các stage sau dùng thẳng fixture
+            os.makedirs(audio_dir, exist_ok=True)
+            os.makedirs(image_dir, exist_ok=True)
+            for i, path in enumerate(fx["wavs"]):
+                shutil.copy(path, os.path.join(audio_dir, f"{i + 1}.wav"))
+            for i, path in enumerate(fx["images"]):
+                shutil.copy(path, os.path.join(image_dir, f"{i + 1}.png"))
+
+        wav_files = audio_engine.list_wavs(audio_dir)
+        clips, durations = audio_engine.load_clips(wav_files)
+        run.stage("durations", lambda: audio_engine.load_clips(wav_files))
+
+        bg_seconds = sum(durations) + len(durations) * 0.5
+        run.stage("bg_loop", lambda: bg_music.build_loop(bg_music.DEFAULT_TRACK, bg_seconds))
+        bg = bg_music.build_loop(bg_music.DEFAULT_TRACK, bg_seconds)
+
+        output_wav = os.path.join(tmp, "output.wav")
+        run.stage("mix", lambda: audio_engine.write_wav(
+            output_wav, audio_engine.mix_track(clips, silence=0.5, bg=bg)))
+        if not os.path.exists(output_wav):
+            audio_engine.write_wav(output_wav, audio_engine.mix_track(clips, silence=0.5, bg=bg))
+
+        def subtitles():
+            words = offset_words([parse_srt(s) for s in fx["srts"]], durations, gap=0.5)
+            return timeline.thumbnail_texts("Tân Sửu - mệnh Thổ", "red", start=0, duration=10) \
+                + timeline.subtitle_texts(words, "red")
+
+        texts = run.stage("subtitles", subtitles, words=sum(s.count("-->") for s in fx["srts"]))
+        texts = texts if texts is not None else []
+
+        prep_runs = itertools.count()
+
+        def images():
+            k = next(prep_runs)  # cache_dir mới mỗi lần -> luôn đo đường cache lạnh
+            # list lại mỗi lần: lần đầu đổi đuôi ảnh theo định dạng thật như trong make_video
+            return image_prep.prepare_images(image_prep.list_images(image_dir), size=size, out_dir=os.path.join(tmp, f"frames{k}"),
+                                             cache_dir=os.path.join(tmp, f"prep_cache{k}"))
+
+        image_paths = run.stage("images", images) or images()
+
+        def build():
+            tl = timeline.build_timeline(image_paths, durations, texts=texts, gap=0.5, size=size)
+            if args.backend == "moviepy":
+                timeline.to_moviepy(tl, audio_path=output_wav).close()
+            return tl
+
+        tl = run.stage("timeline", build) or timeline.build_timeline(
+            image_paths, durations, texts=texts, gap=0.5, size=size)
+
+        out_mp4 = os.path.join(tmp, "bench.mp4")
+        encode = encode_profiles.resolve(args.profile)
+        run.stage("encode", lambda: render(tl, output_wav, out_mp4, args.fps, args.backend, encode, tmp),
+                  video_seconds=round(tl["duration"], 2), profile=args.profile, backend=args.backend)
+        if "ms" in run.stages["encode"]:
+            run.stages["encode"]["bytes"] = os.path.getsize(out_mp4)
+            run.stages["encode"]["realtime_x"] = round(tl["duration"] * 1000 / run.stages["encode"]["ms"], 2)
+
+        # poster: mọi layout 3..6 ảnh trong 1 stage, dùng ảnh nguồn chưa fit khung
+        poster_images = [fx["images"][i % len(fx["images"])] for i in range(6)]
+        layouts = [poster_images[:n] for n in (3, 4, 5, 6)]
+        htmls = run.stage("poster_html", lambda: [build_html(imgs, POSTER_TITLE, self_contained=True)
+                                                  for imgs in layouts], layouts=len(layouts))
+        run.stage("poster_native", lambda: [native_renderer.render_poster(
+            imgs, POSTER_TITLE, scale=args.poster_scale, fmt="png") for imgs in layouts], layouts=len(layouts))
+        htmls = htmls or [build_html(imgs, POSTER_TITLE, self_contained=True) for imgs in layouts]
+        run.stage("poster_chromium", lambda: [html_string_to_image(
+            html, os.path.join(tmp, f"poster{i}.png"), scale=args.poster_scale, wait="load")
+            for i, html in enumerate(htmls)], layouts=len(layouts))
+
+    report = {
+        "config": config,
+        "env": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "stages": run.stages,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(run.stages, baseline, args.tolerance, args.min_delta_ms)
+        report["baseline"] = {"path": args.baseline, "config_matches": baseline.get("config") == config,
+                              "tolerance": args.tolerance}
+        report["regressions"] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    for path in filter(None, (args.out, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
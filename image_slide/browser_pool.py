@@ -0,0 +1,365 @@
+"""
+Pool Chromium sống lâu (Playwright async) cho render poster ngay trong process.
+
+Trước đây mỗi request chạy `python -m image_slide.poster_generator` (khởi động interpreter) rồi
+sync_playwright() + chromium.launch() chỉ để chụp 1 ảnh. Ở đây:
+- Event loop riêng trên 1 thread nền; render(...) gọi được từ code sync (endpoint FastAPI, CLI)
+- Tối đa POSTER_BROWSERS browser, mỗi browser tối đa POSTER_PAGES_PER_BROWSER page đồng thời;
+  mỗi request 1 context + page mới (không lẫn cookie/cache giữa các poster), browser launch lười khi cần
+- Recycle browser sau POSTER_RECYCLE_RENDERS lần render hoặc khi RSS (browser + tiến trình con)
+  vượt POSTER_MAX_RSS_MB: dựng browser thay thế ngay, browser cũ đóng khi đã xong các page đang chạy
+- Health check định kỳ trên browser rảnh (mất kết nối / không mở được context -> thay mới);
+  browser chết giữa lúc render -> thử lại 1 lần trên browser khác
+"""
+
+import asyncio
+import atexit
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+POOL_BROWSERS = int(os.getenv("POSTER_BROWSERS", "2"))
+WARM_BROWSERS = int(os.getenv("POSTER_WARM_BROWSERS", "1"))           # launch sẵn lúc API khởi động
+PAGES_PER_BROWSER = int(os.getenv("POSTER_PAGES_PER_BROWSER", "4"))
+RECYCLE_RENDERS = int(os.getenv("POSTER_RECYCLE_RENDERS", "200"))
+MAX_RSS_MB = float(os.getenv("POSTER_MAX_RSS_MB", "1024"))           # 0 = không kiểm tra RSS
+HEALTH_INTERVAL = float(os.getenv("POSTER_HEALTH_INTERVAL", "30"))
+RENDER_TIMEOUT = float(os.getenv("POSTER_RENDER_TIMEOUT", "60"))
+LAUNCH_ARGS = ["--disable-dev-shm-usage", "--no-sandbox"]
+
+_MARKER = "--poster-pool-id="  # switch lạ Chromium bỏ qua, dùng để tìm pid browser trong /proc
+
+
+def _proc_table() -> dict:
+    """pid -> (ppid, các tham số cmdline) của mọi process (Linux /proc)."""
+    table = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                stat = f.read().decode("utf-8", "replace")
+            with open(f"/proc/{name}/cmdline", "rb") as f:
+                args = f.read().decode("utf-8", "replace").split("\0")
+        except OSError:
+            continue
+        ppid = int(stat[stat.rfind(")") + 2:].split()[1])
+        table[int(name)] = (ppid, args)
+    return table
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def tree_rss_mb(marker: str):
+    """RSS (MB) của process browser có tham số marker + toàn bộ con cháu; None nếu không tìm thấy."""
+    if not os.path.isdir("/proc"):
+        return None
+    table = _proc_table()
+    roots = [pid for pid, (_, args) in table.items() if marker in args]
+    if not roots:
+        return None
+    children = {}
+    for pid, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    total, stack, seen = 0, list(roots), set()
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += _rss_kb(pid)
+        stack.extend(children.get(pid, ()))
+    return total / 1024.0
+
+
+class _Slot:
+    def __init__(self, browser, marker):
+        self.browser = browser
+        self.marker = marker
+        self.active = 0
+        self.renders = 0
+        self.launched_at = time.time()
+        self.retiring = False
+        self.dead = False
+
+    def usable(self) -> bool:
+        return not (self.retiring or self.dead) and self.browser.is_connected()
+
+
+class BrowserPool:
+    def __init__(self, browsers=POOL_BROWSERS, pages_per_browser=PAGES_PER_BROWSER,
+                 recycle_renders=RECYCLE_RENDERS, max_rss_mb=MAX_RSS_MB, health_interval=HEALTH_INTERVAL):
+        self.browsers = max(1, browsers)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.recycle_renders = recycle_renders
+        self.max_rss_mb = max_rss_mb
+        self.health_interval = health_interval
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="poster-browser-pool", daemon=True)
+        self._thread.start()
+        self._pw = None
+        self._slots = []
+        self._cond = None
+        self._health_task = None
+        self._closed = False
+
+        self.launches = 0
+        self.recycled = 0
+        self.replaced_unhealthy = 0
+        self.renders = 0
+        self.retries = 0
+
+    # ---- API sync (gọi từ thread bất kỳ) ----
+    def _call(self, coro, timeout=None):
+        if self._closed:
+            raise RuntimeError("BrowserPool đã đóng.")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def render(self, html: str, size=(1080, 1350), scale=2, wait="load", image_type="png",
+               quality=None, transparent=False, base_dir=None, timeout=RENDER_TIMEOUT) -> bytes:
+        """HTML -> bytes ảnh (png/jpeg). base_dir: thư mục đặt file HTML tạm (đường dẫn tương đối của ảnh)."""
+        return self._call(self.render_async(html, size=size, scale=scale, wait=wait, image_type=image_type,
+                                            quality=quality, transparent=transparent, base_dir=base_dir,
+                                            timeout=timeout), timeout=timeout * 2 + 30)
+
+    def render_many(self, jobs, timeout=RENDER_TIMEOUT) -> list:
+        """
+        Render nhiều trang đồng thời (jobs: list kwargs của render), song song tới browsers x pages_per_browser
+        page; lấp page của browser đang chạy trước khi launch thêm. Job lỗi trả về Exception thay vì bytes.
+        """
+        async def _all():
+            return await asyncio.gather(*(self.render_async(**dict(job, timeout=timeout)) for job in jobs),
+                                        return_exceptions=True)
+
+        rounds = -(-len(jobs) // (self.browsers * self.pages_per_browser)) or 1
+        return self._call(_all(), timeout=rounds * (timeout * 2 + 30))
+
+    def warmup(self, n=1) -> int:
+        """Launch sẵn n browser (lúc startup) để request đầu không phải chờ."""
+        return self._call(self._warmup(n), timeout=120)
+
+    def stats(self) -> dict:
+        return self._call(self._stats(), timeout=30)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            self._call(self._shutdown(), timeout=30)
+        except Exception:
+            pass
+        self._closed = True
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ---- bên trong event loop ----
+    async def _ensure_started(self):
+        if self._pw is None:
+            try:
+                from playwright.async_api import async_playwright
+            except Exception as e:
+                raise RuntimeError(
+                    "Thiếu playwright. Cài bằng: pip install playwright && playwright install chromium"
+                ) from e
+            self._cond = asyncio.Condition()
+            self._pw = await async_playwright().start()
+            if self.health_interval:
+                self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def _launch(self) -> _Slot:
+        marker = _MARKER + uuid.uuid4().hex
+        browser = await self._pw.chromium.launch(headless=True, args=LAUNCH_ARGS + [marker])
+        slot = _Slot(browser, marker)
+        browser.on("disconnected", lambda _b: setattr(slot, "dead", True))
+        self.launches += 1
+        return slot
+
+    async def _warmup(self, n):
+        await self._ensure_started()
+        async with self._cond:
+            while len([s for s in self._slots if s.usable()]) < min(n, self.browsers):
+                self._slots.append(await self._launch())
+            return len(self._slots)
+
+    async def _acquire(self) -> _Slot:
+        await self._ensure_started()
+        async with self._cond:
+            while True:
+                await self._reap()
+                live = [s for s in self._slots if s.usable()]
+                free = [s for s in live if s.active < self.pages_per_browser]
+                if free:
+                    slot = min(free, key=lambda s: s.active)
+                elif len(live) < self.browsers:
+                    slot = await self._launch()
+                    self._slots.append(slot)
+                else:
+                    await self._cond.wait()
+                    continue
+                slot.active += 1
+                return slot
+
+    async def _release(self, slot: _Slot, ok: bool):
+        async with self._cond:
+            slot.active -= 1
+            if ok:
+                slot.renders += 1
+                self.renders += 1
+            if not slot.retiring and not slot.dead:
+                reason = None
+                if self.recycle_renders and slot.renders >= self.recycle_renders:
+                    reason = f"{slot.renders} lần render"
+                elif self.max_rss_mb:
+                    rss = await asyncio.get_running_loop().run_in_executor(None, tree_rss_mb, slot.marker)
+                    if rss is not None and rss > self.max_rss_mb:
+                        reason = f"RSS {rss:.0f} MB"
+                if reason:
+                    print(f"♻️ Recycle Chromium ({reason})")
+                    slot.retiring = True
+                    self.recycled += 1
+            await self._reap()
+            self._cond.notify_all()
+
+    async def _reap(self):
+        """Đóng browser đã retire/chết khi không còn page nào đang chạy trên nó."""
+        keep = []
+        for s in self._slots:
+            if (s.retiring or s.dead or not s.browser.is_connected()) and s.active == 0:
+                try:
+                    await s.browser.close()
+                except Exception:
+                    pass
+            else:
+                keep.append(s)
+        self._slots = keep
+
+    async def render_async(self, html, size=(1080, 1350), scale=2, wait="load", image_type="png",
+                           quality=None, transparent=False, base_dir=None, timeout=RENDER_TIMEOUT) -> bytes:
+        # File HTML tạm (origin file:// để ảnh local dạng file:// tải được, như cách cũ)
+        fd, html_path = tempfile.mkstemp(suffix=".html", dir=base_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(html)
+        try:
+            for attempt in range(2):
+                slot = await self._acquire()
+                ok = False
+                try:
+                    data = await asyncio.wait_for(
+                        self._screenshot(slot, Path(html_path).as_uri(), size, scale, wait, image_type,
+                                         quality, transparent, timeout), timeout)
+                    ok = True
+                    return data
+                except Exception:
+                    # browser chết giữa chừng -> thử lại 1 lần trên browser khác
+                    if attempt == 0 and (slot.dead or not slot.browser.is_connected()):
+                        self.retries += 1
+                        continue
+                    raise
+                finally:
+                    await self._release(slot, ok)
+        finally:
+            try:
+                os.unlink(html_path)
+            except OSError:
+                pass
+
+    async def _screenshot(self, slot, url, size, scale, wait, image_type, quality, transparent, timeout):
+        context = await slot.browser.new_context(viewport={"width": size[0], "height": size[1]},
+                                                 device_scale_factor=scale)
+        try:
+            page = await context.new_page()
+            page.set_default_timeout(timeout * 1000)
+            await page.goto(url, wait_until=wait)
+            if transparent:
+                await page.evaluate("document.body.style.background = 'transparent'")
+            kwargs = {"full_page": False, "type": image_type}  # cố định viewport
+            if image_type == "jpeg" and quality is not None:
+                kwargs["quality"] = int(quality)
+            return await page.screenshot(**kwargs)
+        finally:
+            await context.close()
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self._health_check()
+            except Exception as e:
+                print(f"⚠️ Health check Chromium lỗi: {e}")
+
+    async def _health_check(self):
+        async with self._cond:
+            idle = [s for s in self._slots if s.active == 0 and not s.retiring]
+        for s in idle:
+            healthy = s.browser.is_connected() and not s.dead
+            if healthy:
+                try:
+                    ctx = await asyncio.wait_for(s.browser.new_context(), 10)
+                    await ctx.close()
+                except Exception:
+                    healthy = False
+            if not healthy:
+                print("⚠️ Chromium không phản hồi -> thay browser mới")
+                s.dead = True
+                self.replaced_unhealthy += 1
+        async with self._cond:
+            await self._reap()
+            self._cond.notify_all()
+
+    async def _stats(self):
+        slots = []
+        for s in self._slots:
+            rss = await asyncio.get_running_loop().run_in_executor(None, tree_rss_mb, s.marker) \
+                if s.browser.is_connected() else None
+            slots.append({"active": s.active, "renders": s.renders, "retiring": s.retiring,
+                          "uptime_s": round(time.time() - s.launched_at, 1),
+                          "rss_mb": round(rss, 1) if rss is not None else None})
+        return {
+            "browsers": slots,
+            "max_browsers": self.browsers,
+            "pages_per_browser": self.pages_per_browser,
+            "renders": self.renders,
+            "launches": self.launches,
+            "recycled": self.recycled,
+            "replaced_unhealthy": self.replaced_unhealthy,
+            "retries": self.retries,
+        }
+
+    async def _shutdown(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for s in self._slots:
+            try:
+                await s.browser.close()
+            except Exception:
+                pass
+        self._slots = []
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Pool dùng chung cả process (API và CLI), tự đóng khi process thoát."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,314 @@
+"""
+Render poster bằng Pillow/NumPy, không cần Chromium.
+
+Tính lại đúng hình học của các layout CSS grid trong poster_generator (grid_for_3 ... grid_for_6):
+canvas 1080x1350, grid-container cao 1350-200, padding 30 (layout 6: 30 30 20 30), gap 25/20/15,
+card bo góc 15 + padding 12 + box-shadow 0 8px 25px rgba(0,0,0,.1), ảnh object-fit: cover bo góc 8,
+tiêu đề cỡ calculate_font_size() căn giữa trong vùng chữ 180px. Mép box làm tròn theo pixel thiết bị
+như Chromium; thứ tự vẽ theo CSS (sub-image không positioned, rồi chữ, rồi card position: relative).
+
+Chi phí chính: decode ảnh (JPEG decode thu nhỏ qua draft), resize cover, paste có mask (C của Pillow);
+bóng đổ blur ở độ phân giải thấp rồi phóng lên (bóng vốn mờ nên không mất chi tiết).
+"""
+
+import html
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
+
+from image_slide import poster_generator as pg
+from image_slide import poster_output
+
+POSTER_SIZE = (1080, 1350)
+BG_COLOR = (247, 247, 247)       # .poster / img background #f7f7f7
+CARD_COLOR = (255, 255, 255)
+TEXT_COLOR = (51, 51, 51)        # #333
+CARD_RADIUS = 15
+CARD_PADDING = 12
+IMG_RADIUS = 8
+SUB_GAP = 15
+SHADOW_DY = 8
+SHADOW_BLUR = 25
+SHADOW_SIGMA = SHADOW_BLUR / 2   # CSS: độ lệch chuẩn = 1/2 blur radius
+SHADOW_ALPHA = 0.1
+TEXT_AREA = (1150, 180)          # top, height (.text-area nằm ngay sau grid-container cao 1150)
+TEXT_PADDING_X = 40
+LETTER_SPACING = 1
+LINE_HEIGHT = 1.1
+FALLBACK_FONT = pg.FONT_DIR / "Roboto-SemiBold.ttf"  # chỉ cho ảnh placeholder, không dùng cho tiêu đề
+EXIF_ROTATED = (5, 6, 7, 8)      # Orientation xoay 90/270: exif_transpose đổi chiều rộng <-> cao
+
+# layout: (padding t/r/b/l, gap, cột fr, hàng fr, items (cột bắt đầu, cột kết thúc, hàng bắt đầu, hàng kết thúc, sub))
+# sub = số card con chia đều theo cột (gap 15, không positioned) như .img-4/.img-5
+LAYOUTS = {
+    3: ((30, 30, 30, 30), 25, (1, 1), (1, 1),
+        [(0, 2, 0, 1, 0), (0, 1, 1, 2, 0), (1, 2, 1, 2, 0)]),
+    4: ((30, 30, 30, 30), 25, (1, 1), (1, 1),
+        [(0, 1, 0, 1, 0), (1, 2, 0, 1, 0), (0, 1, 1, 2, 0), (1, 2, 1, 2, 0)]),
+    5: ((30, 30, 30, 30), 25, (1, 2), (1, 1),
+        [(0, 1, 0, 1, 0), (1, 2, 0, 1, 0), (0, 1, 1, 2, 0), (1, 2, 1, 2, 2)]),
+    6: ((30, 30, 20, 30), 20, (1, 2), (1, 1, 1),
+        [(0, 1, 0, 1, 0), (1, 2, 0, 2, 0), (0, 1, 1, 2, 0), (0, 1, 2, 3, 0), (1, 2, 2, 3, 2)]),
+}
+
+
+def _tracks(start, size, frs, gap):
+    """Vị trí + kích thước từng track fr (CSS grid, không có nội dung ép min-size)."""
+    unit = (size - gap * (len(frs) - 1)) / sum(frs)
+    out, pos = [], start
+    for fr in frs:
+        out.append((pos, fr * unit))
+        pos += fr * unit + gap
+    return out
+
+
+def layout_cards(slots: int) -> list:
+    """Các card (x, y, w, h, positioned) theo thứ tự ảnh, đơn vị CSS px."""
+    (pt, pr, pb, pl), gap, cols, rows, items = LAYOUTS[slots]
+    width, height = POSTER_SIZE[0], POSTER_SIZE[1] - 200
+    cols = _tracks(pl, width - pl - pr, cols, gap)
+    rows = _tracks(pt, height - pt - pb, rows, gap)
+    cards = []
+    for c0, c1, r0, r1, sub in items:
+        x, y = cols[c0][0], rows[r0][0]
+        w = cols[c1 - 1][0] + cols[c1 - 1][1] - x
+        h = rows[r1 - 1][0] + rows[r1 - 1][1] - y
+        if sub:
+            cards += [(sx, y, sw, h, False) for sx, sw in _tracks(x, w, (1,) * sub, SUB_GAP)]
+        else:
+            cards.append((x, y, w, h, True))
+    return cards
+
+
+def _snap(x, y, w, h, scale):
+    """Box CSS -> (left, top, right, bottom) pixel thiết bị, làm tròn từng mép như Chromium."""
+    return (round(x * scale), round(y * scale), round((x + w) * scale), round((y + h) * scale))
+
+
+@lru_cache(maxsize=64)
+def _round_mask(w: int, h: int, r: float) -> Image.Image:
+    """Mask L bo 4 góc bán kính r, khử răng cưa theo diện tích phủ tâm pixel."""
+    mask = np.full((h, w), 255, np.uint8)
+    r = min(r, w / 2, h / 2)
+    n = int(math.ceil(r))
+    if n > 0:
+        c = np.arange(n) + 0.5
+        d = np.hypot(r - c[None, :], r - c[:, None])
+        corner = (np.clip(r + 0.5 - d, 0, 1) * 255 + 0.5).astype(np.uint8)
+        corner[(c[:, None] >= r) | (c[None, :] >= r)] = 255
+        mask[:n, :n] = np.minimum(mask[:n, :n], corner)
+        mask[:n, w - n:] = np.minimum(mask[:n, w - n:], corner[:, ::-1])
+        mask[h - n:, :n] = np.minimum(mask[h - n:, :n], corner[::-1, :])
+        mask[h - n:, w - n:] = np.minimum(mask[h - n:, w - n:], corner[::-1, ::-1])
+    return Image.fromarray(mask, "L")
+
+
+@lru_cache(maxsize=64)
+def _shadow_mask(w: int, h: int, r: float, sigma: float):
+    """Alpha bóng đổ của hộp w x h bo góc r (đã nhân SHADOW_ALPHA), kèm lề m mỗi phía."""
+    m = int(math.ceil(3 * sigma))
+    k = max(1, int(sigma // 3))  # blur ở độ phân giải 1/k, sigma còn >= 3 px
+    small = Image.new("L", (max(1, (w + 2 * m) // k), max(1, (h + 2 * m) // k)), 0)
+    ImageDraw.Draw(small).rounded_rectangle((m / k, m / k, (m + w) / k - 1, (m + h) / k - 1), r / k, fill=255)
+    small = small.filter(ImageFilter.GaussianBlur(sigma / k))
+    lut = [int(v * SHADOW_ALPHA + 0.5) for v in range(256)]
+    return small.resize((w + 2 * m, h + 2 * m), Image.Resampling.BILINEAR).point(lut), m
+
+
+@lru_cache(maxsize=1)
+def _placeholder() -> Image.Image:
+    """Raster của PLACEHOLDER (SVG 400x300 #f0f0f0, chữ 'No Image' #888) ở 4x cho đủ nét khi cover."""
+    img = Image.new("RGB", (1600, 1200), (240, 240, 240))
+    font = ImageFont.truetype(str(FALLBACK_FONT), 96)
+    ImageDraw.Draw(img).text((800, 600), "No Image", fill=(136, 136, 136), font=font, anchor="mm")
+    return img
+
+
+def load_image(src: str, target=None) -> Image.Image | None:
+    """Path / file:// / http(s) / PLACEHOLDER -> ảnh đã xoay theo EXIF; None nếu không đọc được."""
+    if src == pg.PLACEHOLDER:
+        return _placeholder()
+    if src.lower().startswith(("http://", "https://")):
+        from utils.asset_cache import localize_urls
+
+        src = localize_urls([src])[0]
+        if src.lower().startswith(("http://", "https://")):  # cache tắt -> tải thẳng
+            from utils.downloader import get_session
+
+            resp = get_session().get(src, timeout=30)
+            resp.raise_for_status()
+            src = io.BytesIO(resp.content)
+    elif src.lower().startswith("file://"):
+        src = unquote(urlparse(src).path)
+    try:
+        img = Image.open(src)
+        if target and img.format == "JPEG":
+            # draft chạy trước exif_transpose nên target phải theo chiều của ảnh chưa xoay
+            if img.getexif().get(0x0112, 1) in EXIF_ROTATED:
+                target = (target[1], target[0])
+            img.draft("RGB", target)  # decode thu nhỏ bằng DCT, vẫn >= kích thước cần
+        img = ImageOps.exif_transpose(img)
+        return img.convert("RGBA" if img.mode in ("RGBA", "LA", "P", "PA") else "RGB")
+    except Exception as e:
+        print(f"⚠️ Không đọc được ảnh poster {src}: {e}")
+        return None
+
+
+def _cover(img: Image.Image, w: int, h: int) -> Image.Image:
+    """object-fit: cover + object-position: center (bicubic; ảnh lớn gấp >= 3 lần thì reduce trước, như mipmap)."""
+    iw, ih = img.size
+    s = max(w / iw, h / ih)
+    cw, ch = w / s, h / s
+    box = (max(0.0, (iw - cw) / 2), max(0.0, (ih - ch) / 2), min(iw, (iw + cw) / 2), min(ih, (ih + ch) / 2))
+    return img.resize((w, h), Image.Resampling.BICUBIC, box=box, reducing_gap=3.0)
+
+
+def _paste_frame(canvas, fill, origin, mask, insets):
+    """
+    Paste fill qua mask nhưng bỏ hình chữ nhật bên trong (insets trái/trên/phải/dưới) - phần đó
+    sắp bị lớp đặc phía trên che kín, khỏi tốn lượt blend trên cả triệu pixel.
+    """
+    w, h = mask.size
+    il, it, ir, ib = (max(0, int(v)) for v in insets)
+    if il + ir >= w or it + ib >= h:
+        canvas.paste(fill, origin, mask)
+        return
+    for box in ((0, 0, w, it), (0, h - ib, w, h), (0, it, il, h - ib), (w - ir, it, w, h - ib)):
+        if box[2] > box[0] and box[3] > box[1]:
+            canvas.paste(fill, (origin[0] + box[0], origin[1] + box[1]), mask.crop(box))
+
+
+def _image_box(card, scale):
+    """Content box của ảnh trong card (trừ padding 12), pixel thiết bị."""
+    x, y, w, h, _ = card
+    p = CARD_PADDING
+    return _snap(x + p, y + p, w - 2 * p, h - 2 * p, scale)
+
+
+def _image_tile(src: str, card, scale) -> Image.Image:
+    """Ảnh đã cover-crop đúng kích thước content box, nền #f7f7f7 dưới phần trong suốt / ảnh lỗi."""
+    l, t, r, b = _image_box(card, scale)
+    iw, ih = max(1, r - l), max(1, b - t)
+    tile = Image.new("RGB", (iw, ih), BG_COLOR)
+    img = load_image(src, (iw, ih))
+    if img is not None:
+        fitted = _cover(img, iw, ih)
+        if fitted.mode == "RGBA":
+            tile.paste(fitted, (0, 0), fitted)
+        else:
+            tile = fitted
+    return tile
+
+
+def _paint_card(canvas: Image.Image, card, tile, scale):
+    x, y, w, h, _ = card
+    radius = CARD_RADIUS * scale
+    # bóng đổ (offset y 8px); phần nằm dưới card bị card che nên bỏ qua
+    l, t, r, b = _snap(x, y + SHADOW_DY, w, h, scale)
+    shadow, m = _shadow_mask(r - l, b - t, radius, SHADOW_SIGMA * scale)
+    dy = round(SHADOW_DY * scale)
+    _paste_frame(canvas, (0, 0, 0), (l - m, t - m), shadow, (m + radius, m + radius - dy, m + radius, m + dy + radius))
+    # nền card trắng bo góc; phần giữa bị ảnh che (chỉ còn 4 góc bo 8 của ảnh, vẽ lại bên dưới)
+    l, t, r, b = _snap(x, y, w, h, scale)
+    inner = math.ceil((CARD_PADDING + IMG_RADIUS) * scale) + 1
+    _paste_frame(canvas, CARD_COLOR, (l, t), _round_mask(r - l, b - t, radius), (inner,) * 4)
+    l, t, r, b = _image_box(card, scale)
+    iw, ih = r - l, b - t
+    if iw <= 0 or ih <= 0:
+        return
+    # paste thẳng cả ảnh rồi phủ lại nền card ở 4 góc bo (= paste ảnh qua mask bo góc)
+    canvas.paste(tile, (l, t))
+    n = math.ceil(IMG_RADIUS * scale)
+    mask = _round_mask(iw, ih, IMG_RADIUS * scale)
+    for box in ((0, 0, n, n), (iw - n, 0, iw, n), (0, ih - n, n, ih), (iw - n, ih - n, iw, ih)):
+        canvas.paste(CARD_COLOR, (l + box[0], t + box[1]), ImageOps.invert(mask.crop(box)))
+
+
+def _title_font(size: int):
+    """Cùng font với HTML poster; thiếu font thì ensure_local_font() raise FileNotFoundError."""
+    font = ImageFont.truetype(str(pg.ensure_local_font()), size)
+    try:
+        font.set_variation_by_axes([600])  # font-weight: 600 (variable font wght)
+    except Exception:
+        pass  # font tĩnh (không có trục wght)
+    return font
+
+
+def _wrap(text: str, font, width: float, spacing: float) -> list:
+    """Xuống dòng theo từ (word-wrap: break-word: từ quá dài thì cắt theo ký tự)."""
+    def measure(s):
+        return font.getlength(s) + spacing * len(s)
+
+    lines, line = [], ""
+    for word in text.split():
+        cand = f"{line} {word}" if line else word
+        if measure(cand) <= width:
+            line = cand
+            continue
+        if line:
+            lines.append(line)
+        line = ""
+        while measure(word) > width and len(word) > 1:
+            cut = max([i for i in range(1, len(word)) if measure(word[:i]) <= width] or [1])
+            lines.append(word[:cut])
+            word = word[cut:]
+        line = word
+    if line:
+        lines.append(line)
+    return lines or [""]
+
+
+def _paint_title(canvas: Image.Image, title_text: str, scale):
+    safe = html.escape(title_text or "Aesthetic")
+    size = pg.calculate_font_size(safe) * scale  # cùng công thức (và cùng chuỗi đã escape) với bản HTML
+    font = _title_font(size)
+    spacing = LETTER_SPACING * scale
+    text = title_text or "Aesthetic"
+    lines = _wrap(text, font, (POSTER_SIZE[0] - 2 * TEXT_PADDING_X) * scale, spacing)
+
+    ascent, descent = font.getmetrics()
+    line_h = LINE_HEIGHT * size
+    top = (TEXT_AREA[0] + TEXT_AREA[1] / 2) * scale - line_h * len(lines) / 2  # align-items: center
+    draw = ImageDraw.Draw(canvas)
+    cx = POSTER_SIZE[0] / 2 * scale
+    for i, line in enumerate(lines):
+        baseline = top + i * line_h + (line_h - (ascent + descent)) / 2 + ascent  # half-leading
+        x = cx - (font.getlength(line) + spacing * len(line)) / 2
+        for j, ch in enumerate(line):
+            # vị trí theo prefix (giữ kerning) + letter-spacing sau mỗi ký tự
+            draw.text((x + font.getlength(line[:j]) + spacing * j, baseline), ch, fill=TEXT_COLOR,
+                      font=font, anchor="ls")
+
+
+def render_poster_image(image_urls, title_text: str, scale=2) -> Image.Image:
+    """Cùng chọn layout/slot như build_html; trả về ảnh RGB (1080*scale) x (1350*scale)."""
+    non_empty = [u for u in (image_urls or []) if isinstance(u, str) and u.strip()]
+    slots = min(max(len(non_empty), 3), 6)
+    srcs = pg.sanitize_images(non_empty, slots)
+    cards = layout_cards(slots)
+
+    # decode + resize từng ảnh song song (Pillow nhả GIL khi decode/resize)
+    with ThreadPoolExecutor(max_workers=len(cards)) as ex:
+        tiles = list(ex.map(lambda cs: _image_tile(cs[1], cs[0], scale), zip(cards, srcs)))
+
+    canvas = Image.new("RGB", (POSTER_SIZE[0] * scale, POSTER_SIZE[1] * scale), BG_COLOR)
+    # Thứ tự vẽ CSS: card con không positioned -> chữ -> card position: relative (theo thứ tự DOM)
+    for card, tile in zip(cards, tiles):
+        if not card[4]:
+            _paint_card(canvas, card, tile, scale)
+    _paint_title(canvas, title_text, scale)
+    for card, tile in zip(cards, tiles):
+        if card[4]:
+            _paint_card(canvas, card, tile, scale)
+    return canvas
+
+
+def render_poster(image_urls, title_text: str, scale=2, fmt="png", quality=None, **output) -> bytes:
+    """Poster -> bytes ảnh, thay cho build_html + Chromium screenshot (output: width, max_bytes, progressive)."""
+    img = render_poster_image(image_urls, title_text, scale=int(scale))
+    return poster_output.finish(img, fmt, quality=quality, **output)[0]
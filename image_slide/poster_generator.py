@@ -19,8 +19,10 @@ from __future__ import annotations
 
 import argparse
 import html as _html
+import os
 import sys
 from pathlib import Path
+from urllib.parse import quote
 from typing import List, Sequence
 
 # ==== (Tuỳ chọn) Render sang ảnh bằng Playwright ====
@@ -36,67 +38,68 @@ def html_string_to_image(
 ) -> None:
     """
     Chuyển HTML string thành ảnh bằng Playwright (Chromium).
+    Render qua pool browser dùng chung của process (image_slide.browser_pool) -> gọi nhiều lần
+    trong cùng process không phải launch lại Chromium.
     Lưu ý: cần cài playwright và data browser trước khi dùng.
     """
-    # Import lazy để không bắt buộc người dùng cài playwright nếu chỉ cần HTML
-    try:
-        from playwright.sync_api import sync_playwright
-    except Exception as e:
-        raise RuntimeError(
-            "Thiếu playwright. Cài bằng: pip install playwright && playwright install chromium"
-        ) from e
-
-    import tempfile, os
+    from image_slide.browser_pool import get_browser_pool
 
     output_path = Path(output_path).resolve()
+    data = get_browser_pool().render(
+        html_content,
+        size=size,
+        scale=scale,
+        wait=wait,
+        image_type=image_type,
+        quality=quality,
+        transparent=transparent,
+    )
+    output_path.write_bytes(data)
 
-    # Tạo file HTML tạm thời
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False, encoding="utf-8") as temp_file:
-        temp_file.write(html_content)
-        temp_html_path = temp_file.name
-
-    try:
-        url = Path(temp_html_path).as_uri()
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                viewport={"width": size[0], "height": size[1]},
-                device_scale_factor=scale,
-            )
-            page = context.new_page()
-            page.set_default_timeout(60_000)
-
-            page.goto(url, wait_until=wait)
-
-            # Optional: ép nền trong suốt
-            if transparent:
-                page.evaluate("document.body.style.background = 'transparent'")
 
-            # Chụp ảnh
-            screenshot_kwargs = {
-                "path": str(output_path),
-                "full_page": False,  # cố định viewport 1080x1350
-                "type": image_type,
-            }
-            if image_type == "jpeg" and quality is not None:
-                screenshot_kwargs["quality"] = int(quality)
+# ==== Utilities ====
+# Placeholder dạng data URI (SVG) -> không phải gọi via.placeholder.com khi thiếu ảnh
+PLACEHOLDER = "data:image/svg+xml;charset=utf-8," + quote(
+    '<svg xmlns="http://www.w3.org/2000/svg" width="400" height="300" viewBox="0 0 400 300">'
+    '<rect width="400" height="300" fill="#f0f0f0"/>'
+    '<text x="200" y="150" font-family="Arial, sans-serif" font-size="24" fill="#888" '
+    'text-anchor="middle" dominant-baseline="middle">No Image</text></svg>'
+)
+
+# ==== Font: Google Fonts (mặc định) hoặc file local cạnh font/ (self-contained) ====
+GOOGLE_FONT_CSS = (
+    "@import url('https://fonts.googleapis.com/css2?family=Dancing+Script:wght@400;500;600;700&display=swap');"
+)
+FONT_DIR = Path(__file__).resolve().parent.parent / "font"
+# Dancing Script (OFL, variable wght 400–700) đi kèm repo + image Docker -> render không gọi mạng
+POSTER_FONT = Path(os.getenv("POSTER_FONT_PATH", str(FONT_DIR / "DancingScript.ttf")))
+
+
+def ensure_local_font() -> Path:
+    """Path font tiêu đề poster; thiếu file -> FileNotFoundError (không tải lúc chạy, không âm thầm đổi font)."""
+    if not POSTER_FONT.is_file():
+        raise FileNotFoundError(
+            f"Thiếu font poster {POSTER_FONT}: thêm font/DancingScript.ttf (google/fonts ofl/dancingscript, "
+            "Docker build tự lấy) hoặc đặt POSTER_FONT_PATH"
+        )
+    return POSTER_FONT
 
-            page.screenshot(**screenshot_kwargs)
 
-            context.close()
-            browser.close()
+def font_css(self_contained: bool) -> str:
+    """CSS nạp font tiêu đề: @import Google Fonts, hoặc @font-face trỏ file local."""
+    if not self_contained:
+        return GOOGLE_FONT_CSS
+    return (
+        "@font-face { font-family: 'Dancing Script'; font-weight: 400 700; font-display: block; "
+        f"src: url('{ensure_local_font().resolve().as_uri()}') format('truetype'); }}"
+    )
 
-    finally:
-        # Xóa file tạm thời
-        try:
-            os.unlink(temp_html_path)
-        except OSError:
-            pass
 
+def prefetch_images(images: Sequence[str]) -> List[str]:
+    """Tải song song ảnh remote vào asset cache, trả về path local (ảnh local giữ nguyên)."""
+    from utils.asset_cache import localize_urls
 
-# ==== Utilities ====
-PLACEHOLDER = "https://via.placeholder.com/400x300/f0f0f0/888?text=No+Image"
+    return localize_urls([u for u in images if isinstance(u, str)])
 
 
 def path_to_src(s: str) -> str:
@@ -154,7 +157,7 @@ COMMON_HEAD = """<!DOCTYPE html>
   <meta name="viewport" content="width=device-width, initial-scale=1.0" />
   <title>{TITLE}</title>
   <style>
-    @import url('https://fonts.googleapis.com/css2?family=Dancing+Script:wght@400;500;600;700&display=swap');
+    {FONT_CSS}
 
     * {{ margin: 0; padding: 0; box-sizing: border-box; }}
     .poster {{
@@ -377,10 +380,12 @@ def grid_for_6(img0: str, img1: str, img2: str, img3: str, img4: str, img5: str)
     return grid
 
 
-def build_html(image_urls: Sequence[str], title_text: str) -> str:
+def build_html(image_urls: Sequence[str], title_text: str, self_contained: bool = False) -> str:
     """
     Chọn layout theo số ảnh (1-3 → layout 3; 4 → layout 4; 5 → layout 5; >=6 → layout 6).
     Luôn cố định poster 1080x1350.
+    self_contained=True: font từ file local thay vì Google Fonts (ảnh nên prefetch trước bằng
+    prefetch_images) -> trang không cần request mạng nào, chụp được ngay khi wait="load".
     """
     # sanitize + đếm ảnh hợp lệ (không rỗng)
     non_empty = [u for u in (image_urls or []) if isinstance(u, str) and u.strip()]
@@ -409,6 +414,7 @@ def build_html(image_urls: Sequence[str], title_text: str) -> str:
 
     html = COMMON_HEAD.format(
         TITLE=title,
+        FONT_CSS=font_css(self_contained),
         FONT_SIZE=font_size,
         GRID=grid,
         TITLE_TEXT=safe_title_text,
@@ -416,13 +422,138 @@ def build_html(image_urls: Sequence[str], title_text: str) -> str:
     return html
 
 
+# ==== Batch: nhiều poster trên cùng pool browser ====
+POSTER_SPEC_DEFAULTS = {
+    "text": "Aesthetic",
+    "fmt": "jpeg",
+    "quality": None,        # None -> poster_output.DEFAULT_QUALITY theo định dạng
+    "scale": 2,
+    "wait": None,
+    "self_contained": True,
+    "renderer": "chromium",
+    "width": None,          # độ rộng ảnh xuất (px), None = 1080 * scale
+    "max_bytes": None,      # budget dung lượng -> tìm quality cao nhất còn vừa
+    "progressive": False,   # JPEG progressive
+}
+
+
+def render_posters(specs: Sequence[dict]) -> list:
+    """
+    Render nhiều poster (spec: images, text, fmt, quality, scale, wait, self_contained, renderer,
+    width, max_bytes, progressive) cùng lúc: renderer="chromium" trên nhiều page của pool browser,
+    "native" (Pillow) trên thread pool song song; bước xuất ảnh (webp/avif, resize, budget) ở poster_output.
+    Trả về list cùng thứ tự: (bytes, info) với info = {width, height, quality, bytes}, hoặc Exception nếu
+    poster đó lỗi (thiếu ảnh, tải ảnh lỗi, render lỗi) -> 1 poster hỏng không làm hỏng cả batch.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from image_slide import poster_output
+    from image_slide.browser_pool import get_browser_pool
+
+    specs = [dict(POSTER_SPEC_DEFAULTS, **spec) for spec in specs]
+
+    # Tải trước ảnh của mọi poster self-contained trong 1 lượt (URL trùng giữa các poster chỉ tải 1 lần)
+    urls = list(dict.fromkeys(u for spec in specs if spec["self_contained"] or spec["renderer"] == "native"
+                              for u in spec.get("images") or [] if isinstance(u, str)))
+    if urls:
+        from utils.asset_cache import localize_urls
+
+        local = dict(zip(urls, localize_urls(urls, return_exceptions=True)))
+    else:
+        local = {}
+
+    def output_opts(spec):
+        fmt = spec["fmt"]
+        return dict(quality=poster_output.resolve_quality(fmt, spec["quality"]), width=spec["width"],
+                    max_bytes=spec["max_bytes"], progressive=bool(spec["progressive"]))
+
+    def render_native(images, spec):
+        from image_slide.native_renderer import render_poster_image
+
+        img = render_poster_image(images, spec["text"], scale=int(spec["scale"]))
+        return poster_output.finish(img, spec["fmt"], **output_opts(spec))
+
+    results = [None] * len(specs)
+    jobs, pending, direct = {}, {}, set()
+    executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+    for i, spec in enumerate(specs):
+        try:
+            images = [u for u in spec.get("images") or [] if isinstance(u, str)]
+            if not images:
+                raise ValueError("Thiếu danh sách ảnh")
+            if spec["self_contained"] or spec["renderer"] == "native":
+                images = [local[u] for u in images]
+                failed = [e for e in images if isinstance(e, Exception)]
+                if failed:
+                    raise RuntimeError(f"Không tải được ảnh: {failed[0]}")
+            poster_output.check_supported(spec["fmt"])
+            if spec["renderer"] == "native":
+                pending[i] = executor.submit(render_native, images, spec)
+                continue
+            opts = output_opts(spec)
+            # Chromium chụp thẳng png/jpeg khi không cần bước xuất nào; còn lại chụp PNG (lossless) rồi encode lại
+            if not poster_output.needs_finish(spec["fmt"], opts["width"], opts["max_bytes"], opts["progressive"]):
+                direct.add(i)
+            jobs[i] = dict(
+                html=build_html(images, spec["text"], self_contained=spec["self_contained"]),
+                size=(1080, 1350),
+                scale=int(spec["scale"]),
+                wait=spec["wait"] or ("load" if spec["self_contained"] else "networkidle"),
+                image_type=spec["fmt"] if i in direct else "png",
+                quality=opts["quality"] if i in direct else None,
+            )
+        except Exception as e:
+            results[i] = e
+
+    # poster native chạy trên thread pool trong lúc browser render phần còn lại
+    if jobs:
+        for i, out in zip(jobs, get_browser_pool().render_many(list(jobs.values()))):
+            job = jobs[i]
+            if isinstance(out, Exception):
+                results[i] = out
+            elif i in direct:
+                results[i] = (out, {"width": 1080 * job["scale"], "height": 1350 * job["scale"],
+                                    "quality": job["quality"], "bytes": len(out)})
+            else:
+                pending[i] = executor.submit(poster_output.finish_bytes, out, specs[i]["fmt"], **output_opts(specs[i]))
+    for i, fut in pending.items():
+        try:
+            results[i] = fut.result()
+        except Exception as e:
+            results[i] = e
+    executor.shutdown()
+    return results
+
+
+def run_batch(spec_file: Path, out_dir: Path) -> int:
+    """CLI batch: đọc list spec JSON, ghi ảnh vào out_dir (tên theo 'name' hoặc poster_001...). Trả về số poster lỗi."""
+    import json
+
+    from image_slide.poster_output import extension
+
+    specs = json.loads(Path(spec_file).read_text(encoding="utf-8"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    errors = 0
+    for i, (spec, result) in enumerate(zip(specs, render_posters(specs)), 1):
+        name = spec.get("name") or f"poster_{i:03d}"
+        if isinstance(result, Exception):
+            errors += 1
+            print(f"❌ {name}: {result}")
+            continue
+        path = out_dir / f"{name}.{extension(spec.get('fmt', POSTER_SPEC_DEFAULTS['fmt']))}"
+        path.write_bytes(result[0])
+        print(f"✅ {path.resolve()}")
+    print(f"Xong batch: {len(specs) - errors}/{len(specs)} poster")
+    return errors
+
+
 # ==== CLI ====
 def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description="Sinh HTML poster 1080x1350 từ danh sách ảnh (URL/path). "
                     "Có thể render ra PNG/JPEG bằng Playwright."
     )
-    p.add_argument("images", nargs="+", help="Đường dẫn/URL ảnh (1–6 dùng, dư sẽ bỏ)")
+    p.add_argument("images", nargs="*", help="Đường dẫn/URL ảnh (1–6 dùng, dư sẽ bỏ)")
     p.add_argument("-t", "--text", default="Aesthetic", help="Tiêu đề/overlay text")
     p.add_argument("-o", "--out-html", type=Path, default=Path("poster.html"),
                    help="File HTML xuất (mặc định: poster.html)")
@@ -431,39 +562,70 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     out_group = p.add_mutually_exclusive_group()
     out_group.add_argument("--png", type=Path, help="Xuất PNG ra đường dẫn này")
     out_group.add_argument("--jpeg", type=Path, help="Xuất JPEG ra đường dẫn này")
-    p.add_argument("--quality", type=int, default=None, help="JPEG quality 0–100")
+    out_group.add_argument("--webp", type=Path, help="Xuất WebP ra đường dẫn này")
+    out_group.add_argument("--avif", type=Path, help="Xuất AVIF ra đường dẫn này")
+    p.add_argument("--quality", type=int, default=None, help="Quality 0–100 (jpeg/webp/avif)")
+    p.add_argument("--progressive", action="store_true", help="JPEG progressive")
+    p.add_argument("--width", type=int, default=None, help="Độ rộng ảnh xuất (px), mặc định 1080 x scale")
+    p.add_argument("--max-bytes", type=int, default=None, help="Giới hạn dung lượng ảnh, tự hạ quality cho vừa")
     p.add_argument("--scale", type=int, default=2, help="Device scale factor khi render ảnh (mặc định 2)")
     p.add_argument("--wait", choices=["load", "domcontentloaded", "networkidle", "commit"],
-                   default="networkidle", help="Chiến lược chờ tải trang khi render")
+                   default=None, help="Chiến lược chờ tải trang khi render "
+                                      "(mặc định: networkidle, hoặc load nếu --self-contained)")
+    p.add_argument("--self-contained", action="store_true",
+                   help="Font local + tải trước ảnh remote vào cache -> không request mạng lúc render")
+    p.add_argument("--renderer", choices=["chromium", "native"], default="chromium",
+                   help="native: vẽ bằng Pillow (không cần Chromium, không ghi HTML)")
 
-    return p.parse_args(list(argv))
+    # Batch (thay cho images/-t/-o): file JSON là list spec
+    # {"images": [...], "text": "...", "fmt": "jpeg|png", "quality": 90, "scale": 2, "renderer": "native", "name": "..."}
+    p.add_argument("--batch", type=Path, help="File JSON danh sách poster, render song song trên 1 pool browser")
+    p.add_argument("--out-dir", type=Path, default=Path("posters"), help="Thư mục ảnh xuất cho --batch")
+
+    args = p.parse_args(list(argv))
+    if not args.batch and not args.images:
+        p.error("cần ít nhất 1 ảnh (hoặc dùng --batch)")
+    return args
 
 
 def main(argv: Sequence[str] | None = None) -> None:
     args = parse_args(sys.argv[1:] if argv is None else argv)
 
-    html = build_html(args.images, args.text)
-
-    # Ghi file HTML
-    out_html: Path = args.out_html
-    out_html.write_text(html, encoding="utf-8")
-    print(f"Đã ghi HTML: {out_html.resolve()}")
-
-    # Render ảnh nếu được yêu cầu
-    if args.png or args.jpeg:
-        out_img = args.png or args.jpeg
-        img_type = "png" if args.png else "jpeg"
-        html_string_to_image(
-            html_content=html,
-            output_path=out_img,
-            size=(1080, 1350),   # cố định
-            scale=args.scale,
-            wait=args.wait,
-            transparent=False,
-            image_type=img_type,
-            quality=args.quality if img_type == "jpeg" else None,
-        )
-        print(f"Đã xuất ảnh: {Path(out_img).resolve()}")
+    if args.batch:
+        sys.exit(1 if run_batch(args.batch, args.out_dir) else 0)
+
+    native = args.renderer == "native"
+    images = prefetch_images(args.images) if args.self_contained or native else args.images
+
+    if not native:
+        # Ghi file HTML
+        html = build_html(images, args.text, self_contained=args.self_contained)
+        out_html: Path = args.out_html
+        out_html.write_text(html, encoding="utf-8")
+        print(f"Đã ghi HTML: {out_html.resolve()}")
+
+    # Render ảnh nếu được yêu cầu (native luôn xuất ảnh, mặc định PNG cạnh file HTML)
+    fmt, out_img = next(((f, getattr(args, f)) for f in ("png", "jpeg", "webp", "avif") if getattr(args, f)),
+                        ("png", args.out_html.with_suffix(".png") if native else None))
+    if out_img is None:
+        return
+    result = render_posters([{
+        "images": images,
+        "text": args.text,
+        "fmt": fmt,
+        "quality": args.quality,
+        "scale": args.scale,
+        "wait": args.wait,
+        "self_contained": args.self_contained,
+        "renderer": args.renderer,
+        "width": args.width,
+        "max_bytes": args.max_bytes,
+        "progressive": args.progressive,
+    }])[0]
+    if isinstance(result, Exception):
+        raise result
+    Path(out_img).write_bytes(result[0])
+    print(f"Đã xuất ảnh: {Path(out_img).resolve()} ({result[1]})")
 
 
 if __name__ == "__main__":
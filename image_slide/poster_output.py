@@ -0,0 +1,132 @@
+"""
+Xuất ảnh poster: định dạng (png/jpeg/webp/avif, JPEG progressive), độ phân giải đầu ra độc lập với
+device scale, và giới hạn dung lượng max_bytes (tìm nhị phân quality cao nhất còn vừa budget).
+
+Renderer (Chromium screenshot PNG hoặc ảnh Pillow của native_renderer) -> finish() -> bytes.
+Chromium chỉ chụp thẳng jpeg/png khi không cần bước nào ở đây (needs_finish = False).
+"""
+
+import io
+import math
+import os
+
+from PIL import Image, features
+
+# fmt -> (định dạng Pillow, media type, đuôi file)
+FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "avif": ("AVIF", "image/avif", "avif"),
+}
+DEFAULT_QUALITY = {"jpeg": 90, "webp": 85, "avif": 70}
+QUALITY_MIN = int(os.getenv("POSTER_QUALITY_MIN", "30"))
+AVIF_SPEED = int(os.getenv("POSTER_AVIF_SPEED", "8"))   # 0 (chậm, nhỏ) .. 10 (nhanh)
+MAX_DOWNSCALES = 3                                        # quality thấp nhất vẫn quá budget -> thu nhỏ ảnh
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][1]
+
+
+def extension(fmt: str) -> str:
+    return FORMATS[fmt][2]
+
+
+def check_supported(fmt: str) -> None:
+    """ValueError nếu bản Pillow đang chạy không encode được fmt (vd. build không có libavif)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt không hỗ trợ: {fmt}")
+    if fmt in ("webp", "avif") and not features.check(fmt):
+        raise ValueError(f"Pillow trên server không hỗ trợ encode {fmt}")
+
+
+def needs_finish(fmt: str, width=None, max_bytes=None, progressive=False) -> bool:
+    """False khi ảnh screenshot của Chromium (png/jpeg) dùng được luôn, không phải decode + encode lại."""
+    return fmt not in ("png", "jpeg") or bool(width) or bool(max_bytes) or (fmt == "jpeg" and progressive)
+
+
+def encode(img: Image.Image, fmt: str, quality=None, progressive=False) -> bytes:
+    pil_fmt = FORMATS[fmt][0]
+    buf = io.BytesIO()
+    if fmt == "png":
+        img.save(buf, pil_fmt, compress_level=3)
+        return buf.getvalue()
+    q = int(quality if quality is not None else DEFAULT_QUALITY[fmt])
+    if fmt == "jpeg":
+        img.convert("RGB").save(buf, pil_fmt, quality=q, progressive=progressive, optimize=progressive)
+    elif fmt == "webp":
+        img.save(buf, pil_fmt, quality=q, method=4)
+    else:
+        img.save(buf, pil_fmt, quality=q, speed=AVIF_SPEED)
+    return buf.getvalue()
+
+
+def fit_quality(img: Image.Image, fmt: str, max_bytes: int, q_max=None, progressive=False):
+    """
+    Quality cao nhất trong [QUALITY_MIN, q_max] mà ảnh encode ra <= max_bytes (tìm nhị phân, ~6-7 lần encode).
+    Trả về (bytes, quality, size); không quality nào vừa -> (None, None, size nhỏ nhất đã thử).
+    """
+    lo, hi = QUALITY_MIN, int(q_max if q_max is not None else DEFAULT_QUALITY[fmt])
+    # thường quality yêu cầu đã vừa budget -> 1 lần encode là xong
+    data = encode(img, fmt, hi, progressive)
+    if len(data) <= max_bytes:
+        return data, hi, len(data)
+    best, smallest, hi = (None, None), len(data), hi - 1
+    while lo <= hi:
+        q = (lo + hi) // 2
+        data = encode(img, fmt, q, progressive)
+        smallest = min(smallest, len(data))
+        if len(data) <= max_bytes:
+            best, lo = (data, q), q + 1
+        else:
+            hi = q - 1
+    return best[0], best[1], len(best[0]) if best[0] is not None else smallest
+
+
+def resize_to_width(img: Image.Image, width: int) -> Image.Image:
+    if not width or width == img.width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def finish(img: Image.Image, fmt: str, quality=None, width=None, max_bytes=None, progressive=False):
+    """
+    Ảnh poster -> (bytes, info). info: {width, height, quality, bytes}.
+    max_bytes: png (không có quality) hoặc quality thấp nhất vẫn quá budget -> thu nhỏ ảnh theo
+    tỉ lệ sqrt(budget / size) rồi thử lại (tối đa MAX_DOWNSCALES lần), vẫn không vừa -> ValueError.
+    """
+    check_supported(fmt)
+    img = resize_to_width(img, width)
+    if not max_bytes:
+        data = encode(img, fmt, quality, progressive)
+        return data, {"width": img.width, "height": img.height, "quality": resolve_quality(fmt, quality), "bytes": len(data)}
+
+    for attempt in range(MAX_DOWNSCALES + 1):
+        if fmt == "png":
+            data, q = encode(img, fmt), None
+            size = len(data)
+            data = data if size <= max_bytes else None
+        else:
+            data, q, size = fit_quality(img, fmt, max_bytes, quality, progressive)
+        if data is not None:
+            return data, {"width": img.width, "height": img.height, "quality": q, "bytes": size}
+        if attempt == MAX_DOWNSCALES:
+            break
+        factor = math.sqrt(max_bytes / size) * 0.95
+        img = img.resize((max(1, int(img.width * factor)), max(1, int(img.height * factor))),
+                         Image.Resampling.LANCZOS)
+    raise ValueError(f"Không nén được poster xuống {max_bytes} bytes ({fmt})")
+
+
+def finish_bytes(data: bytes, fmt: str, **kwargs):
+    """Như finish() nhưng đầu vào là ảnh đã encode (screenshot PNG của Chromium)."""
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return finish(img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB"), fmt, **kwargs)
+
+
+def resolve_quality(fmt, quality):
+    """Quality thực dùng: giá trị yêu cầu, không có thì DEFAULT_QUALITY của định dạng (png -> None)."""
+    return None if fmt == "png" else int(quality if quality is not None else DEFAULT_QUALITY[fmt])
@@ -0,0 +1,108 @@
+"""
+So pixel poster native (image_slide.native_renderer) theo từng layout 3/4/5/6 (kể cả slot placeholder):
+
+- với ảnh tham chiếu đã commit ở tests/data/poster_native/ (bắt lỗi hồi quy của chính native renderer)
+- với screenshot Chromium của build_html (đúng chuẩn CSS); không có Chromium -> chỉ skip phần này
+
+Font tiêu đề cố định = font/Roboto-SemiBold.ttf (có trong repo) cho cả native lẫn HTML, để ảnh tham chiếu
+không phụ thuộc font poster của môi trường. Sinh lại ảnh tham chiếu (sau khi đổi layout có chủ đích):
+
+  UPDATE_POSTER_REFS=1 python -m pytest tests/test_native_renderer.py
+"""
+
+import io
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.bench_poster_native import diff_stats
+from benchmarks.fixtures import make_image
+from image_slide import native_renderer
+from image_slide import poster_generator as pg
+
+REF_DIR = Path(__file__).resolve().parent / "data" / "poster_native"
+TITLE = "Ưu đãi đặc biệt cuối tuần"
+SCALE = 1
+# ảnh sản phẩm nhiều tỉ lệ -> thử cả cover-crop ngang lẫn dọc; PNG để decode giống hệt mọi máy
+SIZES = [(600, 600), (450, 700), (800, 450), (500, 500), (400, 600), (700, 500)]
+
+# layout -> số ảnh đầu vào
+CASES = {"3_placeholder": 2, "3": 3, "4": 4, "5": 5, "6": 6}
+
+# Sai khác cho phép (kênh lớn nhất, 0-255) theo layout: mean_abs, % pixel lệch > 16
+# - REF: cùng code, chỉ chênh do phiên bản Pillow/FreeType (resample, khử răng cưa chữ)
+# - CHROMIUM: khác engine raster (khử răng cưa mép bo góc, blur bóng, hinting chữ); layout 5/6 có
+#   card con nên nhiều mép hơn
+REF_TOLERANCE = {name: (0.2, 0.05) for name in CASES}
+CHROMIUM_TOLERANCE = {
+    "3_placeholder": (3.0, 2.0),
+    "3": (3.0, 2.0),
+    "4": (3.0, 2.0),
+    "5": (3.5, 2.5),
+    "6": (4.0, 3.0),
+}
+
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("poster_native")
+    return [make_image(str(tmp / f"p{i}.png"), size, seed=i) for i, size in enumerate(SIZES)]
+
+
+@pytest.fixture(autouse=True)
+def title_font(monkeypatch):
+    monkeypatch.setattr(pg, "POSTER_FONT", pg.FONT_DIR / "Roboto-SemiBold.ttf")
+
+
+@pytest.fixture(scope="module")
+def chromium():
+    try:
+        from image_slide.browser_pool import BrowserPool
+
+        pool = BrowserPool(browsers=1, pages_per_browser=1)
+    except ImportError as e:
+        pytest.skip(f"Không có Playwright: {e}")
+    try:
+        pool.warmup(1)
+    except Exception as e:
+        pool.close()
+        pytest.skip(f"Không chạy được Chromium: {str(e).splitlines()[0]}")
+    yield pool
+    pool.close()
+
+
+def _native(images, n) -> np.ndarray:
+    img = native_renderer.render_poster_image(images[:n], TITLE, scale=SCALE)
+    return np.asarray(img.convert("RGB"))
+
+
+def _assert_within(stats: dict, tolerance, what: str):
+    max_mean, max_over_16 = tolerance
+    assert stats["mean_abs"] <= max_mean and stats["pct_over_16"] <= max_over_16, f"{what}: {stats}"
+
+
+@pytest.mark.parametrize("layout", CASES)
+def test_matches_reference(images, layout):
+    native = _native(images, CASES[layout])
+    ref_path = REF_DIR / f"layout_{layout}.png"
+    if os.getenv("UPDATE_POSTER_REFS") == "1":
+        REF_DIR.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(native).save(ref_path, optimize=True)
+        pytest.skip(f"Đã ghi {ref_path}")
+    ref = np.asarray(Image.open(ref_path).convert("RGB"))
+    assert native.shape == ref.shape
+    _assert_within(diff_stats(native, ref), REF_TOLERANCE[layout], f"layout {layout} vs {ref_path.name}")
+
+
+@pytest.mark.parametrize("layout", CASES)
+def test_matches_chromium(images, chromium, layout):
+    n = CASES[layout]
+    html = pg.build_html(images[:n], TITLE, self_contained=True)
+    shot = chromium.render(html, scale=SCALE, wait="load", image_type="png")
+    reference = np.asarray(Image.open(io.BytesIO(shot)).convert("RGB"))
+    native = _native(images, n)
+    assert native.shape == reference.shape
+    _assert_within(diff_stats(native, reference), CHROMIUM_TOLERANCE[layout], f"layout {layout} vs Chromium")
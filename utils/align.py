@@ -0,0 +1,120 @@
+"""
+Forced alignment cục bộ: transcript gốc của từng clip + wav -> thời gian start/end từng từ,
+không gọi ASR (không mạng, vài ms CPU mỗi clip).
+
+Baseline:
+1) VAD theo năng lượng: RMS từng frame 10 ms, ngưỡng = nền nhiễu + 1 phần khoảng động
+   (percentile), lấp khoảng lặng ngắn hơn MIN_PAUSE, bỏ đoạn nói ngắn hơn MIN_SPEECH
+2) Mỗi từ có trọng số = số âm tiết (nhóm nguyên âm, bỏ dấu tiếng Việt; số đếm theo chữ số)
+3) Trải các từ theo tỉ lệ trọng số lên "thời gian nói" (nối các đoạn nói, bỏ khoảng lặng),
+   rồi ánh xạ ngược về thời gian thật; từ vắt qua 1 khoảng lặng được kẹp vào đoạn chứa phần lớn của nó
+
+Kết quả cùng dạng convert_srt_to_json: list {index, start, end, content}.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+
+from utils.transcribe import Transcriber
+
+FRAME_S = 0.01
+MIN_PAUSE = 0.15      # khoảng lặng ngắn hơn -> coi như vẫn đang nói (ranh giới từ, phụ âm tắc)
+MIN_SPEECH = 0.05     # đoạn "nói" ngắn hơn -> nhiễu
+PAD = 0.02            # nới mỗi đoạn nói 2 phía (hơi thở đầu/cuối từ)
+MIN_DB_MARGIN = 6.0
+
+_VOWELS = re.compile(r"[aeiouy]+")
+
+
+def syllables(word: str) -> int:
+    """Số âm tiết ước lượng của 1 từ (tiếng Việt: mỗi từ cách nhau bởi space ~ 1 âm tiết)."""
+    base = unicodedata.normalize("NFD", word.lower().replace("đ", "d"))
+    base = "".join(c for c in base if not unicodedata.combining(c))
+    digits = sum(c.isdigit() for c in base)
+    return max(1, len(_VOWELS.findall(base)) + digits)
+
+
+def speech_regions(x: np.ndarray, sr: int) -> list:
+    """Các đoạn (start, end) giây có tiếng nói theo năng lượng."""
+    hop = max(1, int(round(FRAME_S * sr)))
+    n = len(x) // hop
+    duration = len(x) / float(sr)
+    if n == 0:
+        return [(0.0, duration)]
+    frames = x[:n * hop].reshape(n, hop).astype(np.float32)
+    db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    floor, peak = np.percentile(db, 10), np.percentile(db, 95)
+    if peak - floor < MIN_DB_MARGIN:  # gần như phẳng: cả clip là tiếng nói (hoặc im lặng hoàn toàn)
+        return [(0.0, duration)]
+    voiced = db > floor + max(MIN_DB_MARGIN, 0.25 * (peak - floor))
+
+    # Biên các đoạn liên tiếp True
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    runs = [[a * FRAME_S, b * FRAME_S] for a, b in zip(edges[::2], edges[1::2])]
+
+    merged = []
+    for r in runs:
+        if merged and r[0] - merged[-1][1] < MIN_PAUSE:
+            merged[-1][1] = r[1]
+        else:
+            merged.append(r)
+    regions = [(max(0.0, a - PAD), min(duration, b + PAD)) for a, b in merged if b - a >= MIN_SPEECH]
+    return regions or [(0.0, duration)]
+
+
+def _to_real_time(s: float, regions, cum, right: bool) -> float:
+    """Thời gian nói s -> thời gian thật; right: đúng ranh giới đoạn thì lấy đầu đoạn sau."""
+    i = int(np.searchsorted(cum, s, side="right" if right else "left")) - 1
+    i = min(max(i, 0), len(regions) - 1)
+    a, b = regions[i]
+    return min(b, a + (s - cum[i]))
+
+
+def align_words(words, regions) -> list:
+    """Trải words lên regions theo số âm tiết. Trả về list (start, end)."""
+    weights = np.array([syllables(w) for w in words], dtype=np.float64)
+    lengths = np.array([b - a for a, b in regions])
+    cum = np.concatenate(([0.0], np.cumsum(lengths)))
+    bounds = np.concatenate(([0.0], np.cumsum(weights))) * (cum[-1] / weights.sum())
+
+    out = []
+    for s0, s1 in zip(bounds[:-1], bounds[1:]):
+        start = _to_real_time(s0, regions, cum, right=True)
+        end = _to_real_time(s1, regions, cum, right=False)
+        i0 = min(int(np.searchsorted(cum, s0, side="right")) - 1, len(regions) - 1)
+        i1 = min(max(int(np.searchsorted(cum, s1, side="left")) - 1, 0), len(regions) - 1)
+        if i1 > i0:
+            # Vắt qua khoảng lặng: giữ trong đoạn chứa nhiều "thời gian nói" của từ hơn
+            if cum[i0 + 1] - s0 >= s1 - cum[i1]:
+                end = regions[i0][1]
+            else:
+                start = regions[i1][0]
+        out.append((start, max(end, start)))
+    return out
+
+
+def align_text(wav_path: str, text: str) -> list:
+    """wav + transcript -> list {index, start, end, content} (giây, tính từ đầu clip)."""
+    from video_maker.audio_engine import read_wav
+
+    words = text.split()
+    if not words:
+        return []
+    x, sr = read_wav(wav_path)
+    times = align_words(words, speech_regions(x, sr))
+    return [{"index": i + 1, "start": round(a, 3), "end": round(b, 3), "content": w}
+            for i, (w, (a, b)) in enumerate(zip(words, times))]
+
+
+class AlignTranscriber(Transcriber):
+    """Backend 'align' của utils.transcribe: dùng transcript có sẵn trong request thay cho ASR."""
+    name = "align"
+    version = "1"
+    uses_text = True
+
+    def transcribe(self, wav_path, text=None):
+        if not text or not text.strip():
+            raise ValueError(f"Backend align cần transcript của clip: {wav_path}")
+        return align_text(wav_path, text)
@@ -0,0 +1,273 @@
+"""
+Cache file tải về (wav/ảnh) trên đĩa, dùng chung giữa các request/job/process.
+
+Bố cục thư mục:
+  <root>/blobs/<sha256>        nội dung file, đặt tên theo hash nội dung (trùng nội dung -> 1 bản)
+  <root>/index/<sha1(url)>.json {url, sha256, size, etag, last_modified, checked_at}
+
+- Cache hit (còn trong TTL) trả về path local ngay, không có request mạng nào
+- Quá TTL thì revalidate bằng If-None-Match / If-Modified-Since (304 -> vẫn dùng blob cũ)
+- Ghi file bằng tmp + os.replace nên an toàn khi nhiều reader/writer chạy song song
+- Giới hạn dung lượng theo byte, xoá blob ít dùng nhất (LRU theo mtime, hit sẽ touch lại)
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from utils.downloader import CHUNK_SIZE, _get_executor, _host_semaphore, get_session
+
+CACHE_DIR = os.getenv("ASSET_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "asset_cache")
+CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+CACHE_TTL = float(os.getenv("ASSET_CACHE_TTL", "86400"))
+CACHE_ENABLED = os.getenv("ASSET_CACHE_ENABLED", "1").lower() in {"1", "true", "yes"}
+
+
+class AssetCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.blob_dir = os.path.join(root, "blobs")
+        self.index_dir = os.path.join(root, "index")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.bytes_downloaded = 0
+
+    # ---- index ----
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.index_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256)
+
+    def _read_entry(self, url: str):
+        try:
+            with open(self._index_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, url: str, entry: dict) -> None:
+        path = self._index_path(url)
+        fd, tmp = tempfile.mkstemp(dir=self.index_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        # Cùng 1 URL trong process chỉ tải 1 lần, các thread khác chờ rồi dùng kết quả
+        with self._lock:
+            lock = self._url_locks.get(url)
+            if lock is None:
+                lock = self._url_locks[url] = threading.Lock()
+            return lock
+
+    # ---- API ----
+    def lookup(self, url: str):
+        """Trả về path blob nếu đang có trong cache (không kiểm tra TTL, không gọi mạng)."""
+        entry = self._read_entry(url)
+        if not entry:
+            return None
+        path = self.blob_path(entry["sha256"])
+        try:
+            os.utime(path)  # đánh dấu vừa dùng cho LRU
+        except FileNotFoundError:
+            return None
+        return path
+
+    def content_hash(self, url: str):
+        """sha256 nội dung của URL lần tải gần nhất (None nếu chưa từng tải), không gọi mạng."""
+        entry = self._read_entry(url)
+        return entry.get("sha256") if entry else None
+
+    def fetch(self, url: str, timeout=30) -> str:
+        """Trả về path local của URL, tải (hoặc revalidate) nếu cần."""
+        return self._fetch(url, timeout=timeout)[0]
+
+    def _fetch(self, url: str, timeout=30):
+        # -> (path, hit)
+        with self._url_lock(url):
+            entry = self._read_entry(url)
+            path = self.lookup(url) if entry else None
+            if path and time.time() - entry.get("checked_at", 0) < self.ttl:
+                self._count("hits")
+                return path, True
+
+            headers = {}
+            if path:
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+            with _host_semaphore(url):
+                with get_session().get(url, stream=True, timeout=timeout, headers=headers) as r:
+                    if path and r.status_code == 304:
+                        entry["checked_at"] = time.time()
+                        self._write_entry(url, entry)
+                        self._count("hits")
+                        self._count("revalidated")
+                        return path, True
+                    r.raise_for_status()
+                    sha256, size = self._store_stream(r)
+                    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+
+            self._count("misses")
+            self._count("bytes_downloaded", size)
+            self._write_entry(url, {
+                "url": url,
+                "sha256": sha256,
+                "size": size,
+                "etag": etag,
+                "last_modified": last_modified,
+                "checked_at": time.time(),
+            })
+        self.evict()
+        return self.blob_path(sha256), False
+
+    def _store_stream(self, response):
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.blob_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        h.update(chunk)
+                        size += len(chunk)
+            sha256 = h.hexdigest()
+            os.chmod(tmp, 0o644)  # mkstemp tạo 0600; blob còn được ffmpeg/Chromium đọc
+            os.replace(tmp, self.blob_path(sha256))
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return sha256, size
+
+    def materialize(self, url: str, dest: str, timeout=30) -> dict:
+        """
+        Đưa file của URL vào dest (hard link nếu cùng filesystem, không thì copy).
+        Blob có thể bị process khác evict đúng lúc link -> tải lại 1 lần.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        t0 = time.perf_counter()
+        for attempt in range(2):
+            src, hit = self._fetch(url, timeout=timeout)
+            try:
+                if os.path.exists(dest):
+                    os.unlink(dest)
+                try:
+                    os.link(src, dest)
+                except OSError:
+                    shutil.copyfile(src, dest)
+                break
+            except FileNotFoundError:
+                if attempt == 1:
+                    raise
+                self._write_entry(url, {})  # entry hỏng -> ép tải lại
+        return {
+            "url": url,
+            "path": dest,
+            "bytes": os.path.getsize(dest),
+            "seconds": round(time.perf_counter() - t0, 3),
+            "cached": hit,
+        }
+
+    def evict(self) -> None:
+        """Xoá blob cũ nhất (mtime) cho tới khi tổng dung lượng <= max_bytes."""
+        lock_path = os.path.join(self.root, ".evict.lock")
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # 1 process evict tại 1 thời điểm
+            blobs = []
+            total = 0
+            with os.scandir(self.blob_dir) as it:
+                for e in it:
+                    if e.name.endswith(".part"):
+                        continue
+                    try:
+                        st = e.stat()
+                    except FileNotFoundError:
+                        continue
+                    blobs.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+            if total <= self.max_bytes:
+                return
+            blobs.sort()
+            for _, size, path in blobs:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._count("evictions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "bytes_downloaded": self.bytes_downloaded,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """Cache dùng chung cho cả process (None nếu tắt bằng ASSET_CACHE_ENABLED=0)."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache()
+        return _cache
+
+
+def localize_urls(sources, timeout=30, return_exceptions=False):
+    """
+    Đổi các URL http(s) thành path local trong cache (tải song song), giữ nguyên path local.
+    Dùng cho poster: Chromium đọc file local thay vì tự tải lại ảnh mỗi lần render.
+    return_exceptions=True: URL tải lỗi trả về Exception tại vị trí đó thay vì raise (dùng cho batch).
+    """
+    cache = get_asset_cache()
+    sources = list(sources)
+    if cache is None:
+        return sources
+    executor = _get_executor()
+    futures = {}
+    for i, s in enumerate(sources):
+        if isinstance(s, str) and s.strip().lower().startswith(("http://", "https://")):
+            futures[i] = executor.submit(cache.fetch, s.strip(), timeout)
+    out = list(sources)
+    for i, fut in futures.items():
+        try:
+            out[i] = fut.result()
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            out[i] = e
+    return out
@@ -1,9 +1,7 @@
 import srt
 
-def convert_srt_to_json(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        srt_text = f.read()
-
+def parse_srt(srt_text):
+    """Nội dung .srt -> list {index, start, end, content} (giây float)."""
     subtitles = list(srt.parse(srt_text))
     tmp_list = []
     for sub in subtitles:
@@ -14,7 +12,11 @@ def convert_srt_to_json(file_path):
             "content": sub.content
         })
     return tmp_list
-        
+
+def convert_srt_to_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return parse_srt(f.read())
+
 import sys
 if __name__=="__main__":
     file_path = sys.argv[1] if len(sys.argv) > 2 else "audio/output.srt"
@@ -0,0 +1,132 @@
+"""
+Tải file (wav/ảnh) song song với 1 HTTP session dùng chung (keep-alive, connection pool).
+- Pool thread giới hạn toàn process + giới hạn số kết nối đồng thời theo từng host
+- Stream body xuống đĩa theo chunk (không giữ cả file trong RAM), ghi .part rồi rename
+- Trả về thời gian tải của từng file để log/benchmark
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import metrics
+
+MAX_WORKERS = int(os.getenv("DOWNLOAD_MAX_WORKERS", "16"))
+PER_HOST_LIMIT = int(os.getenv("DOWNLOAD_PER_HOST", "6"))
+CHUNK_SIZE = 256 * 1024
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+_host_semaphores = {}
+
+
+def get_session() -> requests.Session:
+    """Session dùng chung cho cả process: tái sử dụng kết nối giữa các file và giữa các job."""
+    global _session
+    with _lock:
+        if _session is None:
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=("GET", "HEAD"))
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(MAX_WORKERS, PER_HOST_LIMIT),
+                                  max_retries=retry)
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Pool chung cho mọi job -> tổng số download đồng thời của process luôn bị chặn
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="download")
+        return _executor
+
+
+def _host_semaphore(url: str) -> threading.Semaphore:
+    host = urlparse(url).netloc
+    with _lock:
+        sem = _host_semaphores.get(host)
+        if sem is None:
+            sem = _host_semaphores[host] = threading.Semaphore(PER_HOST_LIMIT)
+        return sem
+
+
+def download_file(url: str, dest: str, timeout=30, use_cache=True) -> dict:
+    """
+    Tải 1 URL về dest (stream theo chunk). Trả về {url, path, bytes, seconds, cached}.
+    Nếu asset cache bật, dest là hard link tới blob trong cache -> không được ghi đè tại chỗ.
+    """
+    if use_cache:
+        from utils.asset_cache import get_asset_cache
+        cache = get_asset_cache()
+        if cache is not None:
+            return cache.materialize(url, dest, timeout=timeout)
+
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    tmp_path = dest + ".part"
+    with _host_semaphore(url):
+        t0 = time.perf_counter()
+        n_bytes = 0
+        try:
+            with get_session().get(url, stream=True, timeout=timeout) as r:
+                r.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            n_bytes += len(chunk)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        seconds = time.perf_counter() - t0
+    return {"url": url, "path": dest, "bytes": n_bytes, "seconds": round(seconds, 3), "cached": False}
+
+
+def download_many(items, timeout=30, on_complete=None) -> list[dict]:
+    """
+    Tải song song danh sách (url, dest). Kết quả giữ đúng thứ tự đầu vào.
+    on_complete(result) được gọi ngay khi từng file tải xong (từ thread tải).
+    Lỗi của file đầu tiên hỏng sẽ được raise sau khi các file khác đã chạy xong.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def _task(url, dest):
+        res = download_file(url, dest, timeout=timeout)
+        if on_complete is not None:
+            on_complete(res)
+        return res
+
+    t0 = time.perf_counter()
+    executor = _get_executor()
+    futures = [executor.submit(_task, url, dest) for url, dest in items]
+
+    results, first_error = [], None
+    for fut in futures:
+        try:
+            results.append(fut.result())
+        except Exception as e:
+            if first_error is None:
+                first_error = e
+    if first_error is not None:
+        raise first_error
+
+    metrics.count_downloads(results)
+    total = time.perf_counter() - t0
+    slowest = max(r["seconds"] for r in results)
+    n_cached = sum(1 for r in results if r.get("cached"))
+    print(f"⬇️  Tải {len(results)} file ({n_cached} từ cache) trong {total:.2f}s "
+          f"(file chậm nhất {slowest:.2f}s, tổng tuần tự {sum(r['seconds'] for r in results):.2f}s)")
+    return results
@@ -1,18 +1,27 @@
 """
-Hàm để chuyển file .wav thành .srt và lưu ra file.
+Hàm để chuyển file .wav thành nội dung .srt (word-level) bằng Gemini.
 """
 
 from google import genai
 import os
+import threading
 
-def get_srt_from_wav_file(api_key=None, file_path="audio/output.wav"):
-    client = genai.Client(api_key=api_key)
+MODEL = "gemini-2.5-pro"
+
+_clients = {}
+_clients_lock = threading.Lock()
 
-    # Upload file audio
-    myfile = client.files.upload(file=file_path)
 
-    # Prompt mô tả rõ ràng
-    prompt = """
+def get_client(api_key=None):
+    """genai.Client dùng chung theo api_key (không tạo lại client cho mỗi clip)."""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = genai.Client(api_key=api_key)
+        return client
+
+
+PROMPT = """
     Transcribe this audio file into a valid .srt subtitle file (word by word).
 
     🧩 Requirements:
@@ -43,12 +52,23 @@ def get_srt_from_wav_file(api_key=None, file_path="audio/output.wav"):
     """
 
 
+def get_srt_text(file_path, api_key=None, model=MODEL) -> str:
+    """Upload file audio lên Gemini, trả về nội dung .srt (không ghi file)."""
+    client = get_client(api_key)
+
+    # Upload file audio
+    myfile = client.files.upload(file=file_path)
+
     # ✅ Truyền đúng dạng: text + file
     response = client.models.generate_content(
-    model='gemini-2.5-pro',
-    contents=[prompt, myfile]
+    model=model,
+    contents=[PROMPT, myfile]
     )
-    srt_text = response.text.strip()
+    return response.text.strip()
+
+
+def get_srt_from_wav_file(api_key=None, file_path="audio/output.wav"):
+    srt_text = get_srt_text(file_path, api_key=api_key)
 
     # ✅ Lưu ra file .srt
     base_name = os.path.splitext(file_path)[0]
@@ -57,6 +77,7 @@ def get_srt_from_wav_file(api_key=None, file_path="audio/output.wav"):
         f.write(srt_text)
 
     print(f"✅ SRT file saved to: {output_path}")
+    return srt_text
 
 
 # if __name__ == "__main__":
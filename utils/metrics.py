@@ -0,0 +1,192 @@
+"""
+Metrics Prometheus cho pipeline video + poster, xuất ở GET /metrics.
+
+- pipeline_stage_seconds{pipeline, stage}: thời gian từng stage (Job.track, metrics.span)
+  pipeline = video (download, audio, transcribe, images, timeline, encode, upload, ... + total),
+  transcribe (stage = backend: gemini/align/stub), poster (localize, build_html, render, batch_render)
+- video_jobs_in_flight{status}: job đang queued / running; video_jobs_total{status}: done / error
+- video_encode_fps: tốc độ encode (frame/giây) của mỗi video
+- download_bytes_total{source}: net / cache; upload_bytes_total
+- video_job_peak_rss_bytes: RSS cao nhất của process trong lúc job chạy (lấy mẫu mỗi METRICS_RSS_INTERVAL
+  giây; nhiều job song song thì cùng thấy RSS của cả process)
+- poster_requests_total{result}: hit / miss / not_modified / error; poster_renders_in_flight
+
+Dùng registry mặc định của prometheus_client (kèm process_* / python_*).
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST as CONTENT_TYPE
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
+
+RSS_SAMPLE_INTERVAL = float(os.getenv("METRICS_RSS_INTERVAL", "0.5"))
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+FPS_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 240)
+RSS_BUCKETS = tuple(mb * 1024 ** 2 for mb in (128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192))
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Thời gian từng stage của pipeline",
+                          ("pipeline", "stage"), buckets=STAGE_BUCKETS)
+JOBS_IN_FLIGHT = Gauge("video_jobs_in_flight", "Job video đang chờ / đang chạy", ("status",))
+JOBS_TOTAL = Counter("video_jobs", "Job video đã kết thúc", ("status",))
+ENCODE_FPS = Histogram("video_encode_fps", "Tốc độ encode (frame/giây) của mỗi video", buckets=FPS_BUCKETS)
+JOB_PEAK_RSS = Histogram("video_job_peak_rss_bytes", "RSS cao nhất của process trong lúc job chạy",
+                         buckets=RSS_BUCKETS)
+DOWNLOAD_BYTES = Counter("download_bytes", "Số byte asset đã tải", ("source",))
+UPLOAD_BYTES = Counter("upload_bytes", "Số byte video đã upload")
+POSTER_REQUESTS = Counter("poster_requests", "Request /generate-poster theo kết quả", ("result",))
+POSTER_IN_FLIGHT = Gauge("poster_renders_in_flight", "Poster đang render")
+
+
+# (job, stage) của Job.track đang chạy trên thread/context hiện tại -> span con ghi thêm vào job.timings
+_current = ContextVar("metrics_current_stage", default=None)
+
+
+def observe_stage(pipeline: str, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(pipeline, stage).observe(seconds)
+
+
+def bind(job, stage: str):
+    return _current.set((job, stage))
+
+
+def unbind(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def span(pipeline: str, stage: str, timings=None):
+    """
+    Đo 1 stage -> histogram pipeline_stage_seconds. Nằm trong Job.track("audio") thì ghi thêm
+    job.timings["audio.<stage>"]; timings (dict) -> ghi timings[stage] (vd. header Server-Timing).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        observe_stage(pipeline, stage, elapsed)
+        cur = _current.get()
+        if cur is not None:
+            job, parent = cur
+            job.add_timing(f"{parent}.{stage}", elapsed)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing(timings: dict) -> str:
+    """Header Server-Timing (ms) từ dict stage -> giây."""
+    return ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in timings.items())
+
+
+def count_downloads(results) -> int:
+    """Cộng byte của kết quả download_many vào download_bytes_total; trả về tổng byte."""
+    total = 0
+    for r in results:
+        DOWNLOAD_BYTES.labels("cache" if r.get("cached") else "net").inc(r["bytes"])
+        total += r["bytes"]
+    return total
+
+
+def record_encode(job, frames: int, seconds: float) -> None:
+    if frames <= 0 or seconds <= 0:
+        return
+    fps = frames / seconds
+    ENCODE_FPS.observe(fps)
+    if job is not None:
+        job.set_resource("encode_fps", round(fps, 2))
+
+
+def rss_bytes():
+    """RSS hiện tại của process (None nếu không đọc được)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        # không có /proc (macOS): chỉ có đỉnh RSS từ lúc khởi động process
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class RssSampler:
+    """Thread nền lấy mẫu RSS khi có job đang chạy, giữ đỉnh riêng cho từng job."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._peaks = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def watch(self, key) -> None:
+        rss = rss_bytes() or 0
+        with self._lock:
+            self._peaks[key] = rss
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def unwatch(self, key):
+        """Ngừng theo dõi key, trả về đỉnh RSS (byte) đã thấy."""
+        rss = rss_bytes() or 0
+        with self._lock:
+            peak = self._peaks.pop(key, None)
+        return None if peak is None else max(peak, rss)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                idle = not self._peaks
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            rss = rss_bytes()
+            if rss is not None:
+                with self._lock:
+                    for key, peak in self._peaks.items():
+                        if rss > peak:
+                            self._peaks[key] = rss
+            time.sleep(self.interval)
+
+
+_sampler = RssSampler()
+
+
+def job_queued() -> None:
+    JOBS_IN_FLIGHT.labels("queued").inc()
+
+
+def job_started(job) -> None:
+    JOBS_IN_FLIGHT.labels("queued").dec()
+    JOBS_IN_FLIGHT.labels("running").inc()
+    _sampler.watch(job.id)
+
+
+def job_finished(job, status: str) -> None:
+    """Gọi khi job chạy xong (status: done | error): cập nhật gauge, tổng thời gian, đỉnh RSS."""
+    JOBS_IN_FLIGHT.labels("running").dec()
+    JOBS_TOTAL.labels(status).inc()
+    if job.started_at:
+        observe_stage("video", "total", time.time() - job.started_at)
+    peak = _sampler.unwatch(job.id)
+    if peak:
+        JOB_PEAK_RSS.observe(peak)
+        job.set_resource("peak_rss_mb", round(peak / 1024 ** 2, 1))
+
+
+def render() -> bytes:
+    """Nội dung cho GET /metrics (Prometheus text format)."""
+    return generate_latest()
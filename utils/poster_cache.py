@@ -0,0 +1,191 @@
+"""
+Cache ảnh poster đã render của /generate-poster: cùng layout + cùng tuỳ chọn render -> trả lại bytes cũ.
+
+- Key = sha256 của HTML build_html (đã chứa path ảnh local, text, layout, font) + tuỳ chọn render
+  (renderer, fmt, quality, scale, wait, script_path) + size/mtime của file ảnh local + POSTER_CACHE_SALT.
+  Ảnh remote được localize vào asset cache (blob đặt tên theo sha256 nội dung) nên đổi nội dung -> đổi key.
+- 2 tầng: RAM (LRU theo byte, POSTER_CACHE_MEM_BYTES) rồi đĩa (<root>/<key>, LRU theo mtime,
+  POSTER_CACHE_DISK_BYTES); hit trên đĩa được đưa lên RAM.
+- Mỗi poster kèm info của bước xuất ảnh (vd. quality thực tế khi dùng max_bytes) ở <root>/<key>.json
+  -> hit trả đúng các header như lúc render.
+- ETag = key: client gửi If-None-Match khớp -> 304 luôn, không cần render lẫn đọc cache.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+POSTER_CACHE_DIR = os.getenv("POSTER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "poster_cache")
+POSTER_CACHE_MEM_BYTES = int(os.getenv("POSTER_CACHE_MEM_BYTES", str(64 * 1024 ** 2)))
+POSTER_CACHE_DISK_BYTES = int(os.getenv("POSTER_CACHE_DISK_BYTES", str(1024 ** 3)))
+POSTER_CACHE_ENABLED = os.getenv("POSTER_CACHE_ENABLED", "1").lower() in {"1", "true", "yes"}
+POSTER_CACHE_SALT = os.getenv("POSTER_CACHE_SALT", "1")
+
+
+def _file_stamp(src: str):
+    """(size, mtime_ns) của ảnh local (path hoặc file://), None với URL/data URI/file không tồn tại."""
+    if src.lower().startswith("file://"):
+        src = unquote(urlparse(src).path)
+    elif "://" in src or src.startswith("data:"):
+        return None
+    try:
+        st = os.stat(src)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def poster_key(html: str, images, **options) -> str:
+    payload = {
+        "salt": POSTER_CACHE_SALT,
+        "html": hashlib.sha256(html.encode("utf-8")).hexdigest(),
+        "files": [_file_stamp(s) for s in images if isinstance(s, str)],
+        "options": options,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match, key: str) -> bool:
+    """Header If-None-Match (có thể nhiều giá trị, W/ hoặc *) có khớp ETag của key không."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag_for(key) for t in tags)
+
+
+class PosterCache:
+    def __init__(self, root=POSTER_CACHE_DIR, mem_bytes=POSTER_CACHE_MEM_BYTES, disk_bytes=POSTER_CACHE_DISK_BYTES):
+        self.root = root
+        self.mem_bytes = mem_bytes
+        self.disk_bytes = disk_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()  # key -> (bytes, info), cuối = vừa dùng
+        self._mem_size = 0
+        self.mem_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _remember(self, key: str, data: bytes, info: dict) -> None:
+        """Đưa vào tầng RAM, bỏ bớt mục ít dùng nhất khi vượt mem_bytes (gọi khi đang giữ lock)."""
+        if len(data) > self.mem_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_size -= len(old[0])
+        self._mem[key] = (data, info)
+        self._mem_size += len(data)
+        while self._mem_size > self.mem_bytes:
+            _, (dropped, _) = self._mem.popitem(last=False)
+            self._mem_size -= len(dropped)
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str):
+        """(bytes, info) nếu có trong cache, ngược lại None."""
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+                self.mem_hits += 1
+                return entry
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path + ".json", "rb") as f:
+                info = json.load(f)
+            os.utime(path)  # đánh dấu vừa dùng cho LRU trên đĩa
+        except (FileNotFoundError, ValueError):  # thiếu/hỏng info -> coi như miss, render lại
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, data, info)
+        return data, info
+
+    def put(self, key: str, data: bytes, info=None) -> None:
+        info = dict(info or {})
+        with self._lock:
+            self._remember(key, data, info)
+        path = self._path(key)
+        # info ghi trước: có file ảnh thì luôn có info đi kèm
+        self._write(path + ".json", json.dumps(info).encode("utf-8"))
+        self._write(path, data)
+        self.evict()
+
+    def evict(self) -> None:
+        """Xoá file poster cũ nhất (mtime, kèm file info) cho tới khi tổng dung lượng trên đĩa <= disk_bytes."""
+        files, total = [], 0
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.name.endswith((".part", ".json")):
+                    continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        if total <= self.disk_bytes:
+            return
+        files.sort()
+        for _, size, path in files:
+            if total <= self.disk_bytes:
+                break
+            for p in (path, path + ".json"):
+                try:
+                    os.unlink(p)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": True,
+                "mem_hits": self.mem_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "mem_entries": len(self._mem),
+                "mem_bytes": self._mem_size,
+                "max_mem_bytes": self.mem_bytes,
+                "max_disk_bytes": self.disk_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_poster_cache():
+    """Cache dùng chung cho cả process (None nếu tắt bằng POSTER_CACHE_ENABLED=0)."""
+    global _cache
+    if not POSTER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PosterCache()
+        return _cache
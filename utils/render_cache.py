@@ -0,0 +1,190 @@
+"""
+Cache kết quả render của /generate-video: cùng nội dung request -> trả lại object đã upload, không render lại.
+
+- Key = sha256 của MakeVideoRequest đã chuẩn hoá (JSON sort key, bỏ các field không ảnh hưởng
+  tới video như id) + RENDER_CACHE_SALT (đổi khi deploy code render mới để bỏ cache cũ)
+- Record <root>/<key>.json {key, url, dest, backend, assets: {url: sha256}, created_at}; dest = "<id>.mp4"
+- <root>/owners/<sha256(backend:dest)>: key của lần render gần nhất ghi object dest. 2 request cùng id
+  khác nội dung ghi đè cùng object -> record của request trước mất quyền sở hữu, lookup bỏ qua
+  (RENDER_CACHE_DIR dùng chung giữa các instance thì cũng thấy nhau)
+- Lookup chỉ tin record khi:
+    * còn trong TTL và cùng STORAGE_BACKEND
+    * hash nội dung wav/ảnh lúc render khớp hash hiện tại trong asset cache (nếu asset cache biết)
+      -> cùng URL nhưng nội dung đã đổi thì render lại
+    * object dest vẫn do key này ghi sau cùng (owners/)
+    * object còn tồn tại trên storage (RENDER_CACHE_VERIFY=1)
+
+Gộp request trùng đang chạy (single-flight) nằm ở JobManager.submit(key=...).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "render_cache")
+RENDER_CACHE_TTL = float(os.getenv("RENDER_CACHE_TTL", str(7 * 86400)))
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "1").lower() in {"1", "true", "yes"}
+RENDER_CACHE_VERIFY = os.getenv("RENDER_CACHE_VERIFY", "1").lower() in {"1", "true", "yes"}
+RENDER_CACHE_SALT = os.getenv("RENDER_CACHE_SALT", "1")
+
+# Field của request không làm đổi nội dung video
+IGNORED_FIELDS = {"id"}
+
+
+def canonical_request(body) -> dict:
+    """MakeVideoRequest -> dict JSON đã chuẩn hoá (url dạng chuỗi, màu viết thường)."""
+    data = body.model_dump(mode="json", exclude=IGNORED_FIELDS)
+    if isinstance(data.get("color"), str):
+        data["color"] = data["color"].strip().lower()
+    return data
+
+
+def request_key(body) -> str:
+    payload = {"salt": RENDER_CACHE_SALT, "request": canonical_request(body)}
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def asset_hashes(urls) -> dict:
+    """{url: sha256} cho các URL asset cache đang biết nội dung (không gọi mạng)."""
+    from utils.asset_cache import get_asset_cache
+
+    cache = get_asset_cache()
+    if cache is None:
+        return {}
+    out = {}
+    for u in urls:
+        h = cache.content_hash(u)
+        if h:
+            out[u] = h
+    return out
+
+
+class RenderCache:
+    def __init__(self, root=RENDER_CACHE_DIR, ttl=RENDER_CACHE_TTL, verify=RENDER_CACHE_VERIFY):
+        self.root = root
+        self.ttl = ttl
+        self.verify = verify
+        os.makedirs(os.path.join(root, "owners"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stores = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".json")
+
+    def _owner_path(self, backend: str, dest: str) -> str:
+        name = hashlib.sha256(f"{backend}:{dest}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, "owners", name)
+
+    def owner(self, backend: str, dest: str):
+        """Key của lần render gần nhất đã ghi object dest (None nếu chưa biết)."""
+        try:
+            with open(self._owner_path(backend, dest), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _write(self, path: str, text: str) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _read(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, key: str, urls=()):
+        """URL của video đã render cho key, hoặc None nếu chưa có / không còn dùng được."""
+        from utils import storage
+
+        record = self._read(key)
+        if not record:
+            self._count("misses")
+            return None
+        if time.time() - record.get("created_at", 0) > self.ttl or record.get("backend") != storage.STORAGE_BACKEND:
+            return self._drop(key)
+        current = asset_hashes(urls)
+        if any(record.get("assets", {}).get(u, h) != h for u, h in current.items()):
+            print(f"♻️ Asset đã đổi nội dung từ lần render trước -> render lại ({key[:12]})")
+            return self._drop(key)
+        if self.owner(record["backend"], record["dest"]) != key:
+            print(f"♻️ Object {record['dest']} đã bị request khác ghi đè -> render lại ({key[:12]})")
+            return self._drop(key)
+        if self.verify:
+            try:
+                exists = storage.get_backend().exists(record["dest"])
+            except Exception as e:
+                # Không kiểm tra được thì coi như miss (render lại an toàn hơn trả URL hỏng)
+                print(f"⚠️ Không kiểm tra được object {record['dest']}: {e}")
+                exists = False
+            if not exists:
+                return self._drop(key)
+        self._count("hits")
+        return record["url"]
+
+    def _drop(self, key: str):
+        self._count("stale")
+        self.invalidate(key)
+        return None
+
+    def store(self, key: str, url: str, dest: str, urls=()) -> None:
+        from utils import storage
+
+        record = {
+            "key": key,
+            "url": url,
+            "dest": dest,
+            "backend": storage.STORAGE_BACKEND,
+            "assets": asset_hashes(urls),
+            "created_at": time.time(),
+        }
+        # owner trước: record chỉ dùng được khi object đúng là của key này
+        self._write(self._owner_path(record["backend"], dest), key)
+        self._write(self._path(key), json.dumps(record))
+        self._count("stores")
+
+    def invalidate(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "stores": self.stores,
+                "ttl": self.ttl,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Cache dùng chung cả process (None nếu tắt bằng RENDER_CACHE_ENABLED=0)."""
+    global _cache
+    if not RENDER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
@@ -0,0 +1,410 @@
+"""
+Lớp lưu trữ file đầu ra (mp4) với backend thay được:
+- gcs:   google-cloud-storage, 1 client dùng chung cả process, upload resumable theo chunk
+         (thư viện tự retry đúng chunk lỗi, không gửi lại từ đầu)
+- local: copy vào thư mục (STORAGE_LOCAL_DIR), trả về STORAGE_PUBLIC_BASE_URL/<dest> hoặc file://
+- http:  PUT từng chunk kèm Content-Range lên 1 server (vd. benchmarks/fake_storage.py),
+         retry riêng chunk lỗi — cùng kiểu giao thức resumable của GCS, chạy được không cần cloud
+
+Upload dạng stream: GrowingFileReader đọc file mp4 (fragmented) trong lúc encoder còn đang ghi,
+StreamingUpload chạy upload trên thread riêng và kiểm tra lại nội dung khi encoder xong
+(nếu file bị ghi đè phần đã gửi thì upload lại cả file).
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from urllib.parse import quote
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")          # gcs | local | http
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR") or os.path.join(os.getcwd(), "storage")
+STORAGE_PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "")
+STORAGE_HTTP_URL = os.getenv("STORAGE_HTTP_URL", "http://127.0.0.1:8790")
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))  # bội số 256 KB (GCS)
+UPLOAD_CHUNK_RETRIES = int(os.getenv("UPLOAD_CHUNK_RETRIES", "5"))
+STREAM_UPLOAD = os.getenv("STREAM_UPLOAD", "0").lower() in {"1", "true", "yes"}
+
+_lock = threading.Lock()
+_gcs_client = None
+_backends = {}
+
+
+def _align_chunk(n: int) -> int:
+    unit = 256 * 1024
+    return max(unit, n // unit * unit)
+
+
+class GrowingFileReader(io.RawIOBase):
+    """
+    File-like đọc 1 file đang được ghi: read(n) chờ tới khi đủ n byte hoặc writer báo xong (finish()).
+    Hỗ trợ seek/tell để thư viện upload quay lại offset của chunk lỗi.
+    sha256 tính trên dữ liệu đọc lần đầu theo thứ tự -> so với file cuối để biết writer có ghi đè không.
+    """
+
+    def __init__(self, path: str, poll=0.05, timeout=None):
+        super().__init__()
+        self.path = path
+        self.poll = poll
+        self.timeout = timeout      # giây chờ tối đa khi không có dữ liệu mới
+        self._done = threading.Event()
+        self._error = None
+        self._f = None
+        self._pos = 0
+        self._high = 0              # số byte đã đọc lần đầu (đã vào digest)
+        self._sha = hashlib.sha256()
+
+    # --- phía writer ---
+    def finish(self) -> None:
+        self._done.set()
+
+    def abort(self, exc: BaseException) -> None:
+        self._error = exc
+        self._done.set()
+
+    # --- phía reader ---
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence=io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            self._wait_done()
+            offset += os.path.getsize(self.path)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def _wait_done(self):
+        self._done.wait()
+        if self._error is not None:
+            raise IOError(f"Writer lỗi, dừng upload: {self._error}")
+
+    def _open(self) -> bool:
+        if self._f is None:
+            try:
+                self._f = open(self.path, "rb")
+            except FileNotFoundError:
+                return False
+        return True
+
+    def read(self, n=-1) -> bytes:
+        if n is None or n < 0:
+            self._wait_done()
+            n = max(os.path.getsize(self.path) - self._pos, 0)
+        chunks, need = [], n
+        waited = 0.0
+        while need > 0:
+            if self._error is not None:
+                raise IOError(f"Writer lỗi, dừng upload: {self._error}")
+            done = self._done.is_set()  # đọc cờ trước khi đọc file -> không bỏ sót byte cuối
+            data = b""
+            if self._open():
+                self._f.seek(self._pos)
+                data = self._f.read(need)
+            if data:
+                self._account(data)
+                chunks.append(data)
+                need -= len(data)
+                waited = 0.0
+                continue
+            if done:
+                if self._error is not None:
+                    raise IOError(f"Writer lỗi, dừng upload: {self._error}")
+                break
+            time.sleep(self.poll)
+            waited += self.poll
+            if self.timeout and waited > self.timeout:
+                raise TimeoutError(f"Không có dữ liệu mới trong {self.timeout}s: {self.path}")
+        return b"".join(chunks)
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def _account(self, data: bytes) -> None:
+        end = self._pos + len(data)
+        if end > self._high:
+            fresh = data[len(data) - (end - self._high):] if self._pos < self._high else data
+            self._sha.update(fresh)
+            self._high = end
+        self._pos = end
+
+    def matches_file(self) -> bool:
+        """Dữ liệu đã stream có trùng file cuối cùng không (writer không ghi đè phần đã gửi)."""
+        if os.path.getsize(self.path) != self._high:
+            return False
+        h = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest() == self._sha.hexdigest()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        super().close()
+
+
+def _source_stream(source):
+    """path -> (file mở để đọc, cần đóng); file-like -> (chính nó, không đóng)."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb"), True
+    return source, False
+
+
+class StorageBackend:
+    name = "base"
+
+    def upload(self, source, dest: str, content_type="video/mp4", make_public=False) -> str:
+        """source: đường dẫn file hoặc file-like (vd. GrowingFileReader). Trả về URL của object."""
+        raise NotImplementedError
+
+    def exists(self, dest: str) -> bool:
+        """Object dest đã có trên storage chưa (dùng cho render cache)."""
+        raise NotImplementedError
+
+
+class ChunkedBackend(StorageBackend):
+    """Khung upload theo chunk cho backend tự cài giao thức: mỗi chunk retry riêng (backoff luỹ thừa)."""
+
+    def __init__(self, chunk_size=UPLOAD_CHUNK_BYTES, retries=UPLOAD_CHUNK_RETRIES):
+        self.chunk_size = _align_chunk(chunk_size)
+        self.retries = retries
+        self.chunk_retries = 0  # tổng số lần phải gửi lại chunk (thống kê)
+
+    def _begin(self, dest, content_type):
+        raise NotImplementedError
+
+    def _put_chunk(self, state, offset: int, data: bytes, final: bool) -> None:
+        raise NotImplementedError
+
+    def _url(self, dest) -> str:
+        raise NotImplementedError
+
+    def upload(self, source, dest, content_type="video/mp4", make_public=False) -> str:
+        stream, owned = _source_stream(source)
+        try:
+            state = self._begin(dest, content_type)
+            offset = 0
+            data = stream.read(self.chunk_size)
+            while True:
+                nxt = stream.read(self.chunk_size) if len(data) == self.chunk_size else b""
+                final = not nxt
+                for attempt in range(self.retries + 1):
+                    try:
+                        self._put_chunk(state, offset, data, final)
+                        break
+                    except Exception:
+                        if attempt == self.retries:
+                            raise
+                        self.chunk_retries += 1
+                        time.sleep(min(0.2 * 2 ** attempt, 5.0))
+                offset += len(data)
+                if final:
+                    break
+                data = nxt
+            return self._url(dest)
+        finally:
+            if owned:
+                stream.close()
+
+
+class LocalBackend(ChunkedBackend):
+    name = "local"
+
+    def __init__(self, root=STORAGE_LOCAL_DIR, base_url=STORAGE_PUBLIC_BASE_URL, **kw):
+        super().__init__(**kw)
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, dest) -> str:
+        path = os.path.abspath(os.path.join(self.root, dest))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Tên object không hợp lệ: {dest}")
+        return path
+
+    def _begin(self, dest, content_type):
+        path = self._path(dest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return {"path": path, "tmp": path + ".part"}
+
+    def _put_chunk(self, state, offset, data, final):
+        mode = "r+b" if offset and os.path.exists(state["tmp"]) else "wb"
+        with open(state["tmp"], mode) as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate(offset + len(data))
+        if final:
+            os.replace(state["tmp"], state["path"])
+
+    def exists(self, dest) -> bool:
+        return os.path.isfile(self._path(dest))
+
+    def _url(self, dest) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{quote(dest)}"
+        return "file://" + self._path(dest)
+
+
+class HTTPBackend(ChunkedBackend):
+    """PUT {base_url}/{dest} theo chunk, header Content-Range: bytes a-b/total (total='*' khi chưa biết)."""
+    name = "http"
+
+    def __init__(self, base_url=STORAGE_HTTP_URL, timeout=60, **kw):
+        super().__init__(**kw)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _begin(self, dest, content_type):
+        from utils.downloader import get_session
+        return {"session": get_session(), "url": f"{self.base_url}/{quote(dest)}", "content_type": content_type}
+
+    def _put_chunk(self, state, offset, data, final):
+        end = offset + len(data)
+        total = str(end) if final else "*"
+        rng = f"bytes {offset}-{end - 1}/{total}" if data else f"bytes */{total}"
+        r = state["session"].put(state["url"], data=data, timeout=self.timeout,
+                                 headers={"Content-Range": rng, "Content-Type": state["content_type"]})
+        if r.status_code not in (200, 201, 308):
+            raise IOError(f"Upload chunk {rng} lỗi HTTP {r.status_code}")
+
+    def exists(self, dest) -> bool:
+        from utils.downloader import get_session
+        r = get_session().head(f"{self.base_url}/{quote(dest)}", timeout=self.timeout)
+        if r.status_code == 404:
+            return False
+        r.raise_for_status()
+        return True
+
+    def _url(self, dest) -> str:
+        return f"{self.base_url}/{quote(dest)}"
+
+
+def get_gcs_client():
+    """storage.Client dùng chung cả process (auth + connection pool tạo 1 lần)."""
+    global _gcs_client
+    with _lock:
+        if _gcs_client is None:
+            from google.cloud import storage
+            _gcs_client = storage.Client()  # ADC (Cloud Run/Workload Identity) / hoặc SA JSON khi dev local
+        return _gcs_client
+
+
+class GCSBackend(StorageBackend):
+    name = "gcs"
+
+    def __init__(self, bucket_name=None, chunk_size=UPLOAD_CHUNK_BYTES):
+        self.bucket_name = bucket_name or os.getenv("GCP_BUCKET_NAME")
+        if not self.bucket_name:
+            raise RuntimeError("Thiếu biến môi trường GCP_BUCKET_NAME.")
+        self.chunk_size = _align_chunk(chunk_size)
+
+    def upload(self, source, dest, content_type="video/mp4", make_public=False) -> str:
+        from google.cloud.storage.retry import DEFAULT_RETRY
+
+        blob = get_gcs_client().bucket(self.bucket_name).blob(dest)
+        blob.chunk_size = self.chunk_size  # có chunk_size -> resumable upload, retry theo chunk
+        stream, owned = _source_stream(source)
+        try:
+            # size=None: đọc tới EOF (stream đang lớn dần vẫn được)
+            blob.upload_from_file(stream, content_type=content_type, retry=DEFAULT_RETRY)
+        finally:
+            if owned:
+                stream.close()
+
+        if make_public or os.getenv("MAKE_PUBLIC", "").lower() in {"1", "true", "yes"}:
+            try:
+                blob.make_public()
+            except Exception:
+                # Nếu bucket không cho phép public, vẫn trả về blob.public_url (có thể không truy cập được)
+                pass
+        # public_url sẽ là https://storage.googleapis.com/{bucket}/{object}
+        return blob.public_url
+
+    def exists(self, dest) -> bool:
+        return get_gcs_client().bucket(self.bucket_name).blob(dest).exists()
+
+
+def get_backend(name=None) -> StorageBackend:
+    name = name or STORAGE_BACKEND
+    with _lock:
+        backend = _backends.get(name)
+    if backend is None:
+        if name == "gcs":
+            backend = GCSBackend()
+        elif name == "local":
+            backend = LocalBackend()
+        elif name == "http":
+            backend = HTTPBackend()
+        else:
+            raise ValueError(f"STORAGE_BACKEND không hợp lệ: {name} (gcs | local | http)")
+        with _lock:
+            backend = _backends.setdefault(name, backend)
+    return backend
+
+
+def upload_file(local_path: str, dest: str, content_type="video/mp4", make_public=False, backend=None) -> str:
+    return get_backend(backend).upload(local_path, dest, content_type=content_type, make_public=make_public)
+
+
+class StreamingUpload:
+    """
+    Upload file trong lúc encoder còn ghi: attach(path) khi bắt đầu encode, finish() khi encoder xong.
+    Encoder phải ghi tuần tự (mp4 fragmented); nếu file cuối khác dữ liệu đã gửi thì upload lại cả file.
+    """
+
+    def __init__(self, dest: str, content_type="video/mp4", backend=None, make_public=False):
+        self.dest = dest
+        self.content_type = content_type
+        self.backend = get_backend(backend)
+        self.make_public = make_public
+        self.reader = None
+        self._thread = None
+        self._url = None
+        self._exc = None
+
+    def attach(self, path: str) -> None:
+        self.reader = GrowingFileReader(path)
+
+        def _run():
+            try:
+                self._url = self.backend.upload(self.reader, self.dest, content_type=self.content_type,
+                                                make_public=self.make_public)
+            except BaseException as e:  # báo lại cho finish()
+                self._exc = e
+
+        self._thread = threading.Thread(target=_run, name="stream-upload", daemon=True)
+        self._thread.start()
+
+    def finish(self) -> str:
+        """Gọi sau khi encoder ghi xong; chờ upload xong và trả về URL."""
+        if self.reader is None:
+            raise RuntimeError("StreamingUpload chưa attach file nào.")
+        self.reader.finish()
+        self._thread.join()
+        try:
+            if self._exc is None and self.reader.matches_file():
+                return self._url
+            reason = self._exc or "file bị ghi đè sau khi đã gửi"
+            print(f"⚠️ Upload stream không dùng được ({reason}) -> upload lại cả file")
+            return self.backend.upload(self.reader.path, self.dest, content_type=self.content_type,
+                                       make_public=self.make_public)
+        finally:
+            self.reader.close()
+
+    def abort(self, exc: BaseException) -> None:
+        if self.reader is not None:
+            self.reader.abort(exc)
+            self._thread.join()
+            self.reader.close()
+
@@ -0,0 +1,220 @@
+"""
+Transcript từng từ cho subtitle, chạy theo từng wav thoại ngay khi tải xong (song song)
+thay vì đợi output.wav đã mix nhạc nền rồi gửi 1 lần.
+
+- Transcriber: interface ASR -> list {start, end, content} tính từ đầu clip
+    * AlignTranscriber:  (mặc định) forced alignment transcript gốc vào wav, utils.align, không gọi mạng
+    * GeminiTranscriber: utils.get_srt (google-genai)
+    * StubTranscriber:   không gọi mạng, kết quả xác định (test/benchmark offline)
+- Cache kết quả theo sha256 nội dung wav + backend/phiên bản: voice-over lặp lại không transcribe lại
+- TranscriptionBatch: on_download(result) làm callback on_complete của download_many,
+  collect(wav_files, durations, gap) cộng offset = tổng durations trước đó + gap * i (giống mix_track)
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+
+TRANSCRIBE_BACKEND = os.getenv("TRANSCRIBE_BACKEND", "align")  # align | gemini | stub
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "transcript_cache")
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "1").lower() in {"1", "true", "yes"}
+
+_lock = threading.Lock()
+_executor = None
+_transcribers = {}
+
+
+class Transcriber:
+    name = "base"
+    version = "1"
+    uses_text = False  # kết quả phụ thuộc transcript gốc -> đưa text vào key cache
+
+    def transcribe(self, wav_path: str, text=None) -> list:
+        """wav 1 clip -> list {start, end, content} (giây, tính từ đầu clip). text: transcript gốc nếu có."""
+        raise NotImplementedError
+
+
+class GeminiTranscriber(Transcriber):
+    name = "gemini"
+
+    def __init__(self, api_key=None, model=None):
+        from utils import get_srt
+
+        if api_key is None:
+            import dotenv
+            dotenv.load_dotenv()
+            api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("❌ Missing GEMINI_API_KEY in environment variables")
+        self.api_key = api_key
+        self.model = model or get_srt.MODEL
+        self.version = self.model
+
+    def transcribe(self, wav_path, text=None):
+        from utils.convert_srt_file_to_json import parse_srt
+        from utils.get_srt import get_srt_text
+
+        return parse_srt(get_srt_text(wav_path, api_key=self.api_key, model=self.model))
+
+
+class StubTranscriber(Transcriber):
+    """
+    Rải các từ của text (không có thì "w1 w2 ...", ~2.5 từ/giây) lên thời lượng clip,
+    độ dài mỗi từ tỉ lệ số ký tự. latency: giây ngủ cho mỗi giây audio (giả lập độ trễ ASR).
+    """
+    name = "stub"
+    uses_text = True
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def transcribe(self, wav_path, text=None):
+        import time
+
+        from video_maker.audio_engine import wav_duration
+
+        duration = wav_duration(wav_path)
+        if self.latency:
+            time.sleep(self.latency * duration)
+        words = (text or "").split() or [f"w{i + 1}" for i in range(max(1, int(duration * 2.5)))]
+        weights = [len(w) + 1 for w in words]
+        scale = duration / float(sum(weights))
+        out, t = [], 0.0
+        for i, (w, k) in enumerate(zip(words, weights)):
+            end = t + k * scale
+            out.append({"index": i + 1, "start": round(t, 3), "end": round(end, 3), "content": w})
+            t = end
+        return out
+
+
+def get_transcriber(name=None) -> Transcriber:
+    name = name or TRANSCRIBE_BACKEND
+    with _lock:
+        t = _transcribers.get(name)
+    if t is None:
+        if name == "gemini":
+            t = GeminiTranscriber()
+        elif name == "stub":
+            t = StubTranscriber()
+        elif name == "align":
+            from utils.align import AlignTranscriber
+            t = AlignTranscriber()
+        else:
+            raise ValueError(f"TRANSCRIBE_BACKEND không hợp lệ: {name}")
+        with _lock:
+            t = _transcribers.setdefault(name, t)
+    return t
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Pool riêng (không dùng pool download): gọi ASR chờ mạng lâu, không được chặn việc tải file
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS, thread_name_prefix="transcribe")
+        return _executor
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(wav_path: str, transcriber: Transcriber, text=None) -> str:
+    h = hashlib.sha256()
+    h.update(_file_sha256(wav_path).encode())
+    h.update(f"|{transcriber.name}|{transcriber.version}|".encode())
+    if transcriber.uses_text:
+        h.update((text or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+def transcribe_cached(wav_path: str, transcriber=None, text=None, cache_dir=TRANSCRIPT_CACHE_DIR) -> list:
+    """transcriber.transcribe có cache trên đĩa theo nội dung wav."""
+    transcriber = transcriber or get_transcriber()
+    if not TRANSCRIPT_CACHE_ENABLED:
+        with metrics.span("transcribe", transcriber.name):
+            return transcriber.transcribe(wav_path, text=text)
+
+    path = os.path.join(cache_dir, cache_key(wav_path, transcriber, text) + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    with metrics.span("transcribe", transcriber.name):
+        words = transcriber.transcribe(wav_path, text=text)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(words, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return words
+
+
+def offset_words(per_clip, durations, gap=0.5) -> list:
+    """Ghép transcript từng clip vào trục thời gian của output.wav (clip i bắt đầu ở sum(d[:i]) + gap*i)."""
+    out, offset = [], 0.0
+    for words, d in zip(per_clip, durations):
+        for w in words:
+            out.append({"index": len(out) + 1,
+                        "start": round(w["start"] + offset, 3),
+                        "end": round(w["end"] + offset, 3),
+                        "content": w["content"]})
+        offset += d + gap
+    return out
+
+
+class TranscriptionBatch:
+    """Transcribe các wav thoại của 1 job song song, bắt đầu ngay khi từng file tải xong."""
+
+    _WAV = re.compile(r"(\d+)\.wav$")
+
+    def __init__(self, audio_dir: str, texts=None, transcriber=None, cache_dir=TRANSCRIPT_CACHE_DIR):
+        self.audio_dir = os.path.abspath(audio_dir)
+        self.texts = list(texts or [])
+        self.transcriber = transcriber or get_transcriber()
+        self.cache_dir = cache_dir
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _text_for(self, path: str):
+        m = self._WAV.search(os.path.basename(path))
+        i = int(m.group(1)) - 1 if m else -1
+        return self.texts[i] if 0 <= i < len(self.texts) else None
+
+    def submit(self, wav_path: str):
+        path = os.path.abspath(wav_path)
+        with self._lock:
+            fut = self._futures.get(path)
+            if fut is None:
+                fut = self._futures[path] = _get_executor().submit(
+                    transcribe_cached, path, self.transcriber, self._text_for(path), self.cache_dir)
+            return fut
+
+    def on_download(self, result: dict) -> None:
+        """Callback on_complete của download_many: chỉ nhận wav thoại nằm trong audio_dir."""
+        path = os.path.abspath(result["path"])
+        if os.path.dirname(path) == self.audio_dir and self._WAV.search(os.path.basename(path)):
+            self.submit(path)
+
+    def collect(self, wav_files, durations, gap=0.5) -> list:
+        """Chờ transcript mọi clip (file nào chưa submit thì submit luôn), trả về list đã cộng offset."""
+        futures = [self.submit(p) for p in wav_files]
+        return offset_words([f.result() for f in futures], durations, gap=gap)
+
+    def cancel(self) -> None:
+        with self._lock:
+            for f in self._futures.values():
+                f.cancel()
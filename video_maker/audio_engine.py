@@ -0,0 +1,172 @@
+"""
+Engine audio bằng NumPy cho make_video (thay cho chuỗi AudioSegment của pydub).
+- Mỗi wav thoại chỉ decode 1 lần; duration lấy luôn từ số mẫu đã decode (hoặc từ header wav)
+- Resample, gain, chèn im lặng, overlay nhạc nền, fade đều là phép vector hoá
+  ghi thẳng vào 1 buffer float32 cấp phát sẵn, cuối cùng mới ép về int16
+"""
+
+import os
+import wave
+
+import numpy as np
+from natsort import natsorted
+
+from utils import metrics
+
+TARGET_SR = 24000
+
+
+def list_wavs(audio_dir: str) -> list:
+    return natsorted([os.path.join(audio_dir, f) for f in os.listdir(audio_dir) if f.endswith('.wav')])
+
+
+def db_to_gain(db: float) -> float:
+    return float(10 ** (db / 20.0))
+
+
+def read_wav(path: str):
+    """
+    Decode wav -> (float32 mono trong [-1, 1], sample_rate).
+    PCM 8/16/24/32-bit đọc bằng module wave; định dạng khác (float, nén...) mới nhờ pydub.
+    """
+    try:
+        with wave.open(path, "rb") as w:
+            ch, sw, sr, n = w.getnchannels(), w.getsampwidth(), w.getframerate(), w.getnframes()
+            raw = w.readframes(n)
+    except (wave.Error, EOFError):
+        return _read_with_pydub(path)
+
+    if sw == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sw == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sw == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        x = (b[:, 0].astype(np.int32) | (b[:, 1].astype(np.int32) << 8) | (b[:, 2].astype(np.int32) << 16))
+        x = np.where(x >= 1 << 23, x - (1 << 24), x).astype(np.float32) / float(1 << 23)
+    elif sw == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        return _read_with_pydub(path)
+
+    if ch > 1:
+        x = x.reshape(-1, ch).mean(axis=1)
+    return x, sr
+
+
+def _read_with_pydub(path: str):
+    from pydub import AudioSegment
+    seg = AudioSegment.from_file(path).set_channels(1).set_sample_width(2)
+    return np.frombuffer(seg.raw_data, dtype=np.int16).astype(np.float32) / 32768.0, seg.frame_rate
+
+
+def wav_duration(path: str) -> float:
+    """Thời lượng (giây) chỉ từ header wav, không decode dữ liệu."""
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError):
+        x, sr = _read_with_pydub(path)
+        return len(x) / float(sr)
+
+
+def resample(x: np.ndarray, sr_from: int, sr_to: int) -> np.ndarray:
+    """Resample tuyến tính (tương đương audioop.ratecv mà pydub dùng)."""
+    if sr_from == sr_to or len(x) == 0:
+        return x
+    n_out = int(round(len(x) * sr_to / float(sr_from)))
+    t = np.arange(n_out, dtype=np.float64) * (sr_from / float(sr_to))
+    return np.interp(t, np.arange(len(x)), x).astype(np.float32)
+
+
+def apply_fade(buf: np.ndarray, fade_in_s: float, fade_out_s: float, sr: int, start=0, end=None) -> None:
+    """Fade tuyến tính tại chỗ trên đoạn buf[start:end]."""
+    end = len(buf) if end is None else end
+    n = end - start
+    fi = min(int(fade_in_s * sr), n)
+    fo = min(int(fade_out_s * sr), n)
+    if fi > 0:
+        buf[start:start + fi] *= np.linspace(0.0, 1.0, fi, endpoint=False, dtype=np.float32)
+    if fo > 0:
+        buf[end - fo:end] *= np.linspace(1.0, 0.0, fo, endpoint=False, dtype=np.float32)
+
+
+def load_clips(wav_files, sr=TARGET_SR):
+    """Decode mỗi clip đúng 1 lần -> (list mảng float32 đã resample về sr, durations theo giây)."""
+    clips, durations = [], []
+    for f in wav_files:
+        x, src_sr = read_wav(f)
+        durations.append(len(x) / float(src_sr))
+        clips.append(resample(x, src_sr, sr))
+    return clips, durations
+
+
+def mix_track(clips, silence=0.5, bg=None, sr=TARGET_SR,
+              voice_gain_db=-1.0, bg_gain_db=-15.0,
+              bg_fade=(0.4, 0.6), master_fade=(0.05, 0.12)) -> np.ndarray:
+    """
+    Ghép các clip thoại (float32, cùng sr) cách nhau `silence` giây, overlay nhạc nền,
+    fade biên. Trả về int16 mono.
+    bg: mảng int16/float32 cùng sr (vd. bg_music.build_loop), tự lặp nếu ngắn hơn track.
+    """
+    gap = int(round(silence * sr))
+    total = sum(len(c) for c in clips) + gap * max(len(clips) - 1, 0)
+    total = max(total, 1)
+    out = np.zeros(total, dtype=np.float32)
+
+    # Thoại: ghi thẳng vào buffer, im lặng chính là phần zeros còn lại
+    voice_gain = np.float32(db_to_gain(voice_gain_db))
+    pos = 0
+    for c in clips:
+        np.multiply(c, voice_gain, out=out[pos:pos + len(c)])
+        pos += len(c) + gap
+
+    # Nhạc nền (nhỏ) + fade riêng rồi cộng vào
+    if bg is not None and len(bg) > 0:
+        bg = np.asarray(bg)
+        scale = db_to_gain(bg_gain_db) / (32768.0 if bg.dtype == np.int16 else 1.0)
+        if len(bg) < total:
+            bg = np.tile(bg, -(-total // len(bg)))
+        bg_full = bg[:total].astype(np.float32) * np.float32(scale)
+        apply_fade(bg_full, bg_fade[0], bg_fade[1], sr)
+        out += bg_full
+
+    apply_fade(out, master_fade[0], master_fade[1], sr)
+    np.clip(out * 32768.0, -32768, 32767, out=out)
+    return out.astype(np.int16)
+
+
+def write_wav(path: str, pcm: np.ndarray, sr=TARGET_SR) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(np.ascontiguousarray(pcm, dtype="<i2").tobytes())
+    return path
+
+
+def render_voice_track(audio_dir: str, output_wav: str, bg_track=None, silence=0.5,
+                       sr=TARGET_SR, bg_crossfade_ms=200) -> list:
+    """
+    Pipeline audio của make_video: decode thoại 1 lần, dựng nhạc nền từ cache, mix, ghi output_wav.
+    Trả về durations (giây) của từng clip thoại.
+    """
+    wav_files = list_wavs(audio_dir)
+    if not wav_files:
+        raise RuntimeError("Không tìm thấy WAV nào trong thư mục audio.")
+
+    with metrics.span("video", "decode"):
+        clips, durations = load_clips(wav_files, sr=sr)
+
+    bg = None
+    if bg_track:
+        from video_maker import bg_music
+        # 0.5s im lặng sau mỗi đoạn (giống cách dựng timeline)
+        bg_seconds = sum(durations) + len(durations) * silence
+        with metrics.span("video", "bg_music"):
+            bg = bg_music.build_loop(bg_track, bg_seconds, crossfade_ms=bg_crossfade_ms, sr=sr)
+
+    with metrics.span("video", "mix"):
+        write_wav(output_wav, mix_track(clips, silence=silence, bg=bg, sr=sr), sr=sr)
+    return durations
@@ -0,0 +1,143 @@
+"""
+Cache nhạc nền: mỗi track trong base_audio/ chỉ decode + chuẩn hoá (24 kHz, mono, 16-bit) một lần,
+lưu ra file PCM thô rồi memory-map; mỗi request chỉ còn ghép loop bằng slicing numpy.
+
+- list_tracks(): các track đăng ký trong base_audio/ (tên = tên file không đuôi)
+- preload_tracks(): chuẩn hoá toàn bộ lúc khởi động server
+- build_loop(name, seconds): nhạc nền đủ dài, nối vòng có crossfade, O(độ dài đích)
+"""
+
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+BASE_AUDIO_DIR = "base_audio"
+BG_CACHE_DIR = os.getenv("BG_CACHE_DIR") or os.path.join(BASE_AUDIO_DIR, ".cache")
+DEFAULT_TRACK = "background"
+TARGET_SR = 24000
+AUDIO_EXTS = (".wav", ".mp3", ".m4a", ".ogg", ".flac")
+
+_lock = threading.Lock()
+_tracks = {}       # name -> np.memmap int16
+_loop_units = {}   # (name, crossfade_ms) -> np.ndarray int16
+
+
+def list_tracks(base_dir=BASE_AUDIO_DIR) -> dict:
+    """{tên track: đường dẫn file gốc}"""
+    if not os.path.isdir(base_dir):
+        return {}
+    return {
+        os.path.splitext(f)[0]: os.path.join(base_dir, f)
+        for f in sorted(os.listdir(base_dir))
+        if f.lower().endswith(AUDIO_EXTS)
+    }
+
+
+def _decode_to_pcm(path: str, sr=TARGET_SR) -> np.ndarray:
+    """Decode 1 lần bằng pydub, chuẩn hoá về int16 mono sr."""
+    from pydub import AudioSegment
+    seg = AudioSegment.from_file(path).set_frame_rate(sr).set_channels(1).set_sample_width(2)
+    return np.frombuffer(seg.raw_data, dtype=np.int16)
+
+
+def get_track(name=DEFAULT_TRACK, sr=TARGET_SR) -> np.ndarray:
+    """PCM int16 của track (memory-mapped, read-only). Lần đầu sẽ decode và ghi cache."""
+    with _lock:
+        pcm = _tracks.get(name)
+        if pcm is not None:
+            return pcm
+
+        tracks = list_tracks()
+        if name not in tracks:
+            raise FileNotFoundError(f"Không tìm thấy nhạc nền '{name}' trong {BASE_AUDIO_DIR}/ "
+                                    f"(có: {', '.join(tracks) or 'không có'})")
+        src = tracks[name]
+        st = os.stat(src)
+        # tên file cache gắn với mtime/size của file gốc -> thay file gốc là tự build lại
+        cache_path = os.path.join(BG_CACHE_DIR, f"{name}_{sr}_{st.st_mtime_ns}_{st.st_size}.pcm")
+        if not os.path.exists(cache_path):
+            os.makedirs(BG_CACHE_DIR, exist_ok=True)
+            data = _decode_to_pcm(src, sr=sr)
+            fd, tmp = tempfile.mkstemp(dir=BG_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data.tobytes())
+            os.replace(tmp, cache_path)
+
+        pcm = np.memmap(cache_path, dtype=np.int16, mode="r")
+        _tracks[name] = pcm
+        return pcm
+
+
+def preload_tracks() -> list:
+    """Chuẩn hoá + map toàn bộ track trong base_audio/ (gọi lúc startup)."""
+    names = list(list_tracks())
+    for name in names:
+        get_track(name)
+    return names
+
+
+def _ramp(n: int, up: bool) -> np.ndarray:
+    r = np.linspace(0.0, 1.0, n, endpoint=False, dtype=np.float32) if n > 0 else np.zeros(0, np.float32)
+    return r if up else r[::-1]
+
+
+def _loop_unit(name: str, crossfade_ms: int, sr=TARGET_SR) -> np.ndarray:
+    """
+    1 chu kỳ loop (độ dài L - crossfade): [đuôi bài * fade-out + đầu bài * fade-in] + thân bài.
+    Ghép nối tiếp các chu kỳ này cho kết quả giống append(..., crossfade) lặp lại của pydub.
+    """
+    key = (name, crossfade_ms)
+    with _lock:
+        unit = _loop_units.get(key)
+    if unit is not None:
+        return unit
+
+    pcm = get_track(name, sr=sr)
+    cf = min(int(crossfade_ms * sr / 1000), len(pcm) // 2)
+    if cf <= 0:
+        unit = np.asarray(pcm)
+    else:
+        tail = pcm[-cf:].astype(np.float32) * _ramp(cf, up=False)
+        head = pcm[:cf].astype(np.float32) * _ramp(cf, up=True)
+        xfade = np.clip(np.rint(tail + head), -32768, 32767).astype(np.int16)
+        unit = np.concatenate([xfade, pcm[cf:len(pcm) - cf]])
+
+    with _lock:
+        _loop_units[key] = unit
+    return unit
+
+
+def build_loop(name=DEFAULT_TRACK, target_seconds=0.0, crossfade_ms=200,
+               fade_in_ms=200, fade_out_ms=300, sr=TARGET_SR) -> np.ndarray:
+    """
+    Nhạc nền dài đúng target_seconds (int16, mono, sr).
+    Nếu bài gốc đủ dài thì chỉ cắt; nếu không thì loop có crossfade + fade nhẹ đầu/cuối.
+    """
+    target_ms = int(round(target_seconds * 1000))
+    if target_ms <= 0:
+        raise ValueError("target_seconds phải > 0")
+    n = target_ms * sr // 1000
+
+    pcm = get_track(name, sr=sr)
+    if len(pcm) >= n:
+        return np.array(pcm[:n])
+
+    unit = _loop_unit(name, crossfade_ms, sr=sr)
+    cf = len(pcm) - len(unit) if crossfade_ms > 0 else 0
+    first = pcm[:len(pcm) - cf]
+    reps = -(-(n - len(first)) // len(unit))
+    out = np.empty(len(first) + reps * len(unit), dtype=np.int16)
+    out[:len(first)] = first
+    out[len(first):] = np.tile(unit, reps)
+    out = out[:n].astype(np.float32)
+
+    # Fade nhẹ đầu/cuối để tránh click
+    fi = min(fade_in_ms * sr // 1000, n)
+    fo = min(fade_out_ms * sr // 1000, n)
+    out[:fi] *= _ramp(fi, up=True)
+    if fo:
+        out[n - fo:] *= _ramp(fo, up=False)
+    return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
@@ -0,0 +1,63 @@
+"""
+CompositeVideoClip có chỉ mục thời gian cho backend MoviePy.
+
+CompositeVideoClip gốc gọi is_playing() trên mọi clip ở mỗi frame (và mask composite cũng vậy)
+-> O(tổng số clip)/frame dù cùng lúc chỉ 2-4 lớp hiện. IndexedCompositeVideoClip dựng sẵn lịch:
+các mốc start/end đã sắp xếp + tập clip hoạt động của từng khoảng giữa 2 mốc (giữ thứ tự layer),
+mỗi frame chỉ bisect tìm khoảng rồi hỏi is_playing() trên đúng các clip đó: O(log n + số lớp đang hiện).
+
+Vẫn gọi is_playing() của từng ứng viên nên clip tự định nghĩa is_playing (vd. SubtitleTrack) giữ nguyên
+hành vi; kết quả frame giống hệt CompositeVideoClip.
+"""
+
+import bisect
+
+import numpy as np
+from moviepy import CompositeVideoClip
+
+
+class ActiveSchedule:
+    """Mốc thời gian + tập clip (index trong danh sách, theo thứ tự layer) hoạt động trong từng khoảng."""
+
+    def __init__(self, clips):
+        self.clips = list(clips)
+        points = set()
+        for c in self.clips:
+            points.add(c.start)
+            if c.end is not None:
+                points.add(c.end)
+        self.points = sorted(points)
+
+        # Quét 1 lượt: tập đang hoạt động tại [points[k], points[k+1])
+        starts, ends = {}, {}
+        for i, c in enumerate(self.clips):
+            starts.setdefault(c.start, []).append(i)
+            if c.end is not None:
+                ends.setdefault(c.end, []).append(i)
+        active, sets = set(), []
+        for p in self.points:
+            active.difference_update(ends.get(p, ()))
+            active.update(i for i in starts.get(p, ()) if self.clips[i].end is None or self.clips[i].end > p)
+            sets.append(tuple(sorted(active)))
+        self.sets = sets
+
+    def candidates(self, t) -> tuple:
+        k = bisect.bisect_right(self.points, t) - 1
+        return self.sets[k] if k >= 0 else ()
+
+    def playing(self, t) -> list:
+        return [self.clips[i] for i in self.candidates(t) if self.clips[i].is_playing(t)]
+
+
+class IndexedCompositeVideoClip(CompositeVideoClip):
+    def __init__(self, clips, size=None, bg_color=None, use_bgclip=False, is_mask=False):
+        super().__init__(clips, size=size, bg_color=bg_color, use_bgclip=use_bgclip, is_mask=is_mask)
+        self.schedule = ActiveSchedule(self.clips)
+        # mask composite (dựng trong __init__ gốc) cũng dùng chỉ mục
+        if isinstance(self.mask, CompositeVideoClip) and not isinstance(self.mask, IndexedCompositeVideoClip):
+            self.mask = IndexedCompositeVideoClip(self.mask.clips, self.mask.size, is_mask=True, bg_color=0.0)
+
+    def playing_clips(self, t=0):
+        if isinstance(t, np.ndarray):
+            return super().playing_clips(t)
+        return self.schedule.playing(t)
@@ -1,12 +1,36 @@
 import os
+import re
+import tempfile
+import time
 from natsort import natsorted
-from moviepy import AudioFileClip, TextClip, ImageClip, CompositeVideoClip, vfx
-from utils.get_srt import get_srt_from_wav_file
-from utils.convert_srt_file_to_json import convert_srt_to_json
-from pydub import AudioSegment
-import requests
+from utils.downloader import download_many
+from utils import metrics, transcribe
+from video_maker import (bg_music, audio_engine, encode_profiles, ffmpeg_backend, image_prep,
+                         segment_render, timeline)
+from video_maker.jobs import JobProgressLogger, stage
 import shutil
 
+# Thư mục gốc chứa workspace riêng của từng job (mỗi request một thư mục tạm)
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT") or os.path.join(tempfile.gettempdir(), "video_jobs")
+
+def create_workspace(job_id=None, root=None):
+    """
+    Tạo thư mục làm việc riêng cho một job: <root>/<job_id>_xxxx/{script,audio,image}.
+    Các job chạy song song không còn đè/xoá file của nhau.
+    """
+    root = root or WORKSPACE_ROOT
+    os.makedirs(root, exist_ok=True)
+    prefix = re.sub(r"[^a-zA-Z0-9_\-]", "_", job_id or "job")[:40] + "_"
+    return tempfile.mkdtemp(prefix=prefix, dir=root)
+
+def workspace_dirs(workspace):
+    """Trả về (script_dir, audio_dir, image_dir) bên trong workspace."""
+    return (
+        os.path.join(workspace, "script"),
+        os.path.join(workspace, "audio"),
+        os.path.join(workspace, "image"),
+    )
+
 # Lưu transcripts
 def save_transcripts_to_folder(transcripts: list[str], output_folder='./script'):
     os.makedirs(output_folder, exist_ok=True)
@@ -18,109 +42,50 @@ def save_transcripts_to_folder(transcripts: list[str], output_folder='./script')
 # Download wav files from URLs
 def download_wavs_from_urls(wav_urls, audio_dir='./audio'):
     os.makedirs(audio_dir, exist_ok=True)
-    for i, url in enumerate(wav_urls):
-        file_name = os.path.join(audio_dir, f"{i+1}.wav")
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        with open(file_name, 'wb') as f:
-            f.write(r.content)
+    items = [(url, os.path.join(audio_dir, f"{i+1}.wav")) for i, url in enumerate(wav_urls)]
+    return download_many(items)
 
 # Download images from URLs
 def download_images_from_urls(image_urls, image_dir='./image'):
     os.makedirs(image_dir, exist_ok=True)
-    for i, url in enumerate(image_urls):
-        file_name = os.path.join(image_dir, f"{i+1}.png")
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        with open(file_name, 'wb') as f:
-            f.write(r.content)
-
-def make_subcript_thumbnail(name_date=None, font="font/Roboto-SemiBold.ttf", start=None, duration=None, color=None):
-    tmp_lst = name_date.split("-")
-    # "Nên - Không nên" text
-    first_text = "Nên - Không nên"
-    second_text = tmp_lst[0]
-    out_third = None
-    first_txt = TextClip(
-        text=first_text,
-        font=font,
-        font_size=75,
-        color=color,
-        text_align='center',
-        method='label',
-        vertical_align='bottom',
-        horizontal_align='center',
-        margin=(0,0,0,50),
-        stroke_color='white',
-        stroke_width=5
-    )
-    
-    out_first = first_txt.with_start(start).with_duration(duration) \
-                        .with_effects([vfx.CrossFadeIn(0.1), vfx.CrossFadeOut(0.1)]) \
-                        .with_position(("center", 50))
-                        
-    # subtitle về mệnh ngày   
-    out_second = []
-    for i, s in enumerate(second_text.split(" ")):     
-        second_txt = TextClip(
-            text=s,
-            font=font,
-            font_size=150,
-            color=color,
-            text_align='center',
-            method='label',
-            vertical_align='bottom',
-            horizontal_align='center',
-            margin=(0,0,0,50),
-            stroke_color='white',
-            stroke_width=5
-        )
-        
-        out_second.append(second_txt.with_start(start).with_duration(duration) \
-                            .with_effects([vfx.CrossFadeIn(0.1), vfx.CrossFadeOut(0.1)]) \
-                            .with_position(("center", 200 + i * 200)))
-                            
-    if len(tmp_lst) == 2:
-        third_txt = TextClip(
-            text=tmp_lst[-1],
-            font=font,
-            font_size=70,
-            color=color,
-            text_align='center',
-            method='label',
-            vertical_align='bottom',
-            horizontal_align='center',
-            margin=(0,0,0,50),
-            stroke_color='white',
-            stroke_width=5
-        )
-        
-        out_third = third_txt.with_start(start).with_duration(duration) \
-                            .with_effects([vfx.CrossFadeIn(0.1), vfx.CrossFadeOut(0.1)]) \
-                            .with_position(("center", 850))
-    
-    return out_first, out_second, out_third                     
-
+    items = [(url, os.path.join(image_dir, f"{i+1}.png")) for i, url in enumerate(image_urls)]
+    return download_many(items)
 
-# Lấy .srt từ file wav và trả về đầu ra cho giai đoạn tạo scripts
-def generate_transcripts(file_path="audio/output.wav"):
-    import dotenv
-    dotenv.load_dotenv()
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("❌ Missing GEMINI_API_KEY in environment variables")
-    get_srt_from_wav_file(api_key=api_key,file_path=file_path)
-    json_data = convert_srt_to_json("audio/output.srt")
-    return json_data
+# Tải wav + ảnh trong cùng 1 đợt song song -> thời gian ~ file chậm nhất thay vì tổng
+# on_complete(result): gọi ngay khi từng file xong (vd. TranscriptionBatch.on_download)
+def download_assets(wav_urls, image_urls, audio_dir='./audio', image_dir='./image', on_complete=None):
+    os.makedirs(audio_dir, exist_ok=True)
+    os.makedirs(image_dir, exist_ok=True)
+    items = [(url, os.path.join(audio_dir, f"{i+1}.wav")) for i, url in enumerate(wav_urls)]
+    items += [(url, os.path.join(image_dir, f"{i+1}.png")) for i, url in enumerate(image_urls)]
+    results = download_many(items, on_complete=on_complete)
+    for r in results:
+        tag = "cache" if r.get("cached") else "net"
+        print(f"   {r['seconds']:.2f}s  {r['bytes'] / 1024:.0f} KB  [{tag}] {r['url']}")
+    return results
+
+# Transcript từng từ cho subtitle: transcribe từng wav thoại (song song, có cache) rồi cộng offset
+def generate_transcripts(wav_files, durations, gap=0.5, transcription=None, texts=None):
+    if transcription is None:
+        transcription = transcribe.TranscriptionBatch(os.path.dirname(wav_files[0]), texts=texts)
+    return transcription.collect(wav_files, durations, gap=gap)
 
 # Tạo video
-def make_video(script_dir='./script', audio_dir='./audio', image_dir='./image', fps=30, show_script=False, font="font/Roboto-SemiBold.ttf",color=None, name_day=None):
+def make_video(script_dir='./script', audio_dir='./audio', image_dir='./image', fps=30, show_script=False, font="font/Roboto-SemiBold.ttf",color=None, name_day=None, bg_track=bg_music.DEFAULT_TRACK, job=None, backend="moviepy", encode_profile=None, crf=None, on_encode_start=None, transcription=None):
     """
     Tạo video từ ảnh + audio + transcript.
+    backend: "moviepy" (composite từng frame trong Python), "segmented" (MoviePy song song theo đoạn slide
+    trên process pool, nối lossless) hoặc "ffmpeg" (1 lệnh ffmpeg filter graph).
+    encode_profile: draft | standard | archival (video_maker.encode_profiles); crf: ép CRF thay cho bitrate.
+    on_encode_start(path): gọi ngay trước khi encode (vd. utils.storage.StreamingUpload.attach);
+    khi có callback thì xuất mp4 fragmented để upload được trong lúc đang ghi.
+    transcription: utils.transcribe.TranscriptionBatch đã bắt đầu từ lúc tải (không có thì tạo mới khi cần).
+    Mọi file trung gian (output.wav, mp4) nằm trong workspace của job.
+    Trả về đường dẫn file mp4. Nếu có job (video_maker.jobs.Job) thì cập nhật stage/tiến độ encode.
     Các vá quan trọng:
-    - merge_audio dùng pydub (chuẩn hoá format + overlay bg mượt)
-    - get_durations bằng pydub
-    - Ép ảnh về kích thước cố định trước khi zoom
+    - audio_engine: decode thoại 1 lần, mix bằng numpy (chuẩn hoá format + overlay bg mượt)
+    - durations lấy từ chính dữ liệu đã decode
+    - image_prep: ép ảnh về VIDEO_SIZE 1 lần (có cache) trước khi composite
     - Fade audio tổng (không dùng AudioFade trên clip video)
     """
     output_video = os.path.join(audio_dir, 'my_video.mp4')
@@ -129,189 +94,72 @@ def make_video(script_dir='./script', audio_dir='./audio', image_dir='./image',
     # Kích thước khung video thống nhất để tránh resample nặng
     VIDEO_SIZE = (1080, 1920)  # đổi thành (1920,1080) nếu muốn landscape
 
-    # ----- A) MERGE AUDIO bằng pydub (ổn định) -----
-    def merge_audio(audio_dir=audio_dir, silence=0.5, ouput_wav=output_wav, bg_wav_path="bg.wav"):
-        """
-        Gộp các wav thoại, chèn im lặng 0.5s, overlay nhạc nền nếu có, fade biên.
-        Tất cả chuẩn hoá về 16-bit, mono, 24000 Hz (đổi nếu cần).
-        """
-        TARGET_SR = 24000
-        TARGET_CH = 1
-        TARGET_SW = 2   # 16-bit
-
-        wav_files = natsorted([os.path.join(audio_dir, f) for f in os.listdir(audio_dir) if f.endswith('.wav')])
-        if not wav_files:
-            raise RuntimeError("Không tìm thấy WAV nào trong thư mục audio.")
-
-        def _norm(seg: AudioSegment) -> AudioSegment:
-            seg = seg.set_frame_rate(TARGET_SR).set_channels(TARGET_CH).set_sample_width(TARGET_SW)
-            return seg.apply_gain(-1.0)  # headroom nhỏ
-
-        parts = []
-        for i, f in enumerate(wav_files):
-            seg = AudioSegment.from_file(f)
-            seg = _norm(seg)
-            parts.append(seg)
-            if i < len(wav_files) - 1:
-                parts.append(AudioSegment.silent(duration=int(silence * 1000)))
-
-        main = sum(parts) if parts else AudioSegment.silent(duration=1)
-
-        # overlay nhạc nền nếu có
-        if os.path.exists(bg_wav_path):
-            try:
-                bg = AudioSegment.from_file(bg_wav_path)
-                bg = _norm(bg).apply_gain(-14.0)  # nền nhỏ
-                loops = (len(main) // len(bg)) + 1
-                bg_full = (bg * loops)[:len(main)]
-                bg_full = bg_full.fade_in(400).fade_out(600)
-                mixed = main.overlay(bg_full)
-            except Exception:
-                mixed = main
-        else:
-            mixed = main
-
-        mixed = mixed.fade_in(50).fade_out(120)
-        os.makedirs(os.path.dirname(ouput_wav), exist_ok=True)
-        mixed.export(ouput_wav, format="wav")
-    
-    # ----- B) Durations của từng đoạn bằng pydub -----
-    def get_durations(audio_dir):
-        durations = []
-        wav_files = natsorted([os.path.join(audio_dir, f) for f in os.listdir(audio_dir) if f.endswith('.wav')])
-        for f in wav_files:
-            seg = AudioSegment.from_file(f)
-            durations.append(len(seg) / 1000.0)
-        return durations
-
-    def build_bg_to_length(bg_wav_path: str, target_seconds: float, out_path: str,
-                        crossfade_ms: int = 200,
-                        target_sr: int = 24000, target_ch: int = 1, target_sw: int = 2):
-        """
-        Tạo nhạc nền dài đúng target_seconds bằng cách LOOP nhạc gốc với crossfade.
-        - crossfade_ms: 0..500ms thường là ổn (tuỳ beat).
-        - target_sr/ch/sw: chuẩn hoá format để khớp với audio thoại (tránh giật).
-        """
-        if not os.path.exists(bg_wav_path):
-            raise FileNotFoundError(f"Không tìm thấy file nhạc nền: {bg_wav_path}")
+    # ----- A+B) Audio bằng audio_engine (numpy) -----
+    # Decode mỗi wav thoại 1 lần -> durations + mix (thoại, im lặng 0.5s, nhạc nền loop, fade)
+    wav_files = audio_engine.list_wavs(audio_dir)  # lấy trước khi output.wav được ghi vào audio_dir
+    with stage(job, "audio"):
+        durations = audio_engine.render_voice_track(audio_dir, output_wav, bg_track=bg_track, silence=0.5)
 
-        bg = AudioSegment.from_file(bg_wav_path)
-        # chuẩn hoá format
-        bg = bg.set_frame_rate(target_sr).set_channels(target_ch).set_sample_width(target_sw)
-
-        target_ms = int(round(target_seconds * 1000))
-        if target_ms <= 0:
-            raise ValueError("target_seconds phải > 0")
-
-        # Nếu nhạc gốc đã đủ dài -> chỉ cần cắt
-        if len(bg) >= target_ms:
-            out = bg[:target_ms]
-            out.export(out_path, format="wav")
-            return out_path
-
-        # Loop cho đủ độ dài, nối với crossfade để mượt
-        parts = []
-        current = AudioSegment.silent(duration=0, frame_rate=bg.frame_rate)
-        while len(current) < target_ms:
-            if len(current) == 0 or crossfade_ms <= 0:
-                current += bg
-            else:
-                current = current.append(bg, crossfade=crossfade_ms)
-
-        out = current[:target_ms]
-        # Fade nhẹ đầu/cuối để tránh click
-        out = out.fade_in(200).fade_out(300)
-        out.export(out_path, format="wav")
-        return out_path
-    
-    # Tính tổng thời lượng để khớp nhạc nền
-    durations = get_durations(audio_dir)
-    sum_durations = sum(durations) + len(durations) * 0.5  # 0.5s im lặng giữa các đoạn
-
-    # TẠO bg.wav đủ dài bằng cách loop, thay cho cut_wav_from_start(...)
-    build_bg_to_length("base_audio/background.wav", sum_durations, "bg.wav", crossfade_ms=200)
-
-    # Merge lời + nhạc nền -> output_wav
-    merge_audio()
-
-    # Audio cuối cùng + fade
-    audio_clip = AudioFileClip(output_wav)
-    # audio_clip = audio_clip.audio_fadein(0.5).audio_fadeout(0.8)
-
-    # ----- E) Load ảnh -----
-    img_clip = []
-    for i in natsorted(os.listdir(image_dir)):
-        if i.endswith('.png'):
-            # ép size để tránh resample nặng từng frame
-            img = ImageClip(os.path.join(image_dir, i))
-            img_clip.append(img)
-
-    # ----- F) Dựng timeline -----
-    final_clips = []
-    tmp = 0.0
-    for i in range(len(img_clip)):
-        dur = durations[i] + 0.5  # khớp khoảng silence giữa các đoạn
-        # Zoom ảnh 
-        base = img_clip[i].with_start(tmp).with_duration(dur) \
-                          .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(0.5)]) \
-                        #   .with_position(("center", "center")) \
-                                                      #   .resized(lambda t: 1 + 0.005 * t) \
-                          
-        final_clips.append(base)
-        tmp += dur
-
-    # ----- D) Load transcript clips -----
+    # ----- D) Transcript (word-level) cho subtitle -----
+    # Từng clip được transcribe từ lúc tải xong -> ở đây thường chỉ còn chờ clip cuối
+    texts = []
     if show_script:
-        scripts_json = generate_transcripts(file_path="audio/output.wav")
-        
-        # Tạo subcript cho thumbnail
-        first_text_clip, second_text_clip, third_text_clip = make_subcript_thumbnail(name_date=name_day, color=color,start=0, duration=10)
-        print(scripts_json[0]['start'])
-        final_clips.append(first_text_clip)
-        for clip in second_text_clip:
-            final_clips.append(clip)
-        if third_text_clip:
-            final_clips.append(third_text_clip)
-        
-        for script in scripts_json:
-            content = script['content']
-            start = script['start']
-            end = script['end']
-            duration = end - start
+        with stage(job, "transcribe"):
+            scripts_json = generate_transcripts(wav_files, durations, gap=0.5, transcription=transcription,
+                                                texts=_read_scripts(script_dir))
+        # Chữ thumbnail + subtitle từng từ
+        texts = timeline.thumbnail_texts(name_day, color, start=0, duration=10, font=font) \
+            + timeline.subtitle_texts(scripts_json, color, font=font)
+
+    # ----- E) Chuẩn hoá ảnh: sniff định dạng, decode giảm độ phân giải, fit 1 lần về VIDEO_SIZE (có cache) -----
+    with stage(job, "images"):
+        image_paths = image_prep.prepare_images(image_prep.list_images(image_dir), size=VIDEO_SIZE,
+                                                out_dir=os.path.join(image_dir, "frames"))
+        if not image_paths:
+            raise RuntimeError("Không tìm thấy ảnh nào trong thư mục image.")
 
-            txt = TextClip(
-                text=content,
-                font=font,
-                font_size=100,
-                color=color,
-                text_align='center',
-                method='label',
-                vertical_align='bottom',
-                horizontal_align='center',
-                margin=(0,0,0,50),
-                stroke_color='white',
-                stroke_width=5
+    # ----- F) Dựng timeline -----
+    with stage(job, "timeline"):
+        tl = timeline.build_timeline(image_paths, durations, texts=texts, gap=0.5, size=VIDEO_SIZE)
+
+    # ----- G) Ghi file theo profile encode (thread tự tính theo CPU quota / số job đang encode) -----
+    with stage(job, "encode"), encode_profiles.encode_slot() as active_jobs:
+        encode = encode_profiles.resolve(encode_profile, crf=crf, active_jobs=active_jobs,
+                                         streamable=on_encode_start is not None)
+        print(f"🎞️ Encode profile={encode_profile or encode_profiles.DEFAULT_PROFILE} "
+              f"preset={encode['preset']} threads={encode['threads']} {' '.join(encode['ffmpeg_params'])}")
+        if on_encode_start is not None:
+            on_encode_start(output_video)
+        t_encode = time.perf_counter()
+        if backend == "ffmpeg":
+            ffmpeg_backend.render_timeline(tl, output_wav, output_video, fps=fps,
+                                           work_dir=os.path.join(audio_dir, "ffmpeg"), job=job, **encode)
+        elif backend == "segmented":
+            segment_render.render_segmented(tl, output_wav, output_video, fps=fps,
+                                            work_dir=os.path.join(audio_dir, "segments"), job=job, **encode)
+        else:
+            final_video = timeline.to_moviepy(tl, audio_path=output_wav)
+            final_video.write_videofile(
+                output_video,
+                fps=fps,                    # 24 hoặc 30
+                temp_audiofile_path=audio_dir,  # file audio tạm của moviepy cũng nằm trong workspace
+                logger=JobProgressLogger(job) if job is not None else "bar",
+                **encode,
             )
-            
-            out_scr = txt.with_start(start).with_duration(duration) \
-                                .with_effects([vfx.CrossFadeIn(0.001), vfx.CrossFadeOut(0.001)]) \
-                                .with_position(("center", 950))
-
-            final_clips.append(out_scr)
-
-    final_video = CompositeVideoClip(final_clips).with_audio(audio_clip)
-
-    # ----- G) Ghi file với tham số encode ổn định -----
-    final_video.write_videofile(
-        output_video,
-        fps=fps,                    # 24 hoặc 30
-        codec="libx264",
-        audio_codec="aac",
-        preset="slow",            # "slow" mượt hơn nhưng lâu hơn
-        bitrate="5000k",
-        threads=4
-    )
+        metrics.record_encode(job, int(tl["duration"] * fps), time.perf_counter() - t_encode)
+    return output_video
         
+def _read_scripts(script_dir):
+    """Transcript gốc 1.txt..N.txt (dùng cho backend transcribe cần text)."""
+    if not os.path.isdir(script_dir):
+        return []
+    files = natsorted(f for f in os.listdir(script_dir) if f.endswith(".txt"))
+    out = []
+    for f in files:
+        with open(os.path.join(script_dir, f), "r", encoding="utf-8") as fh:
+            out.append(fh.read())
+    return out
+
 def delete_resource(script_dir='./script', audio_dir='./audio', image_dir='./image'):
     if os.path.exists(script_dir) and os.path.isdir(script_dir):
         shutil.rmtree(script_dir)
@@ -320,12 +168,35 @@ def delete_resource(script_dir='./script', audio_dir='./audio', image_dir='./ima
     if os.path.exists(image_dir) and os.path.isdir(image_dir):
         shutil.rmtree(image_dir)
 
-def merge_video(transcripts, wav_urls, image_urls, color, name_day, fps=30, show_script=False):
-    delete_resource()
-    save_transcripts_to_folder(transcripts)
-    download_wavs_from_urls(wav_urls)
-    download_images_from_urls(image_urls)
-    make_video(fps=fps, show_script=show_script, name_day=name_day, color=color)
+def merge_video(transcripts, wav_urls, image_urls, color, name_day, fps=30, show_script=False, workspace=None,
+                bg_track=bg_music.DEFAULT_TRACK, job=None, backend="moviepy", encode_profile=None, crf=None,
+                on_encode_start=None):
+    """
+    Chạy toàn bộ pipeline trong workspace riêng của job (tạo mới nếu không truyền vào).
+    Trả về đường dẫn mp4; người gọi chịu trách nhiệm xoá workspace sau khi dùng xong.
+    """
+    if workspace is None:
+        workspace = create_workspace()
+    script_dir, audio_dir, image_dir = workspace_dirs(workspace)
+    delete_resource(script_dir, audio_dir, image_dir)
+    save_transcripts_to_folder(transcripts, output_folder=script_dir)
+    # Transcribe từng wav ngay khi tải xong, chạy song song với phần tải/mix audio còn lại
+    transcription = transcribe.TranscriptionBatch(audio_dir, texts=transcripts) if show_script else None
+    try:
+        with stage(job, "download"):
+            results = download_assets(wav_urls, image_urls, audio_dir=audio_dir, image_dir=image_dir,
+                                      on_complete=transcription.on_download if transcription else None)
+        if job is not None:
+            job.set_resource("bytes_downloaded", sum(r["bytes"] for r in results))
+        return make_video(script_dir=script_dir, audio_dir=audio_dir, image_dir=image_dir,
+                          fps=fps, show_script=show_script, name_day=name_day, color=color,
+                          bg_track=bg_track, job=job, backend=backend,
+                          encode_profile=encode_profile, crf=crf, on_encode_start=on_encode_start,
+                          transcription=transcription)
+    except BaseException:
+        if transcription is not None:
+            transcription.cancel()
+        raise
     
 # import sys
 # if __name__ == "__main__":
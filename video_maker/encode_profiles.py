@@ -0,0 +1,99 @@
+"""
+Profile encode cho video đầu ra (dùng chung cho backend MoviePy và ffmpeg).
+
+- draft:    nhanh, CRF 28 — xem thử / preview
+- standard: giữ nguyên thông số cũ (libx264 slow, 5000k)
+- archival: chất lượng cao, CRF 18, preset slower
+Có thể ép CRF cho từng request (bỏ bitrate cố định). Số thread x264 tự tính theo CPU quota của
+container (cgroup v2 cpu.max / v1 cfs_quota) chia cho số job đang encode song song.
+"""
+
+import math
+import os
+import threading
+from contextlib import contextmanager
+
+PROFILES = {
+    "draft": {"preset": "veryfast", "crf": 28, "bitrate": None, "audio_bitrate": "96k"},
+    "standard": {"preset": "slow", "crf": None, "bitrate": "5000k", "audio_bitrate": None},
+    "archival": {"preset": "slower", "crf": 18, "bitrate": None, "audio_bitrate": "192k"},
+}
+DEFAULT_PROFILE = os.getenv("ENCODE_PROFILE", "standard")
+CODEC = "libx264"
+AUDIO_CODEC = "aac"
+MAX_THREADS = int(os.getenv("ENCODE_MAX_THREADS", "16"))
+# mp4 fragmented: ghi tuần tự, không quay lại sửa header -> upload được trong lúc đang encode
+STREAMABLE_MOVFLAGS = ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+
+_lock = threading.Lock()
+_active_encodes = 0
+
+
+def cpu_quota() -> float:
+    """Số CPU process được dùng: quota cgroup (v2 rồi v1) nếu có, không thì số CPU affinity."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    try:
+        return float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return float(os.cpu_count() or 1)
+
+
+def auto_threads(active_jobs=1) -> int:
+    """Thread cho 1 lần encode: phần CPU quota chia đều cho các job đang encode (tối thiểu 1)."""
+    share = cpu_quota() / max(int(active_jobs), 1)
+    return max(1, min(MAX_THREADS, int(math.ceil(share))))
+
+
+@contextmanager
+def encode_slot():
+    """Đánh dấu 1 job đang encode; yield số job đang encode (tính cả job này)."""
+    global _active_encodes
+    with _lock:
+        _active_encodes += 1
+        n = _active_encodes
+    try:
+        yield n
+    finally:
+        with _lock:
+            _active_encodes -= 1
+
+
+def resolve(profile=None, crf=None, threads=None, active_jobs=1, streamable=False) -> dict:
+    """
+    Tham số encode (kwargs cho write_videofile / ffmpeg_backend.render_timeline):
+    codec, audio_codec, preset, bitrate, audio_bitrate, threads, ffmpeg_params.
+    streamable: xuất mp4 fragmented (cho upload stream).
+    """
+    profile = profile or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Profile encode không hợp lệ: {profile} (có: {', '.join(PROFILES)})")
+    p = PROFILES[profile]
+    crf = p["crf"] if crf is None else int(crf)
+
+    params = ["-crf", str(crf)] if crf is not None else []
+    if streamable:
+        params += STREAMABLE_MOVFLAGS
+    return {
+        "codec": CODEC,
+        "audio_codec": AUDIO_CODEC,
+        "preset": p["preset"],
+        "bitrate": None if crf is not None else p["bitrate"],  # CRF thì không ép bitrate
+        "audio_bitrate": p["audio_bitrate"],
+        "threads": threads or auto_threads(active_jobs),
+        "ffmpeg_params": params,
+    }
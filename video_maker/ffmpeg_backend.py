@@ -0,0 +1,240 @@
+"""
+Backend render bằng 1 lệnh ffmpeg duy nhất cho timeline của video_maker.timeline
+(thay vì để MoviePy composite từng frame 1080x1920 trong Python rồi pipe RGB sang ffmpeg).
+
+Đồ thị filter:
+  - mỗi slide: ảnh tĩnh (hoặc frame .rgb của image_prep) loop đúng số frame, crop/pad về khung (góc trái trên như MoviePy), fade đen in/out
+  - concat toàn bộ slide thành 1 luồng
+  - chữ thumbnail: PNG RGBA rasterize sẵn, overlay có enable theo thời gian + fade alpha
+  - fade: hệ số tính sẵn cho từng frame như MoviePy, đổi bằng sendcmd -> colorchannelmixer (filter fade
+    của ffmpeg làm tròn d*fps thành số frame nguyên nên lệch MoviePy khi fade ngắn / fps thấp)
+  - subtitle: toàn bộ từ ghép thành 1 luồng RGBA bằng concat demuxer (1 input cho mọi từ), overlay 1 lần
+  - audio: output.wav đã mix sẵn
+"""
+
+import math
+import os
+import re
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+from video_maker import image_prep
+from video_maker.timeline import center_x
+
+
+def _ffmpeg_binary() -> str:
+    from moviepy.config import FFMPEG_BINARY
+    return FFMPEG_BINARY
+
+
+def rasterize_text(item) -> np.ndarray:
+    """Chữ -> mảng RGBA uint8 (cùng sprite cache với backend MoviePy để 2 đường ra giống nhau)."""
+    from video_maker.text_render import render_text
+
+    return render_text(item)
+
+
+def _frames(t: float, fps: int) -> int:
+    # số frame có timestamp k/fps < t (MoviePy lấy frame tại t = k/fps)
+    return int(math.ceil(round(t * fps, 6)))
+
+
+def _fade_factors(n: int, fps: int, offset: float, start: float, duration: float, fade: float) -> list:
+    """
+    Hệ số fade của n frame (frame j ở thời điểm offset + j/fps trên timeline) đúng như MoviePy:
+    FadeIn/CrossFadeIn nhân tl/fade, FadeOut/CrossFadeOut nhân (duration - tl)/fade, tl = t - start.
+    """
+    factors = []
+    for j in range(n):
+        tl = (offset * fps + j) / fps - start
+        f = 1.0
+        if fade > 0 and tl < fade:
+            f *= max(tl, 0.0) / fade
+        if fade > 0 and duration - tl < fade:
+            f *= max(duration - tl, 0.0) / fade
+        factors.append(round(f, 6))
+    return factors
+
+
+def _fade_filters(name: str, channels, factors, fps: int) -> list:
+    """
+    colorchannelmixer (rr/gg/bb: fade đen, aa: fade alpha) + sendcmd đổi hệ số ở đúng frame cần đổi.
+    Thời điểm lệnh đặt giữa 2 frame (timestamp của luồng tính từ 0) để không phụ thuộc sai số làm tròn.
+    """
+    if not factors or all(f == 1.0 for f in factors):
+        return []
+    cmds, prev = [], factors[0]
+    for j, f in enumerate(factors[1:], 1):
+        if f != prev:
+            cmds.append(f"{(j - 0.5) / fps:.6f} " + ", ".join(f"colorchannelmixer@{name} {c} {f}" for c in channels))
+            prev = f
+    mixer = f"colorchannelmixer@{name}=" + ":".join(f"{c}={factors[0]}" for c in channels)
+    return ([f"sendcmd=c='{';'.join(cmds)}'"] if cmds else []) + [mixer]
+
+
+def _escape(path: str) -> str:
+    return path.replace("'", "'\\''")
+
+
+def _paste(canvas: np.ndarray, sprite: np.ndarray, x: int, y: int) -> None:
+    """Dán sprite RGBA lên canvas tại (x, y), tự cắt phần tràn ra ngoài."""
+    H, W = canvas.shape[:2]
+    h, w = sprite.shape[:2]
+    x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, W), min(y + h, H)
+    if x1 > x0 and y1 > y0:
+        canvas[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def _write_subtitle_track(items, work_dir, fps, canvas_w):
+    """
+    Ghép mọi subtitle thành 1 luồng ảnh RGBA (concat demuxer): mỗi từ -> PNG rộng bằng khung video
+    (từ đã đặt sẵn đúng vị trí căn giữa), khoảng trống -> PNG trong suốt.
+    Trả về (đường dẫn .ffconcat, (w, h)) hoặc None nếu không có subtitle.
+    """
+    items = sorted(items, key=lambda it: it["start"])
+    if not items:
+        return None
+    sprites = [rasterize_text(it) for it in items]
+    w = canvas_w
+    h = max(s.shape[0] for s in sprites)
+
+    def _pad(sprite):
+        canvas = np.zeros((h, w, 4), np.uint8)
+        # căn giữa ngang, sát trên (khớp position ("center", y))
+        _paste(canvas, sprite, center_x(w, sprite.shape[1]), 0)
+        return canvas
+
+    sub_dir = os.path.join(work_dir, "subs")
+    os.makedirs(sub_dir, exist_ok=True)
+    blank = os.path.join(sub_dir, "blank.png")
+    Image.fromarray(np.zeros((h, w, 4), np.uint8), "RGBA").save(blank)
+
+    lines = ["ffconcat version 1.0"]
+    cursor = 0  # tính theo frame để không trôi thời gian
+    for i, (it, sprite) in enumerate(zip(items, sprites)):
+        start_f = max(_frames(it["start"], fps), cursor)
+        end_f = _frames(it["start"] + it["duration"], fps)
+        if i + 1 < len(items):
+            end_f = min(end_f, _frames(items[i + 1]["start"], fps))  # SRT chồng lấn -> cắt từ trước
+        if end_f <= start_f:
+            continue
+        if start_f > cursor:
+            lines += [f"file '{_escape(blank)}'", f"duration {(start_f - cursor) / fps:.6f}"]
+        path = os.path.join(sub_dir, f"{i:05d}.png")
+        Image.fromarray(_pad(sprite), "RGBA").save(path, compress_level=1)
+        lines += [f"file '{_escape(path)}'", f"duration {(end_f - start_f) / fps:.6f}"]
+        cursor = end_f
+    # concat demuxer bỏ qua duration của file cuối -> lặp lại 1 ảnh trống
+    lines += [f"file '{_escape(blank)}'", f"duration {1 / fps:.6f}", f"file '{_escape(blank)}'"]
+
+    list_path = os.path.join(sub_dir, "subs.ffconcat")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return list_path, (w, h)
+
+
+def build_command(timeline, audio_path, output, fps, work_dir,
+                  codec="libx264", preset="slow", bitrate="5000k", threads=4,
+                  audio_codec="aac", audio_bitrate=None, ffmpeg_params=None) -> list:
+    W, H = timeline["size"]
+    total_frames = _frames(timeline["duration"], fps)
+    inputs, filters = [], []
+
+    def _add_input(*args):
+        inputs.append(list(args))
+        return len(inputs) - 1
+
+    # ----- Slides -----
+    seg_labels = []
+    for i, s in enumerate(timeline["slides"]):
+        n = _frames(s["start"] + s["duration"], fps) - _frames(s["start"], fps)
+        if n <= 0:
+            continue
+        d = n / fps
+        if s["image"].endswith(image_prep.FRAME_EXT):
+            # frame RGB thô đã chuẩn hoá: đọc thẳng, không decode ảnh
+            fw, fh = image_prep.frame_size(s["image"])
+            idx = _add_input("-stream_loop", "-1", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                             "-video_size", f"{fw}x{fh}", "-framerate", str(fps), "-t", f"{d:.6f}",
+                             "-i", s["image"])
+        else:
+            idx = _add_input("-loop", "1", "-framerate", str(fps), "-t", f"{d:.6f}", "-i", s["image"])
+        first = _frames(s["start"], fps)
+        fades = _fade_filters(f"s{i}", ("rr", "gg", "bb"),
+                              _fade_factors(n, fps, first / fps, s["start"], s["duration"], s["fade"]), fps)
+        filters.append(
+            f"[{idx}:v]format=rgb24,crop=w='min(iw,{W})':h='min(ih,{H})':x=0:y=0,"
+            f"pad={W}:{H}:0:0:black,setsar=1,trim=end_frame={n},setpts=PTS-STARTPTS"
+            + "".join("," + f for f in fades) + f"[s{i}]"
+        )
+        seg_labels.append(f"[s{i}]")
+    filters.append(f"{''.join(seg_labels)}concat=n={len(seg_labels)}:v=1:a=0[base]")
+    last = "base"
+
+    # ----- Chữ thumbnail: mỗi lớp 1 input PNG -----
+    titles = [it for it in timeline["texts"] if it["role"] != "subtitle"]
+    for k, it in enumerate(titles):
+        png = os.path.join(work_dir, f"title_{k:03d}.png")
+        sprite = rasterize_text(it)
+        Image.fromarray(sprite, "RGBA").save(png, compress_level=1)
+        end = it["start"] + it["duration"]
+        idx = _add_input("-loop", "1", "-framerate", str(fps), "-t", f"{end:.6f}", "-i", png)
+        # input chạy từ t=0 của timeline -> frame j ở đúng thời điểm j/fps
+        fades = _fade_filters(f"t{k}", ("aa",), _fade_factors(_frames(end, fps), fps, 0.0, it["start"],
+                                                               it["duration"], it["crossfade"]), fps)
+        filters.append(f"[{idx}:v]format=rgba" + "".join("," + f for f in fades) + f"[t{k}]")
+        filters.append(
+            f"[{last}][t{k}]overlay=x={center_x(W, sprite.shape[1])}:y={it['y']}:format=rgb:eof_action=pass:"
+            f"enable='between(t,{it['start']:.6f},{end:.6f})'[v{k}]"
+        )
+        last = f"v{k}"
+
+    # ----- Subtitle: 1 luồng duy nhất -----
+    subs = _write_subtitle_track([it for it in timeline["texts"] if it["role"] == "subtitle"], work_dir, fps, W)
+    if subs:
+        list_path, _ = subs
+        y = next(it["y"] for it in timeline["texts"] if it["role"] == "subtitle")
+        idx = _add_input("-f", "concat", "-safe", "0", "-i", list_path)
+        filters.append(f"[{idx}:v]format=rgba,fps={fps}[subs]")
+        filters.append(f"[{last}][subs]overlay=x=0:y={y}:format=rgb:eof_action=pass[vsub]")
+        last = "vsub"
+
+    filters.append(f"[{last}]format=yuv420p[vout]")
+
+    cmd = [_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+    audio_idx = _add_input("-i", audio_path) if audio_path else None
+    for args in inputs:
+        cmd += args
+    cmd += ["-filter_complex", ";".join(filters), "-map", "[vout]"]
+    if audio_idx is not None:
+        cmd += ["-map", f"{audio_idx}:a", "-c:a", audio_codec]
+        if audio_bitrate:
+            cmd += ["-b:a", audio_bitrate]
+    cmd += ["-c:v", codec, "-preset", preset, "-r", str(fps), "-frames:v", str(total_frames)]
+    if bitrate:
+        cmd += ["-b:v", bitrate]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd += list(ffmpeg_params or [])
+    cmd += [output]
+    return cmd
+
+
+def render_timeline(timeline, audio_path, output, fps=30, work_dir=None, job=None, **encode) -> str:
+    """Render timeline ra mp4 bằng 1 tiến trình ffmpeg; cập nhật job.set_progress(frame, tổng frame)."""
+    work_dir = work_dir or os.path.dirname(os.path.abspath(output))
+    os.makedirs(work_dir, exist_ok=True)
+    cmd = build_command(timeline, audio_path, output, fps, work_dir, **encode)
+    total = _frames(timeline["duration"], fps)
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        m = re.match(r"frame=(\d+)", line.strip())
+        if m and job is not None:
+            job.set_progress(min(int(m.group(1)), total), total)
+    err = proc.stderr.read()
+    if proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg render lỗi (exit {proc.returncode}):\n{err[-4000:]}")
+    return output
@@ -0,0 +1,220 @@
+"""
+Chuẩn hoá ảnh slide trước khi dựng timeline: mỗi ảnh chỉ decode + fit về đúng khung video 1 lần.
+
+- sniff_format(): định dạng thật theo magic bytes (ảnh tải về luôn tên N.png dù là JPEG/WebP...)
+- ảnh lớn hơn nhiều so với khung: JPEG decode ở độ phân giải giảm (draft), định dạng khác dùng reduce()
+  trước khi resample -> không bao giờ giữ ảnh 4000x6000 trong RAM suốt quá trình composite
+- fit kiểu "cover" (phủ kín khung, cắt giữa), xoay theo EXIF, nền trong suốt -> đen
+- kết quả là frame RGB uint8 liên tục, lưu thô (.rgb) trong cache theo hash nội dung;
+  request sau gặp lại cùng ảnh chỉ việc đọc file (MoviePy: np.fromfile, ffmpeg: -f rawvideo)
+"""
+
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from natsort import natsorted
+from PIL import Image, ImageOps
+
+VIDEO_SIZE = (1080, 1920)
+PREP_CACHE_DIR = os.getenv("IMAGE_PREP_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "image_prep")
+PREP_CACHE_MAX_BYTES = int(os.getenv("IMAGE_PREP_CACHE_MAX_BYTES", str(1024 ** 3)))
+PREP_VERSION = 2      # tăng khi đổi thuật toán fit -> cache cũ tự mất hiệu lực
+FRAME_EXT = ".rgb"
+EXIF_ROTATED = (5, 6, 7, 8)  # giá trị tag Orientation (0x0112) có xoay 90°/270°
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+
+_EXT_BY_FORMAT = {"png": ".png", "jpeg": ".jpg", "webp": ".webp", "gif": ".gif", "bmp": ".bmp", "tiff": ".tiff"}
+
+
+def sniff_format(path: str):
+    """'png' | 'jpeg' | 'webp' | 'gif' | 'bmp' | 'tiff' | None (không phải ảnh hỗ trợ)."""
+    with open(path, "rb") as f:
+        head = f.read(16)
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    return None
+
+
+def fix_extension(path: str, fmt: str) -> str:
+    """Đổi đuôi file theo định dạng thật (rename, không ghi lại nội dung -> an toàn với hardlink của cache)."""
+    ext = _EXT_BY_FORMAT.get(fmt)
+    root, cur = os.path.splitext(path)
+    if not ext or cur.lower() == ext or (fmt == "jpeg" and cur.lower() == ".jpeg"):
+        return path
+    new_path = root + ext
+    os.replace(path, new_path)
+    return new_path
+
+
+def list_images(image_dir: str) -> list:
+    return natsorted([os.path.join(image_dir, f) for f in os.listdir(image_dir)
+                      if f.lower().endswith(IMAGE_EXTS)])
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def frame_path(key: str, size, cache_dir=PREP_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"{key}_{size[0]}x{size[1]}{FRAME_EXT}")
+
+
+def frame_size(path: str) -> tuple:
+    """(w, h) của frame .rgb, đọc từ tên file."""
+    m = re.search(r"_(\d+)x(\d+)" + re.escape(FRAME_EXT) + "$", path)
+    if not m:
+        raise ValueError(f"Không phải frame đã chuẩn hoá: {path}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def load_frame(path: str) -> np.ndarray:
+    """Frame RGB uint8 (h, w, 3) liên tục của ảnh đã chuẩn hoá."""
+    w, h = frame_size(path)
+    return np.fromfile(path, dtype=np.uint8).reshape(h, w, 3)
+
+
+def fit_cover(path: str, size=VIDEO_SIZE) -> np.ndarray:
+    """Decode (giảm độ phân giải nếu ảnh quá lớn) + fit phủ kín size, cắt giữa -> RGB uint8 (h, w, 3)."""
+    W, H = size
+    with Image.open(path) as im:
+        w, h = im.size
+        # EXIF 5-8 = xoay 90°: draft tính trên kích thước chưa xoay -> đổi chiều khung đích cho khớp
+        tw, th = (H, W) if im.getexif().get(0x0112, 1) in EXIF_ROTATED else (W, H)
+        scale = max(tw / w, th / h)
+        if im.format == "JPEG" and scale < 0.5:
+            # DCT scaling 1/2, 1/4, 1/8 ngay lúc decode, vẫn >= kích thước cần để fit
+            im.draft("RGB", (int(w * scale) + 1, int(h * scale) + 1))
+        im = ImageOps.exif_transpose(im)
+        if im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info):
+            rgba = im.convert("RGBA")
+            im = Image.new("RGB", rgba.size)
+            im.paste(rgba, mask=rgba.getchannel("A"))
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+
+        w, h = im.size  # sau draft/xoay EXIF
+        scale = max(W / w, H / h)
+        cw, ch = W / scale, H / scale
+        box = ((w - cw) / 2, (h - ch) / 2, (w + cw) / 2, (h + ch) / 2)
+        if im.size != (W, H):
+            im = im.resize((W, H), Image.LANCZOS, box=box, reducing_gap=3.0)
+        return np.ascontiguousarray(np.asarray(im, dtype=np.uint8))
+
+
+def prepare_image(path: str, size=VIDEO_SIZE, cache_dir=PREP_CACHE_DIR) -> str:
+    """Đường dẫn frame .rgb đã chuẩn hoá của ảnh (dùng cache theo sha256 nội dung + size)."""
+    if sniff_format(path) is None:
+        raise ValueError(f"File ảnh không hợp lệ hoặc định dạng không hỗ trợ: {path}")
+    key = hashlib.sha256(f"{_file_sha256(path)}:{PREP_VERSION}".encode()).hexdigest()
+    out = frame_path(key, size, cache_dir)
+    try:
+        os.utime(out)  # đánh dấu vừa dùng cho LRU
+        return out
+    except FileNotFoundError:
+        pass
+
+    frame = fit_cover(path, size)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        frame.tofile(f)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, out)
+    return out
+
+
+def _link(src: str, dst: str) -> str:
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return dst  # rename() giữa 2 hardlink cùng inode là no-op -> không đi đường .part
+    tmp = dst + ".part"
+    if os.path.lexists(tmp):
+        os.unlink(tmp)
+    try:
+        os.link(src, tmp)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return dst
+
+
+def prepare_images(paths, size=VIDEO_SIZE, out_dir=None, cache_dir=PREP_CACHE_DIR, max_workers=None) -> list:
+    """
+    Chuẩn hoá nhiều ảnh song song (Pillow nhả GIL khi decode/resample), giữ thứ tự.
+    Ảnh trong workspace được đổi đuôi theo định dạng thật.
+    out_dir: hardlink frame vào đây (vd. workspace của job) để evict cache không xoá mất frame đang dùng.
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _one(p):
+        fmt = sniff_format(p)
+        if fmt is not None:
+            p = fix_extension(p, fmt)
+        frame = prepare_image(p, size=size, cache_dir=cache_dir)
+        if out_dir:
+            stem = os.path.splitext(os.path.basename(p))[0]
+            dst = os.path.join(out_dir, f"{stem}_{size[0]}x{size[1]}{FRAME_EXT}")
+            try:
+                frame = _link(frame, dst)
+            except FileNotFoundError:  # vừa bị evict -> chuẩn hoá lại
+                frame = _link(prepare_image(p, size=size, cache_dir=cache_dir), dst)
+        return frame
+
+    workers = max_workers or min(len(paths), os.cpu_count() or 1, 8)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        frames = list(ex.map(_one, paths))
+    evict(cache_dir)
+    return frames
+
+
+def evict(cache_dir=PREP_CACHE_DIR, max_bytes=PREP_CACHE_MAX_BYTES) -> None:
+    """Xoá frame dùng lâu nhất (mtime) cho tới khi tổng dung lượng <= max_bytes."""
+    if not os.path.isdir(cache_dir):
+        return
+    with open(os.path.join(cache_dir, ".evict.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        frames, total = [], 0
+        with os.scandir(cache_dir) as it:
+            for e in it:
+                if not e.name.endswith(FRAME_EXT):
+                    continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                frames.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        frames.sort()
+        for _, sz, p in frames:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(p)
+            except FileNotFoundError:
+                pass
+            total -= sz
@@ -0,0 +1,203 @@
+"""
+Job chạy nền cho /generate-video: submit trả về job id ngay, job chạy trên pool worker giới hạn,
+client poll trạng thái (stage, tiến độ encode, thời gian từng stage, url/lỗi).
+submit(key=...) gộp request trùng nội dung (single-flight): trong lúc 1 job với key đó còn chạy,
+request sau nhận lại chính job đó thay vì render thêm 1 lần.
+
+Trạng thái job nằm trong RAM của process -> khi chạy nhiều worker uvicorn cần sticky routing
+(hoặc chạy 1 process với nhiều job song song nhờ workspace riêng từng job).
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from proglog import ProgressBarLogger
+
+from utils import metrics
+
+MAX_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "2"))
+JOB_TTL = float(os.getenv("VIDEO_JOB_TTL", "3600"))  # giữ kết quả job đã xong bao lâu (giây)
+
+
+class Job:
+    def __init__(self, job_id: str, key=None):
+        self.id = job_id
+        self.key = key              # key nội dung request (utils.render_cache.request_key)
+        self.status = "queued"      # queued | running | done | error
+        self.stage = None
+        self.progress = None        # {"done": frames đã encode, "total": tổng frame}
+        self.timings = {}           # stage -> giây (stage con: "audio.bg_music", ...)
+        self.resources = {}         # peak_rss_mb, encode_fps, bytes_downloaded, bytes_uploaded
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cached = False         # kết quả lấy từ render cache, không render
+        self.coalesced = 0          # số request trùng đã gộp vào job này
+        self.future = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, name: str):
+        """Đánh dấu stage hiện tại, cộng thời gian chạy vào timings[name] và histogram /metrics."""
+        with self._lock:
+            self.stage = name
+        token = metrics.bind(self, name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.unbind(token)
+            self.add_timing(name, elapsed)
+            metrics.observe_stage("video", name, elapsed)
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[name] = round(self.timings.get(name, 0.0) + seconds, 3)
+
+    def set_resource(self, name: str, value) -> None:
+        with self._lock:
+            self.resources[name] = value
+
+    def set_progress(self, done: int, total: int) -> None:
+        with self._lock:
+            self.progress = {"done": int(done), "total": int(total)}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            progress = dict(self.progress) if self.progress else None
+            if progress and progress["total"]:
+                progress["percent"] = round(100.0 * progress["done"] / progress["total"], 1)
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": progress,
+                "timings": dict(self.timings),
+                "resources": dict(self.resources),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "cached": self.cached,
+                "coalesced": self.coalesced,
+            }
+
+
+def stage(job, name: str):
+    """job.track(name) nếu có job, không thì chỉ đo vào /metrics (gọi pipeline trực tiếp không qua JobManager)."""
+    return job.track(name) if job is not None else metrics.span("video", name)
+
+
+class JobProgressLogger(ProgressBarLogger):
+    """Logger proglog cho write_videofile: đẩy số frame đã encode / tổng frame vào job."""
+
+    def __init__(self, job: Job):
+        super().__init__()
+        self.job = job
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar == "frame_index" and attr == "index":
+            total = self.bars[bar].get("total") or 0
+            self.job.set_progress(min(value, total) if total else value, total)
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_WORKERS, ttl=JOB_TTL):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="video-job")
+        self._jobs = {}
+        self._inflight = {}         # key -> job đang queued/running
+        self._lock = threading.Lock()
+        self.ttl = ttl
+
+    def submit(self, fn, *args, job_id=None, key=None, **kwargs) -> Job:
+        """
+        Chạy fn(*args, job=job, **kwargs) trên pool; kết quả fn thành job.result.
+        key: nếu đang có job cùng key chưa xong thì trả về job đó (không chạy fn lần nữa).
+        """
+
+        def _run(job):
+            with job._lock:
+                job.status = "running"
+                job.started_at = time.time()
+            metrics.job_started(job)
+            status, result, error = "error", None, None
+            try:
+                result = fn(*args, job=job, **kwargs)
+                status = "done"
+                return result
+            except BaseException as e:  # cả KeyboardInterrupt / SystemExit: job không được kẹt ở "running"
+                error = str(getattr(e, "detail", None) or e) or type(e).__name__
+                raise
+            finally:
+                with job._lock:
+                    job.status = status
+                    job.finished_at = time.time()
+                    if status == "done":
+                        job.stage = None
+                        job.result = result
+                    else:
+                        job.error = error
+                metrics.job_finished(job, status)
+                # nhả key sau khi đã chốt trạng thái -> request trùng đến sau tạo job mới
+                self._release(job)
+
+        self._prune()
+        with self._lock:
+            job = self._inflight.get(key) if key else None
+            if job is not None:
+                with job._lock:
+                    job.coalesced += 1
+                print(f"🔗 Gộp request trùng vào job {job.id} (key {key[:12]})")
+                return job
+            job = Job(job_id or uuid.uuid4().hex, key=key)
+            self._jobs[job.id] = job
+            if key:
+                self._inflight[key] = job
+            metrics.job_queued()
+            # submit trong lock -> job trả cho request trùng luôn có future
+            job.future = self._executor.submit(_run, job)
+        return job
+
+    def done(self, result, job_id=None, key=None, cached=True) -> Job:
+        """Job đã xong sẵn với result (vd. lấy từ render cache), không chiếm worker."""
+        job = Job(job_id or uuid.uuid4().hex, key=key)
+        now = time.time()
+        job.status = "done"
+        job.result = result
+        job.cached = cached
+        job.started_at = job.finished_at = now
+        job.future = Future()
+        job.future.set_result(result)
+        self._prune()
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def _release(self, job: Job) -> None:
+        if job.key:
+            with self._lock:
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+
+    def _prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, j in self._jobs.items() if j.finished_at and now - j.finished_at > self.ttl]
+            for k in expired:
+                del self._jobs[k]
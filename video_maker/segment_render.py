@@ -0,0 +1,187 @@
+"""
+Render song song theo đoạn cho backend MoviePy: cắt timeline tại ranh giới slide (căn theo lưới frame),
+mỗi đoạn render video-only trên 1 process của ProcessPoolExecutor với cùng tham số encode (mỗi đoạn là
+1 lần encode riêng nên luôn bắt đầu bằng IDR), rồi nối bằng concat demuxer của ffmpeg (-c copy, không
+encode lại) và mux 1 track audio duy nhất.
+
+Mỗi đoạn giữ nguyên thời gian gốc của timeline (chỉ lọc slide/chữ giao với cửa sổ của đoạn)
+và lấy đúng các frame k/fps của cửa sổ đó -> chữ thumbnail/subtitle vắt qua ranh giới vẫn
+fade đúng như khi render 1 lần.
+"""
+
+import math
+import multiprocessing
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from video_maker import encode_profiles
+
+MAX_WORKERS = int(os.getenv("SEGMENT_WORKERS", "0"))  # 0 = theo CPU quota
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def segment_workers() -> int:
+    return MAX_WORKERS or max(1, int(encode_profiles.cpu_quota()))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Pool process dùng chung (spawn: an toàn khi process cha có nhiều thread như uvicorn)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=segment_workers(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def total_frames(timeline, fps) -> int:
+    # MoviePy ghi int(duration * fps) frame
+    return int(timeline["duration"] * fps)
+
+
+def split_timeline(timeline, fps, max_segments) -> list:
+    """
+    Chia theo ranh giới slide thành tối đa max_segments đoạn, cân theo số frame.
+    Trả về list (frame_đầu, frame_cuối, timeline con chỉ gồm slide/chữ giao với đoạn).
+    """
+    n_total = total_frames(timeline, fps)
+    # frame đầu của mỗi slide = frame đầu tiên có timestamp >= start
+    cuts = sorted({min(int(math.ceil(round(s["start"] * fps, 6))), n_total) for s in timeline["slides"]} | {0})
+    bounds = [(a, b) for a, b in zip(cuts, cuts[1:] + [n_total]) if b > a]
+
+    # Gộp slide liền nhau cho đủ max_segments đoạn có số frame gần bằng nhau
+    target = n_total / max(1, max_segments)
+    groups, cur = [], None
+    for a, b in bounds:
+        if cur is None:
+            cur = [a, b]
+        elif cur[1] - cur[0] >= target:
+            groups.append(tuple(cur))
+            cur = [a, b]
+        else:
+            cur[1] = b
+    if cur is not None:
+        groups.append(tuple(cur))
+
+    segments = []
+    for f0, f1 in groups:
+        t0, t1 = f0 / fps, f1 / fps
+
+        def _inside(it):
+            return it["start"] < t1 and it["start"] + it["duration"] > t0
+
+        sub = dict(timeline,
+                   slides=[s for s in timeline["slides"] if _inside(s)],
+                   texts=[t for t in timeline["texts"] if _inside(t)])
+        segments.append((f0, f1, sub))
+    return segments
+
+
+def _movflags(params) -> list:
+    params = list(params or [])
+    if "-movflags" in params:
+        i = params.index("-movflags")
+        return params[i:i + 2]
+    return []
+
+
+def segment_params(encode) -> list:
+    """ffmpeg_params cho mỗi đoạn: tham số của profile, bỏ -movflags (fragmented chỉ cần cho file nối cuối)."""
+    params = list(encode.get("ffmpeg_params") or [])
+    if _movflags(params):
+        i = params.index("-movflags")
+        del params[i:i + 2]
+    return params
+
+
+def segment_threads(threads, concurrent) -> int:
+    """Chia threads của job (encode_profiles.resolve, đã tính theo encode_slot) cho các đoạn chạy cùng lúc."""
+    return max(1, int(threads) // max(int(concurrent), 1))
+
+
+def _render_segment(sub_timeline, f0, f1, fps, output, encode) -> str:
+    """Chạy trong process con: render frame [f0, f1) của timeline (video-only)."""
+    from video_maker.timeline import to_moviepy
+
+    n = f1 - f0
+    # đệm nửa frame để int(duration * fps) của đoạn không hụt frame cuối vì sai số float
+    end = (f0 + n + 0.5) / fps
+    clip = to_moviepy(sub_timeline)
+    clip = clip.with_duration(max(clip.duration, end)).subclipped(f0 / fps, end)
+    params = segment_params(encode) + ["-frames:v", str(n)]
+    clip.write_videofile(
+        output, fps=fps, audio=False, logger=None,
+        codec=encode["codec"], preset=encode["preset"], bitrate=encode["bitrate"],
+        threads=encode["threads"], ffmpeg_params=params,
+    )
+    return output
+
+
+def concat_segments(parts, audio_path, output, work_dir, audio_codec="aac", audio_bitrate=None,
+                    movflags=None) -> str:
+    """Nối các đoạn bằng concat demuxer (-c:v copy) + mux audio."""
+    from video_maker.ffmpeg_backend import _escape, _ffmpeg_binary
+
+    list_path = os.path.join(work_dir, "segments.ffconcat")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for p in parts:
+            f.write(f"file '{_escape(os.path.abspath(p))}'\n")
+
+    cmd = [_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+           "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:a", audio_codec]
+        if audio_bitrate:
+            cmd += ["-b:a", audio_bitrate]
+    cmd += ["-c:v", "copy"] + list(movflags or []) + [output]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat lỗi (exit {proc.returncode}):\n{proc.stderr[-4000:]}")
+    return output
+
+
+def render_segmented(timeline, audio_path, output, fps=30, work_dir=None, job=None, workers=None, **encode) -> str:
+    """
+    Render timeline bằng MoviePy trên nhiều process rồi nối lossless.
+    encode: như encode_profiles.resolve(); threads (phần CPU của job) chia đều cho các đoạn chạy song song.
+    """
+    work_dir = work_dir or os.path.dirname(os.path.abspath(output))
+    os.makedirs(work_dir, exist_ok=True)
+    workers = workers or segment_workers()
+    segments = split_timeline(timeline, fps, max_segments=workers * 2)
+    total = total_frames(timeline, fps)
+
+    seg_encode = dict(encode)
+    threads = encode.get("threads") or encode_profiles.auto_threads()
+    seg_encode["threads"] = segment_threads(threads, min(workers, len(segments)))
+    print(f"🧩 Render {len(segments)} đoạn trên {workers} process (threads/đoạn={seg_encode['threads']})")
+
+    pool = _get_pool()
+    futures = {}
+    for i, (f0, f1, sub) in enumerate(segments):
+        part = os.path.join(work_dir, f"seg_{i:04d}.mp4")
+        futures[pool.submit(_render_segment, sub, f0, f1, fps, part, seg_encode)] = (i, f1 - f0)
+
+    parts = [None] * len(segments)
+    done = 0
+    try:
+        for fut in as_completed(futures):
+            i, n = futures[fut]
+            parts[i] = fut.result()
+            done += n
+            if job is not None:
+                job.set_progress(done, total)
+    except Exception:
+        for f in futures:
+            f.cancel()
+        raise
+
+    return concat_segments(parts, audio_path, output, work_dir,
+                           audio_codec=encode.get("audio_codec", "aac"),
+                           audio_bitrate=encode.get("audio_bitrate"),
+                           movflags=_movflags(encode.get("ffmpeg_params")))
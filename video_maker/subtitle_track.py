@@ -0,0 +1,101 @@
+"""
+Subtitle từng từ gộp thành 1 lớp duy nhất cho CompositeVideoClip (backend MoviePy).
+
+Trước đây mỗi từ là 1 ImageClip + CrossFadeIn/Out riêng -> video 60s có hàng trăm lớp và mỗi frame
+CompositeVideoClip phải hỏi is_playing() từng lớp. SubtitleTrack giữ cả danh sách từ, tại thời điểm t
+tìm từ đang hiện bằng bisect theo start (O(log n)) rồi trả về sprite/mask/vị trí của đúng từ đó.
+
+- Sprite lấy từ video_maker.text_render (cùng sprite cache với text_clip)
+- Mask tính đúng như ImageClip RGBA + CrossFadeIn + CrossFadeOut của MoviePy (alpha/255 rồi FadeIn
+  rồi FadeOut) -> frame giống hệt cách dựng cũ
+- is_playing(t) chỉ True khi có từ đang hiện -> khoảng trống giữa các câu không tốn lượt composite nào
+- Các từ chồng thời gian nhau: hiện từ bắt đầu sau cùng (lớp trên cùng theo thứ tự cũ)
+"""
+
+import bisect
+
+import numpy as np
+from moviepy import VideoClip
+
+from video_maker.text_render import render_text
+
+
+class SubtitleIndex:
+    """Chỉ mục thời gian của danh sách từ (đã sắp theo start, giữ thứ tự gốc khi trùng start)."""
+
+    def __init__(self, items, canvas_size):
+        self.items = sorted(items, key=lambda it: it["start"])
+        self.canvas_w = canvas_size[0]
+        self.starts = [it["start"] for it in self.items]
+        self.ends = [it["start"] + it["duration"] for it in self.items]
+        # reach[i] = max(ends[:i + 1]) -> dừng dò ngược sớm khi không từ nào trước đó còn hiện
+        self.reach = list(np.maximum.accumulate(self.ends)) if self.items else []
+        self.duration = max(self.ends) if self.items else 0.0
+        self._cached = (None, None, None)  # (i, rgb, alpha/255)
+
+    def active(self, t):
+        """Index từ đang hiện tại t (start <= t < end), None nếu không có."""
+        i = bisect.bisect_right(self.starts, t) - 1
+        while i >= 0 and self.reach[i] > t:
+            if self.ends[i] > t:
+                return i
+            i -= 1
+        return None
+
+    def _sprite(self, i):
+        if self._cached[0] != i:
+            rgba = render_text(self.items[i])
+            self._cached = (i, rgba[:, :, :3], 1.0 * rgba[:, :, 3] / 255)
+        return self._cached[1], self._cached[2]
+
+    def frame(self, t):
+        i = self.active(t)
+        if i is None:
+            return np.zeros((1, 1, 3), np.uint8)
+        return self._sprite(i)[0]
+
+    def mask(self, t):
+        i = self.active(t)
+        if i is None:
+            return np.zeros((1, 1))
+        m = self._sprite(i)[1]
+        item = self.items[i]
+        ct = t - item["start"]
+        d, cf = item["duration"], item["crossfade"]
+        # Cùng thứ tự phép tính với FadeIn rồi FadeOut của MoviePy trên mask
+        if ct < cf:
+            fading = 1.0 * ct / cf
+            m = fading * m + (1 - fading) * np.array(0)
+        if (d - ct) < cf:
+            fading = 1.0 * (d - ct) / cf
+            m = fading * m + (1 - fading) * np.array(0)
+        return m
+
+    def position(self, t):
+        i = self.active(t)
+        if i is None:
+            return (0, 0)
+        item = self.items[i]
+        w = self._sprite(i)[0].shape[1]
+        return (int((self.canvas_w - w) / 2), item["y"])  # căn giữa như timeline.center_x
+
+
+class _TrackClip(VideoClip):
+    """VideoClip mà is_playing() hỏi chỉ mục (bản copy qua with_* vẫn dùng chung index)."""
+
+    def __init__(self, index: SubtitleIndex, frame_function, is_mask=False):
+        super().__init__(frame_function=frame_function, is_mask=is_mask, duration=index.duration)
+        self.index = index
+
+    def is_playing(self, t):
+        if isinstance(t, np.ndarray):
+            return super().is_playing(t)
+        return t >= self.start and self.index.active(t - self.start) is not None
+
+
+def subtitle_track(items, canvas_size) -> VideoClip:
+    """1 clip cho toàn bộ subtitle (items: text_item role='subtitle' của timeline)."""
+    index = SubtitleIndex(items, canvas_size)
+    clip = _TrackClip(index, index.frame)
+    clip.mask = _TrackClip(index, index.mask, is_mask=True)
+    return clip.with_position(index.position)
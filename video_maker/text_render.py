@@ -0,0 +1,245 @@
+"""
+Lớp render chữ cho video (subtitle từng từ + chữ thumbnail), thay cho việc dựng TextClip từ đầu cho mỗi từ.
+
+- Sprite cache (LRU theo số byte, dùng chung giữa các request): key = (text, font, cỡ, màu, viền, margin)
+  -> mảng RGBA uint8 đã render sẵn, chỉ đọc.
+- Glyph atlas theo (font, cỡ, độ dày viền): mỗi ký tự chỉ rasterize 1 lần (lớp viền + lớp ruột, theo
+  vài pha subpixel); từ chưa gặp được ghép từ glyph có sẵn thay vì rasterize cả chuỗi.
+- Kích thước / vị trí baseline / cách trộn màu giống hệt TextClip(method="label") của MoviePy,
+  nên backend MoviePy và ffmpeg dùng chung mà không lệch so với trước.
+"""
+
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from PIL import ImageColor, ImageFont
+
+SPRITE_CACHE_BYTES = int(os.getenv("TEXT_SPRITE_CACHE_BYTES", str(256 * 1024 * 1024)))
+SUBPIXEL_STEPS = 4   # số pha subpixel theo chiều ngang của mỗi glyph trong atlas
+
+_lock = threading.Lock()
+_fonts = {}          # (font, size) -> FreeTypeFont
+
+
+def _font(path: str, size: int):
+    key = (path, size)
+    with _lock:
+        f = _fonts.get(key)
+        if f is None:
+            f = _fonts[key] = ImageFont.truetype(path, size)
+        return f
+
+
+def _rgba(color) -> tuple:
+    """Màu kiểu Pillow ("white", "#ff0000", (r, g, b)) -> (r, g, b, a)."""
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    color = tuple(int(c) for c in color)
+    return color if len(color) == 4 else color + (255,)
+
+
+def _div255(a: np.ndarray) -> np.ndarray:
+    t = a + 128
+    return ((t >> 8) + t) >> 8
+
+
+def _blend(canvas: np.ndarray, mask: np.ndarray, ink: tuple) -> None:
+    """
+    Tô ink lên canvas RGBA (uint8) theo mask L, tại chỗ — cùng công thức draw_bitmap của Pillow:
+    pixel đang trong suốt hoàn toàn nhận thẳng màu ink, kênh alpha trộn theo mask.
+    """
+    m = mask.astype(np.uint32)
+    out = canvas.astype(np.uint32)
+    transparent = out[..., 3] == 0
+    for i in range(4):
+        cm = m
+        if i != 3:
+            cm = np.where(transparent & (m != 0), 255, m)
+        out[..., i] = _div255(out[..., i] * (255 - cm) + ink[i] * cm)
+    canvas[...] = out.astype(np.uint8)
+
+
+class GlyphAtlas:
+    """Glyph đã rasterize của 1 (font, cỡ, viền): ký tự + pha subpixel -> (mask viền, mask ruột)."""
+
+    def __init__(self, font_path: str, size: int, stroke_width: int):
+        self.font = _font(font_path, size)
+        self.stroke_width = stroke_width
+        self._glyphs = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, ch: str, phase: int):
+        key = (ch, phase)
+        g = self._glyphs.get(key)
+        if g is None:
+            start = (phase / SUBPIXEL_STEPS, 0.0)
+            layers = []
+            for sw in (self.stroke_width, 0):
+                im, offset = self.font.getmask2(ch, "L", stroke_width=sw, stroke_filled=True,
+                                                anchor="ls", start=start)
+                arr = np.asarray(im, dtype=np.uint8).reshape(im.size[1], im.size[0])
+                layers.append((arr, offset))
+            g = tuple(layers)
+            with self._lock:
+                self._glyphs[key] = g
+        return g
+
+    def __len__(self):
+        return len(self._glyphs)
+
+
+_atlases = {}
+
+
+def get_atlas(font_path: str, size: int, stroke_width: int) -> GlyphAtlas:
+    key = (font_path, size, stroke_width)
+    with _lock:
+        atlas = _atlases.get(key)
+    if atlas is None:
+        atlas = GlyphAtlas(font_path, size, stroke_width)
+        with _lock:
+            atlas = _atlases.setdefault(key, atlas)
+    return atlas
+
+
+def _can_compose(text: str) -> bool:
+    # Dấu tổ hợp rời (NFD), xuống dòng, ký tự điều khiển -> cần layout cả chuỗi
+    return bool(text) and all(
+        ch.isprintable() and not unicodedata.combining(ch) for ch in text
+    )
+
+
+def _margins(margin) -> tuple:
+    if len(margin) == 2:
+        l = r = int(margin[0] or 0)
+        t = b = int(margin[1] or 0)
+    else:
+        l, t, r, b = (int(m or 0) for m in margin)
+    return l, t, r, b
+
+
+def _compose(item) -> np.ndarray:
+    """Ghép sprite từ glyph atlas, bố cục như TextClip(method="label", vertical_align="bottom")."""
+    text, sw = item["text"], int(item["stroke_width"])
+    font = _font(item["font"], item["font_size"])
+    atlas = get_atlas(item["font"], item["font_size"], sw)
+    ml, mt, mr, mb = _margins(item["margin"])
+
+    # Kích thước chữ: bbox anchor "ls" có viền (như __find_text_size của MoviePy)
+    left, top, right, bottom = font.getbbox(text, stroke_width=sw, anchor="ls")
+    tw, th = int(right - left), int(bottom - top)
+    W, H = tw + ml + mr, th + mt + mb
+    ascent, _ = font.getmetrics()
+    x0, y0 = sw + ml, ascent + mt + sw
+
+    stroke = np.zeros((H, W), np.uint8)
+    fill = np.zeros((H, W), np.uint8)
+    for i, ch in enumerate(text):
+        pen = font.getlength(text[:i]) if i else 0.0
+        whole = int(pen)
+        phase = int(round((pen - whole) * SUBPIXEL_STEPS))
+        if phase == SUBPIXEL_STEPS:
+            whole, phase = whole + 1, 0
+        for layer, (mask, (ox, oy)) in zip((stroke, fill), atlas.glyph(ch, phase)):
+            _merge_glyph(layer, mask, x0 + whole + ox, y0 + oy)
+
+    sprite = np.zeros((H, W, 4), np.uint8)
+    _blend(sprite, stroke, _rgba(item["stroke_color"]))
+    _blend(sprite, fill, _rgba(item["color"]))
+    return sprite
+
+
+def _merge_glyph(layer: np.ndarray, mask: np.ndarray, x: int, y: int) -> None:
+    """Gộp mask glyph vào layer kiểu "over" (a + b - a*b/255) như FreeType render cả chuỗi của Pillow."""
+    H, W = layer.shape
+    h, w = mask.shape
+    x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, W), min(y + h, H)
+    if x1 > x0 and y1 > y0:
+        dst = layer[y0:y1, x0:x1].astype(np.uint32)
+        src = mask[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.uint32)
+        layer[y0:y1, x0:x1] = dst + src - _div255(dst * src)
+
+
+def _rasterize_full(item) -> np.ndarray:
+    """Rasterize cả chuỗi bằng TextClip (chuỗi nhiều dòng / có dấu tổ hợp rời)."""
+    from video_maker.timeline import raw_text_clip
+
+    clip = raw_text_clip(item)
+    rgb = clip.get_frame(0).astype(np.uint8)
+    alpha = (clip.mask.get_frame(0) * 255).astype(np.uint8) if clip.mask is not None \
+        else np.full(rgb.shape[:2], 255, np.uint8)
+    return np.dstack([rgb, alpha])
+
+
+class SpriteCache:
+    """LRU theo tổng số byte của các sprite RGBA."""
+
+    def __init__(self, max_bytes=SPRITE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            sprite = self._items.get(key)
+            if sprite is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+    def put(self, key, sprite: np.ndarray) -> None:
+        if sprite.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._items[key] = sprite
+            self._bytes += sprite.nbytes
+            while self._bytes > self.max_bytes:
+                _, ev = self._items.popitem(last=False)
+                self._bytes -= ev.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+sprite_cache = SpriteCache()
+
+
+def _key(item) -> tuple:
+    return (item["text"], item["font"], item["font_size"], str(item["color"]),
+            str(item["stroke_color"]), item["stroke_width"], tuple(item["margin"]))
+
+
+def render_text(item) -> np.ndarray:
+    """Sprite RGBA uint8 (chỉ đọc, dùng chung) của 1 lớp chữ trong timeline."""
+    key = _key(item)
+    sprite = sprite_cache.get(key)
+    if sprite is None:
+        sprite = _compose(item) if _can_compose(item["text"]) else _rasterize_full(item)
+        sprite.flags.writeable = False
+        sprite_cache.put(key, sprite)
+    return sprite
+
+
+def text_mask(sprite: np.ndarray) -> np.ndarray:
+    """Kênh alpha của sprite dạng float [0, 1] (mask cho compositor MoviePy)."""
+    return sprite[..., 3] / 255.0
+
+
+def stats() -> dict:
+    with _lock:
+        glyphs = sum(len(a) for a in _atlases.values())
+        atlases = len(_atlases)
+    return {"sprites": sprite_cache.stats(), "atlases": atlases, "glyphs": glyphs}
@@ -0,0 +1,149 @@
+"""
+Timeline của video dưới dạng dữ liệu thuần (dict/list), độc lập với backend render.
+- build_timeline(): ảnh + durations + subtitle/thumbnail -> timeline
+- to_moviepy(): timeline -> CompositeVideoClip (backend mặc định)
+- video_maker.ffmpeg_backend dịch cùng timeline thành 1 lệnh ffmpeg
+- ảnh chữ của cả 2 backend lấy từ video_maker.text_render (glyph atlas + sprite cache)
+- MoviePy: subtitle từng từ gộp thành 1 lớp video_maker.subtitle_track (không còn mỗi từ 1 clip),
+  composite bằng video_maker.compositor.IndexedCompositeVideoClip (tra lớp đang hiện theo chỉ mục thời gian)
+"""
+
+from PIL import Image
+
+FONT = "font/Roboto-SemiBold.ttf"
+SLIDE_FADE = 0.5
+SLIDE_GAP = 0.5       # im lặng sau mỗi đoạn thoại (khớp audio_engine)
+SUBTITLE_Y = 950
+
+
+def center_x(canvas_w: int, w: int) -> int:
+    """x của lớp căn giữa, làm tròn như MoviePy (int() cắt phần lẻ, kể cả khi âm)."""
+    return int((canvas_w - w) / 2)
+
+
+def text_item(text, start, duration, y, font_size, color, font=FONT, crossfade=0.1, role="title") -> dict:
+    """1 lớp chữ: viền trắng 5px, căn giữa theo chiều ngang, đặt ở toạ độ y."""
+    return {
+        "role": role,
+        "text": text,
+        "font": font,
+        "font_size": font_size,
+        "color": color,
+        "stroke_color": "white",
+        "stroke_width": 5,
+        "margin": (0, 0, 0, 50),
+        "start": start,
+        "duration": duration,
+        "y": y,
+        "crossfade": crossfade,
+    }
+
+
+def thumbnail_texts(name_day, color, start=0, duration=10, font=FONT) -> list:
+    """
+    Chữ thumbnail: "Nên - Không nên", tên ngày (mỗi từ 1 dòng, cỡ lớn), phần sau dấu "-" nếu có.
+    """
+    tmp_lst = name_day.split("-")
+    items = [text_item("Nên - Không nên", start, duration, 50, 75, color, font)]
+    for i, s in enumerate(tmp_lst[0].split(" ")):
+        items.append(text_item(s, start, duration, 200 + i * 200, 150, color, font))
+    if len(tmp_lst) == 2:
+        items.append(text_item(tmp_lst[-1], start, duration, 850, 70, color, font))
+    return items
+
+
+def subtitle_texts(scripts_json, color, font=FONT) -> list:
+    """Subtitle từng từ (list dict {start, end, content} như convert_srt_to_json)."""
+    return [
+        text_item(s["content"], s["start"], s["end"] - s["start"], SUBTITLE_Y, 100, color, font,
+                  crossfade=0.001, role="subtitle")
+        for s in scripts_json
+        if s["end"] > s["start"]
+    ]
+
+
+def build_timeline(image_paths, durations, texts=(), gap=SLIDE_GAP, fade=SLIDE_FADE, size=None) -> dict:
+    """
+    Mỗi ảnh hiển thị durations[i] + gap giây, fade in/out `fade` giây.
+    size: kích thước khung (ảnh đã chuẩn hoá bằng image_prep); None -> kích thước ảnh đầu tiên
+    (giống CompositeVideoClip mặc định).
+    """
+    if size is None:
+        size = _image_size(image_paths[0])
+
+    slides = []
+    t = 0.0
+    for path, d in zip(image_paths, durations):
+        dur = d + gap  # khớp khoảng silence giữa các đoạn
+        slides.append({"image": path, "start": t, "duration": dur, "fade": fade})
+        t += dur
+
+    return {"size": size, "duration": t, "slides": slides, "texts": list(texts)}
+
+
+def _image_size(path: str) -> tuple:
+    from video_maker import image_prep
+
+    if path.endswith(image_prep.FRAME_EXT):
+        return image_prep.frame_size(path)
+    with Image.open(path) as im:
+        return im.size
+
+
+# ---- Backend MoviePy ----
+def raw_text_clip(item):
+    """TextClip tĩnh (chưa gắn thời gian/hiệu ứng) của 1 lớp chữ."""
+    from moviepy import TextClip
+
+    return TextClip(
+        text=item["text"],
+        font=item["font"],
+        font_size=item["font_size"],
+        color=item["color"],
+        text_align='center',
+        method='label',
+        vertical_align='bottom',
+        horizontal_align='center',
+        margin=item["margin"],
+        stroke_color=item["stroke_color"],
+        stroke_width=item["stroke_width"],
+    )
+
+
+def text_clip(item):
+    """Lớp chữ có thời gian + crossfade; ảnh lấy từ sprite cache của text_render (không dựng lại TextClip)."""
+    from moviepy import ImageClip, vfx
+
+    from video_maker.text_render import render_text
+
+    cf = item["crossfade"]
+    return ImageClip(render_text(item)).with_start(item["start"]).with_duration(item["duration"]) \
+              .with_effects([vfx.CrossFadeIn(cf), vfx.CrossFadeOut(cf)]) \
+              .with_position(("center", item["y"]))
+
+
+def to_moviepy(timeline, audio_path=None):
+    from moviepy import AudioFileClip, ImageClip, vfx
+
+    from video_maker import image_prep
+    from video_maker.compositor import IndexedCompositeVideoClip
+
+    clips = []
+    for s in timeline["slides"]:
+        # frame đã chuẩn hoá (.rgb) -> mảng RGB đúng khung, không decode/resize lại
+        img = image_prep.load_frame(s["image"]) if s["image"].endswith(image_prep.FRAME_EXT) else s["image"]
+        clips.append(ImageClip(img).with_start(s["start"]).with_duration(s["duration"])
+                     .with_effects([vfx.FadeIn(s["fade"]), vfx.FadeOut(s["fade"])]))
+    subtitles = [t for t in timeline["texts"] if t["role"] == "subtitle"]
+    for item in timeline["texts"]:
+        if item["role"] != "subtitle":
+            clips.append(text_clip(item))
+    if subtitles:
+        # cả danh sách từ là 1 lớp (tra từ đang hiện bằng bisect), đặt trên chữ thumbnail như trước
+        from video_maker.subtitle_track import subtitle_track
+        clips.append(subtitle_track(subtitles, timeline["size"]))
+
+    video = IndexedCompositeVideoClip(clips, size=timeline["size"])
+    if audio_path:
+        video = video.with_audio(AudioFileClip(audio_path))
+    return video